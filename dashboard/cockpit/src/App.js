@@ -10,6 +10,45 @@ import MetricConfig from './MetricConfig';
 
 // --- Helper Functions ---
 
+// Returns a copy of `node` with the value at `path` replaced by fn(value).
+// Inside arrays of objects (planets, traceHistory, comets) a path segment
+// selects the item with the matching id, mirroring the server's patch paths.
+function updateIn(node, path, fn) {
+    if (path.length === 0) return fn(node);
+    const [segment, ...rest] = path;
+    if (Array.isArray(node)) {
+        return node.map(item => item.id === segment ? updateIn(item, rest, fn) : item);
+    }
+    return { ...node, [segment]: updateIn(node?.[segment], rest, fn) };
+}
+
+// Applies one server patch operation immutably and returns the new root.
+function applyPatchOp(root, op) {
+    const { path } = op;
+    if (op.op === 'insert') {
+        return updateIn(root, path, (list = []) => {
+            const next = [...list];
+            next.splice(op.index || 0, 0, op.value);
+            return op.limit !== undefined ? next.slice(0, op.limit) : next;
+        });
+    }
+
+    const key = path[path.length - 1];
+    return updateIn(root, path.slice(0, -1), (parent) => {
+        if (Array.isArray(parent)) {
+            if (op.op === 'delete') return parent.filter(item => item.id !== key);
+            return parent.some(item => item.id === key)
+                ? parent.map(item => item.id === key ? op.value : item)
+                : [...parent, op.value];
+        }
+        if (op.op === 'delete') {
+            const { [key]: _removed, ...rest } = parent || {};
+            return rest;
+        }
+        return { ...parent, [key]: op.value };
+    });
+}
+
 function calculatePlanetPosition(planet, galaxy, time) {
     // Get metric mappings from galaxy config
     const metricMapping = galaxy.config?.metricMapping || {
@@ -540,7 +579,7 @@ function SpaceStation({ color, onDoubleClick, isCritical, status, statusMessage,
     );
 }
 
-function Galaxy({ galaxy, onSelect, onPlanetSelect, onGalaxyDoubleClick, onPlanetDoubleClick, onStationHover, textureTheme, onGalaxyMove, setOrbitControlsEnabled, view, onAddTrace, optimizingPlanetIds }) {
+function Galaxy({ galaxy, onSelect, onPlanetSelect, onGalaxyDoubleClick, onPlanetDoubleClick, onStationHover, textureTheme, onGalaxyMove, onGalaxyDrag, setOrbitControlsEnabled, view, onAddTrace, optimizingPlanetIds }) {
     const groupRef = useRef();
     const [position, setPosition] = useState(galaxy.position);
     const pointLightRef = useRef();
@@ -577,7 +616,9 @@ function Galaxy({ galaxy, onSelect, onPlanetSelect, onGalaxyDoubleClick, onPlane
         event.stopPropagation();
         const newPosition = [x / 10, 0, z / 10]; // Scale down the movement
         setPosition(newPosition);
-        if (!down) {
+        if (down) {
+            onGalaxyDrag(galaxy.id, newPosition);
+        } else {
             onGalaxyMove(galaxy.id, newPosition);
         }
         setOrbitControlsEnabled(!down);
@@ -817,7 +858,7 @@ function PlanetSidebar({
 
 // --- Camera & Scene Logic ---
 
-function MainScene({ galaxies, onGalaxyDoubleClick, onPlanetDoubleClick, onSelect, orbitControlsRef, onStationHover, textureTheme, onGalaxyMove, setOrbitControlsEnabled, view, onAddTrace, optimizingPlanetIds }) {
+function MainScene({ galaxies, onGalaxyDoubleClick, onPlanetDoubleClick, onSelect, orbitControlsRef, onStationHover, textureTheme, onGalaxyMove, onGalaxyDrag, setOrbitControlsEnabled, view, onAddTrace, optimizingPlanetIds }) {
     console.log('MainScene view:', view);
     console.log('MainScene galaxies:', galaxies);
     
@@ -848,6 +889,7 @@ function MainScene({ galaxies, onGalaxyDoubleClick, onPlanetDoubleClick, onSelec
                         onStationHover={onStationHover}
                         textureTheme={textureTheme}
                         onGalaxyMove={onGalaxyMove}
+                        onGalaxyDrag={onGalaxyDrag}
                         setOrbitControlsEnabled={setOrbitControlsEnabled}
                         view={view}
                         onAddTrace={onAddTrace}
@@ -1021,6 +1063,34 @@ function Breadcrumb({ view, galaxies, onNavigate }) {
     );
 }
 
+// An agent's operational figures over the server's sliding window (latency
+// quantiles, error rate, token throughput), kept up to date in galaxy.operations
+function OperationsGrid({ operations }) {
+    if (!operations) return null;
+    const latency = (value) => value == null ? 'N/A' : `${value}ms`;
+    const items = [
+        ['Requests/s', operations.requests_per_s],
+        ['Error rate', operations.error_rate == null ? 'N/A' : `${(operations.error_rate * 100).toFixed(1)}%`],
+        ['Tokens/s', operations.tokens_per_s],
+        ['Latency p50', latency(operations.latency_p50)],
+        ['Latency p95', latency(operations.latency_p95)],
+        ['Latency p99', latency(operations.latency_p99)],
+    ];
+    return (
+        <>
+            <h4>Operations (last {operations.window})</h4>
+            <div className="metrics-grid">
+                {items.map(([label, value]) => (
+                    <div className="metric-item" key={label}>
+                        <span className="metric-label">{label}</span>
+                        <span className="metric-value">{value}</span>
+                    </div>
+                ))}
+            </div>
+        </>
+    );
+}
+
 function StatsBox({ selectedObject, onDeleteAgent, onClose, onUpdateMetricMapping }) {
     if (!selectedObject) return null;
 
@@ -1032,7 +1102,8 @@ function StatsBox({ selectedObject, onDeleteAgent, onClose, onUpdateMetricMappin
                     <button onClick={onClose} className="close-btn-stats">×</button>
                 </div>
                 {selectedObject.status_message && <p>{selectedObject.status_message}</p>}
-                <MetricConfig 
+                <OperationsGrid operations={selectedObject.operations} />
+                <MetricConfig
                     galaxy={selectedObject} 
                     onUpdateMapping={onUpdateMetricMapping}
                 />
@@ -1167,10 +1238,14 @@ function App() {
   const [optimizerSettings, setOptimizerSettings] = useState({});
   const [thresholdSettings, setThresholdSettings] = useState({});
   const ws = useRef(null);
+  const revision = useRef(null);
+  const draggingGalaxy = useRef(null);
 
   useEffect(() => {
     const connect = () => {
-      const wsInstance = new WebSocket("ws://localhost:8080/ws");
+      // On reconnect, ask only for the patches we missed
+      const since = revision.current !== null ? `?since=${revision.current}` : '';
+      const wsInstance = new WebSocket(`ws://localhost:8080/ws${since}`);
       ws.current = wsInstance;
 
       wsInstance.onopen = () => setStatusMessage("MCP connection established. Systems online.");
@@ -1185,42 +1260,55 @@ function App() {
           if (message.type === 'error') {
               console.error("MCP Error:", message.message);
               setStatusMessage(`Error: ${message.message}`);
-          } else if (message.type === 'update') {
+          } else if (message.type === 'snapshot') {
               const data = message.payload;
-              
-              if (data.optimizing_planets) {
-                  setOptimizingPlanetIds(new Set(data.optimizing_planets));
-              }
+              revision.current = message.revision;
+              setOptimizingPlanetIds(new Set(data.optimizing_planets || []));
 
+              setGalaxies(prev => {
+                  const updated = {};
+                  Object.keys(data.galaxies || {}).forEach(galaxyId => {
+                      const incomingGalaxy = data.galaxies[galaxyId];
+                      const existingGalaxy = prev[galaxyId];
+                      // Keep the position of a galaxy we are dragging right now
+                      updated[galaxyId] = existingGalaxy && galaxyId === draggingGalaxy.current
+                          ? { ...incomingGalaxy, position: existingGalaxy.position }
+                          : incomingGalaxy;
+                  });
+                  return updated;
+              });
+          } else if (message.type === 'patch') {
+              if (revision.current !== null && message.revision <= revision.current) {
+                  return; // Already applied
+              }
+              if (revision.current === null || message.revision !== revision.current + 1) {
+                  // We missed an update; ask the server to catch us up
+                  wsInstance.send(JSON.stringify({ type: 'sync', revision: revision.current }));
+                  return;
+              }
+              revision.current = message.revision;
+
+              const galaxyOps = [];
+              message.ops.forEach(op => {
+                  if (op.path[0] === 'optimizing_planets') {
+                      setOptimizingPlanetIds(new Set(op.value || []));
+                  } else if (op.path[0] === 'galaxies') {
+                      galaxyOps.push({ ...op, path: op.path.slice(1) });
+                  }
+              });
+              if (galaxyOps.length > 0) {
+                  setGalaxies(prev => galaxyOps.reduce(applyPatchOp, prev));
+              }
+          } else if (message.type === 'positions') {
+              // Galaxies other dashboards are dragging, packed as [id, x, y, z, ...]
+              const packed = message.p;
               setGalaxies(prev => {
                   const updated = { ...prev };
-                  if (data.galaxies) {
-                      Object.keys(data.galaxies).forEach(galaxyId => {
-                          const incomingGalaxy = data.galaxies[galaxyId];
-                          const existingGalaxy = prev[galaxyId];
-
-                          if (existingGalaxy) {
-                              // Preserve client-side state like position
-                              const newGalaxyData = {
-                                  ...existingGalaxy, 
-                                  ...incomingGalaxy,
-                                  position: existingGalaxy.position || incomingGalaxy.position
-                              };
-                              
-                              // Deep merge planets to preserve trace history and other states
-                              if (incomingGalaxy.planets && existingGalaxy.planets) {
-                                  newGalaxyData.planets = incomingGalaxy.planets.map(incPlanet => {
-                                      const exPlanet = existingGalaxy.planets.find(p => p.id === incPlanet.id);
-                                      return exPlanet ? { ...exPlanet, ...incPlanet } : incPlanet;
-                                  });
-                              }
-                              
-                              updated[galaxyId] = newGalaxyData;
-
-                          } else {
-                              updated[galaxyId] = incomingGalaxy;
-                          }
-                      });
+                  for (let i = 0; i < packed.length; i += 4) {
+                      const galaxyId = packed[i];
+                      if (updated[galaxyId] && galaxyId !== draggingGalaxy.current) {
+                          updated[galaxyId] = { ...updated[galaxyId], position: [packed[i + 1], packed[i + 2], packed[i + 3]] };
+                      }
                   }
                   return updated;
               });
@@ -1244,7 +1332,16 @@ function App() {
     }
   }, [view.focusedPlanet]);
 
+  const handleGalaxyDrag = (galaxyId, newPosition) => {
+    // Stream the drag to other dashboards; the server coalesces the steps
+    draggingGalaxy.current = galaxyId;
+    if (ws.current && ws.current.readyState === WebSocket.OPEN) {
+        ws.current.send(JSON.stringify({ type: 'move', id: galaxyId, position: newPosition }));
+    }
+  };
+
   const handleGalaxyMove = async (galaxyId, newPosition) => {
+    draggingGalaxy.current = null;
     // Update local state immediately for responsive UI
     setGalaxies(prev => ({
         ...prev,
@@ -1560,6 +1657,7 @@ function App() {
                   onStationHover={setHoverMessage}
                   textureTheme={textureTheme}
                   onGalaxyMove={handleGalaxyMove}
+                  onGalaxyDrag={handleGalaxyDrag}
                   setOrbitControlsEnabled={setOrbitControlsEnabled}
                   view={view}
                   onAddTrace={handleAddTraceToPlanet}
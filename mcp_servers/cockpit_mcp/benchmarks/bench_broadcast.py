@@ -0,0 +1,75 @@
+"""
+Per-broadcast CPU cost against the number of connected clients.
+
+Compares the original pipeline (deepcopy the universe, then send_json per
+client, which re-encodes the message for every socket) with encode-once
+fan-out of a full snapshot and of a single patch.
+
+    python benchmarks/bench_broadcast.py
+"""
+import asyncio
+import copy
+import json
+import random
+
+from common import build_universe, cpu_time, make_variant
+
+from state_sync import VersionedState
+from wire import orjson
+
+CLIENT_COUNTS = [1, 10, 100, 1000]
+
+
+class FakeSocket:
+    """Stands in for web.WebSocketResponse; only the encoding cost is real."""
+
+    async def send_str(self, data: str) -> None:
+        pass
+
+    async def send_json(self, data) -> None:
+        # aiohttp's send_json encodes with json.dumps before sending
+        await self.send_str(json.dumps(data))
+
+
+async def _gather(coros):
+    await asyncio.gather(*coros, return_exceptions=True)
+
+
+def main():
+    galaxies = build_universe(galaxies=20, planets=10, traces=15)
+    universe = VersionedState({"galaxies": galaxies, "optimizing_planets": []})
+    rng = random.Random(1)
+    loop = asyncio.new_event_loop()
+
+    print(f"encoder: {'orjson' if orjson else 'json'}")
+    print(f"snapshot size: {len(universe.snapshot()) / 1024:.0f} KiB")
+    print(f"{'clients':>8} {'deepcopy+send_json':>20} {'encode-once snapshot':>22} {'encode-once patch':>19}")
+
+    for count in CLIENT_COUNTS:
+        sockets = [FakeSocket() for _ in range(count)]
+        repeat = max(1, 20 // count)
+
+        def legacy():
+            message = {"type": "update", "payload": {"galaxies": copy.deepcopy(galaxies)}}
+            loop.run_until_complete(_gather([s.send_json(message) for s in sockets]))
+
+        def snapshot():
+            data = universe.snapshot()
+            loop.run_until_complete(_gather([s.send_str(data) for s in sockets]))
+
+        def patch():
+            p = universe.patch()
+            p.insert("galaxies", "galaxy-0", "planets", "galaxy-0-p0", "traceHistory",
+                     value=make_variant(rng, 0), limit=15)
+            data = universe.commit(p)
+            loop.run_until_complete(_gather([s.send_str(data) for s in sockets]))
+
+        print(f"{count:>8} {cpu_time(legacy, repeat) * 1000:>18.2f}ms "
+              f"{cpu_time(snapshot, repeat) * 1000:>20.2f}ms "
+              f"{cpu_time(patch, repeat * 10) * 1000:>17.3f}ms")
+
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
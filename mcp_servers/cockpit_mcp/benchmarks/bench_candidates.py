@@ -0,0 +1,75 @@
+"""
+Time for an optimization run to reach its score threshold against the
+number of candidates K generated and evaluated per step. Steps go through
+the real scheduler, default search strategy and judge pool (built-in
+simulated judges); the pause between steps is scaled down 10x and times
+are reported in server seconds.
+
+    python benchmarks/bench_candidates.py
+"""
+import asyncio
+import random
+import time
+
+import common  # noqa: F401  (sets up the import path)
+
+from judges import JudgePool
+from prompts import PROMPT_MODIFIERS
+from scheduler import OptimizerScheduler
+from strategies import DEFAULT_STRATEGY, make_strategy
+
+RUNS = 100
+DEPLOYED_SCORE = 0.7
+SCORE_THRESHOLD = 0.84
+SCALE = 10.0  # The server's 3-7 s pause becomes 0.3-0.7 s
+COOLDOWN = (3.0 / SCALE, 7.0 / SCALE)
+MAX_STEPS = 60  # Some prompts can't reach the threshold at all
+
+
+async def measure(k):
+    pool = JudgePool(executor="thread", workers=4)
+    ended = []
+    reached = {}
+
+    async def step(run):
+        combos = run.strategy.propose(run.candidates)
+        if not combos or run.steps >= MAX_STEPS:
+            return None
+        evaluations = await asyncio.gather(*(pool.evaluate(run.strategy.prompt(combo), DEPLOYED_SCORE)
+                                             for combo in combos))
+        for combo, evaluation in zip(combos, evaluations):
+            run.strategy.observe(combo, evaluation["score"])
+        return max(evaluation["score"] for evaluation in evaluations)
+
+    async def finish(run):
+        ended.append(run.planet_id)
+        if run.best_score is not None and run.best_score >= SCORE_THRESHOLD:
+            reached[run.planet_id] = (time.perf_counter() - started, run.steps)
+
+    scheduler = OptimizerScheduler(step, finish, max_concurrent=50, evaluations_per_second=None, cooldown=COOLDOWN)
+    started = time.perf_counter()
+    for i in range(RUNS):
+        strategy = make_strategy(DEFAULT_STRATEGY, f"Answer customer inquiry type {i}.", PROMPT_MODIFIERS,
+                                 start_score=DEPLOYED_SCORE, rng=random.Random(i))
+        scheduler.submit("galaxy-0", f"planet-{i}", "bench", SCORE_THRESHOLD, candidates=k, strategy=strategy)
+    while len(ended) < RUNS:
+        await asyncio.sleep(0.01)
+    await scheduler.close()
+    await pool.close()
+
+    times = sorted(seconds * SCALE for seconds, _ in reached.values())
+    steps = sum(steps for _, steps in reached.values()) / len(reached)
+    return len(reached), times[len(times) // 2], times[int(len(times) * 0.9)], steps, steps * k
+
+
+async def main():
+    random.seed(0)
+    print(f"{RUNS} runs, deployed score {DEPLOYED_SCORE}, threshold {SCORE_THRESHOLD}; times for runs that reached it")
+    print(f"{'K':>3} {'reached':>8} {'p50 s':>7} {'p90 s':>7} {'steps/run':>10} {'evals/run':>10}")
+    for k in (1, 2, 4, 8):
+        reached, p50, p90, steps, evaluations = await measure(k)
+        print(f"{k:>3} {reached:>8} {p50:>7.1f} {p90:>7.1f} {steps:>10.1f} {evaluations:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+Event loop responsiveness while variants are scored, with evaluation inline
+on the loop (as the server used to do it) versus on the judge pool's
+threads or processes. Also shows what batching saves a judge that pays a
+fixed cost per call, like one LLM request per batch.
+
+    python benchmarks/bench_judges.py
+"""
+import asyncio
+import os
+import tempfile
+import textwrap
+import time
+
+import common  # noqa: F401  (sets up the import path)
+
+from judges import JudgePool, load_metrics
+
+VARIANTS = 400
+# A CPU-bound metric (~2 ms of pure Python per variant) and a judge that
+# waits 50 ms per call however many variants it gets.
+METRICS_SOURCE = textwrap.dedent("""
+    import time
+
+    from judges import Metric
+
+
+    class HeavyMetric(Metric):
+        name = "heavy"
+        timeout = 60.0
+
+        def evaluate(self, text, base_score):
+            deadline = time.perf_counter() + 0.002
+            while time.perf_counter() < deadline:
+                pass
+            return len(text)
+
+
+    class RemoteJudge(Metric):
+        name = "remote"
+        timeout = 60.0
+
+        def evaluate_batch(self, candidates):
+            time.sleep(0.05)
+            return [base_score for _, base_score in candidates]
+""")
+
+
+async def watch_loop(lags, stop):
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(0.005)
+        lags.append(time.perf_counter() - before - 0.005)
+
+
+async def measure(evaluate):
+    lags = []
+    stop = asyncio.Event()
+    watcher = asyncio.ensure_future(watch_loop(lags, stop))
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    await asyncio.gather(*(evaluate(f"Variant {i} [Be more direct.]", 0.5) for i in range(VARIANTS)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await watcher
+    lags.sort()
+    return elapsed, lags[int(len(lags) * 0.99)] if lags else 0.0, max(lags, default=0.0)
+
+
+async def main():
+    directory = tempfile.mkdtemp()
+    with open(os.path.join(directory, "bench_metrics.py"), "w") as f:
+        f.write(METRICS_SOURCE)
+    metrics = load_metrics(directory)
+
+    async def inline(text, base_score):
+        # What an inline evaluate_with_opik_judges would do with a heavy metric
+        return {name: metrics[name].evaluate(text, base_score) for name in ("score", "heavy")}
+
+    print(f"{VARIANTS} variants, CPU-bound metric (~2 ms each), {os.cpu_count()} CPUs")
+    print(f"{'':>24} {'wall s':>7} {'loop lag p99 ms':>16} {'max ms':>8}")
+    elapsed, p99, worst = await measure(inline)
+    print(f"{'inline on the loop':>24} {elapsed:>7.2f} {p99 * 1000:>16.1f} {worst * 1000:>8.1f}")
+    for kind in ("thread", "process"):
+        pool = JudgePool(directory, executor=kind)
+        pool.start()
+        elapsed, p99, worst = await measure(lambda text, score: pool.evaluate(text, score, ["heavy"]))
+        print(f"{kind + ' pool':>24} {elapsed:>7.2f} {p99 * 1000:>16.1f} {worst * 1000:>8.1f}")
+        await pool.close()
+
+    print(f"\n{VARIANTS} variants, judge with 50 ms per call")
+    print(f"{'':>24} {'wall s':>7} {'batches':>8}")
+    for max_batch in (1, 32):
+        pool = JudgePool(directory, executor="thread", workers=8, max_batch=max_batch)
+        elapsed, _, _ = await measure(lambda text, score: pool.evaluate(text, score, ["remote"]))
+        label = f"batches of {max_batch}"
+        print(f"{label:>24} {elapsed:>7.2f} {pool.batches:>8}")
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+"""
+Overhead of the /metrics instrumentation. First the cost of each metric
+update on its own, then the instrumented paths run with and without their
+metrics: an HTTP request through the app (the request middleware), and an
+optimizer step's locked publish to 500 dashboards (lock wait/hold, publish
+and broadcast timings). "off" removes the middleware and swaps the path's
+metrics for no-ops; the best of several alternating rounds is reported.
+
+    python benchmarks/bench_metrics.py
+"""
+import asyncio
+import time
+from contextlib import nullcontext
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+import common  # noqa: F401  (sets up the import path)
+
+import locks
+import server
+from metrics import Registry
+
+REQUESTS = 2000
+PUBLISHES = 2000
+CLIENTS = 500
+ROUNDS = 5
+
+
+class NullMetric:
+    def labels(self, *values):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1.0):
+        pass
+
+    def time(self, *labels):
+        return nullcontext()
+
+
+class FakeChannel:
+    topics = None
+
+    def send(self, revision, data):
+        pass
+
+
+def per_call_ns(fn, calls=200_000):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) * 1e9 / calls
+
+
+def primitives():
+    registry = Registry()
+    histogram = registry.histogram("h", "")
+    labeled = registry.histogram("hl", "", ("method", "route"))
+    counter = registry.counter("c", "", ("method", "route", "status"))
+    print("metric update                      ns/call")
+    for name, fn in (
+        ("perf_counter()", time.perf_counter),
+        ("Histogram.observe", lambda: histogram.observe(0.003)),
+        ("Histogram.labels(..).observe", lambda: labeled.labels("GET", "/api/x").observe(0.003)),
+        ("Counter.labels(..).inc", lambda: counter.labels("GET", "/api/x", "200").inc()),
+    ):
+        print(f"{name:<32} {per_call_ns(fn):>9.0f}")
+
+
+async def http_round(session, base):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        async with session.get(f"{base}/api/universe/summary") as resp:
+            await resp.read()
+    return (time.perf_counter() - start) / REQUESTS
+
+
+async def measure_http():
+    servers = {}
+    async with aiohttp.ClientSession() as session:
+        for mode in ("on", "off"):
+            app = server.create_app()
+            if mode == "off":
+                app.middlewares.remove(server.observe_requests)
+            test_server = TestServer(app)
+            await test_server.start_server()
+            servers[mode] = test_server
+        best = {"on": float("inf"), "off": float("inf")}
+        for _ in range(ROUNDS):
+            for mode, test_server in servers.items():
+                base = str(test_server.make_url("")).rstrip("/")
+                best[mode] = min(best[mode], await http_round(session, base))
+        for test_server in servers.values():
+            await test_server.close()
+    return best
+
+
+async def publish_round():
+    galaxy_ids = list(server.galaxies)
+    start = time.perf_counter()
+    for i in range(PUBLISHES):
+        galaxy_id = galaxy_ids[i % len(galaxy_ids)]
+        async with server.galaxy_locks.hold(galaxy_id):
+            galaxy = server.universe.galaxy(galaxy_id)
+            patch = server.universe.patch()
+            patch.set("galaxies", galaxy_id, "status_message", value=f"step {i} of {galaxy['name']}")
+            server.publish(patch)
+    server.state_log._pending.clear()
+    return (time.perf_counter() - start) / PUBLISHES
+
+
+def set_publish_metrics(on):
+    names = ("PUBLISH_SECONDS", "BROADCAST_SECONDS", "BROADCAST_CLIENTS")
+    if not hasattr(set_publish_metrics, "saved"):
+        set_publish_metrics.saved = {name: getattr(server, name) for name in names}
+        set_publish_metrics.saved.update(LOCK_WAIT=locks.LOCK_WAIT, LOCK_HOLD=locks.LOCK_HOLD)
+    saved = set_publish_metrics.saved
+    for name in names:
+        setattr(server, name, saved[name] if on else NullMetric())
+    for name in ("LOCK_WAIT", "LOCK_HOLD"):
+        setattr(locks, name, saved[name] if on else NullMetric())
+
+
+async def measure_publish():
+    for _ in range(CLIENTS):
+        server.clients[object()] = FakeChannel()
+    best = {"on": float("inf"), "off": float("inf")}
+    for _ in range(ROUNDS):
+        for mode in ("on", "off"):
+            set_publish_metrics(mode == "on")
+            best[mode] = min(best[mode], await publish_round())
+    set_publish_metrics(True)
+    server.clients.clear()
+    return best
+
+
+def report(name, best):
+    overhead = best["on"] - best["off"]
+    print(f"{name:<24} {best['off'] * 1e6:>9.1f} {best['on'] * 1e6:>9.1f} {overhead * 1e6:>9.2f} "
+          f"{overhead / best['off'] * 100:>8.2f}%")
+
+
+async def main():
+    await server.load_state()
+    server.state_loaded.set()
+    primitives()
+    print()
+    print(f"{'path':<24} {'off us':>9} {'on us':>9} {'+us':>9} {'overhead':>9}")
+    report("HTTP GET (summary)", await measure_http())
+    report(f"publish to {CLIENTS} clients", await measure_publish())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
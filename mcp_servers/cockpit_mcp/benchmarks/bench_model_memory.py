@@ -0,0 +1,60 @@
+"""
+Retained memory of trace variants as plain dicts versus slotted records.
+
+Variants are decoded from JSON (as they arrive from the state file or from
+telemetry) and kept alive; tracemalloc reports what stays allocated. Also
+reports decode and encode time for each representation.
+
+    python benchmarks/bench_model_memory.py
+"""
+import json
+import random
+import time
+import tracemalloc
+
+from common import make_variant
+
+from models import VariantList
+from wire import encode_message
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def measure(build):
+    """Returns (value, retained bytes, build seconds); timed without tracing."""
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    value = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current, elapsed
+
+
+def main():
+    print(f"{'variants':>9} {'dict MiB':>9} {'record MiB':>11} {'saved':>6} "
+          f"{'dict load':>10} {'record load':>12} {'dict dump':>10} {'record dump':>12}")
+    for size in SIZES:
+        rng = random.Random(size)
+        raw = json.dumps([make_variant(rng, i) for i in range(size)])
+
+        dicts, dict_bytes, dict_load = measure(lambda: json.loads(raw))
+        del dicts
+        records, record_bytes, record_load = measure(lambda: VariantList(json.loads(raw)))
+
+        dicts = json.loads(raw)
+        start = time.perf_counter()
+        encode_message(dicts)
+        dict_dump = time.perf_counter() - start
+        start = time.perf_counter()
+        encode_message(records)
+        record_dump = time.perf_counter() - start
+
+        print(f"{size:>9} {dict_bytes / 2**20:>9.1f} {record_bytes / 2**20:>11.1f} "
+              f"{1 - record_bytes / dict_bytes:>6.0%} {dict_load * 1000:>8.0f}ms {record_load * 1000:>10.0f}ms "
+              f"{dict_dump * 1000:>8.0f}ms {record_dump * 1000:>10.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Onboarding a fleet of agents: one /api/onboard POST per agent (planets then
+arriving through telemetry) versus a single streamed NDJSON request to
+/api/onboard/batch, and the time to stream the fleet back out of
+/api/onboard/export. Reports wall time and how many broadcasts (state
+revisions) each produced.
+
+    python benchmarks/bench_onboarding.py
+"""
+import asyncio
+import json
+import time
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+import common  # noqa: F401  (sets up the import path)
+
+import server
+
+AGENTS = 2000
+PLANETS_PER_AGENT = 3
+CONCURRENCY = 32
+
+
+def agent_record(agent_id: str):
+    return {
+        "id": agent_id,
+        "name": f"Agent {agent_id}",
+        "apiUrl": f"https://agents.example/{agent_id}",
+        "metricMapping": {"planetSize": "score"},
+        "planets": [{"id": f"{agent_id}-p{p}", "name": f"Prompt {p}"} for p in range(PLANETS_PER_AGENT)],
+    }
+
+
+async def run_single(session, base, records):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def onboard(record):
+        async with semaphore:
+            async with session.post(f"{base}/api/onboard", json=record) as resp:
+                assert resp.status == 200, await resp.text()
+            telemetry = {"agent_id": record["id"], "planets": record["planets"]}
+            async with session.post(f"{base}/api/telemetry", json=telemetry) as resp:
+                assert resp.status == 200, await resp.text()
+
+    await asyncio.gather(*(onboard(r) for r in records))
+    await server.telemetry_batcher.flush()
+
+
+async def run_batch(session, base, records):
+    async def body():
+        for record in records:
+            yield (json.dumps(record) + "\n").encode()
+
+    async with session.post(f"{base}/api/onboard/batch", data=body(),
+                            headers={"Content-Type": "application/x-ndjson"}) as resp:
+        result = await resp.json()
+        assert result["accepted"] == len(records), result
+
+
+async def main():
+    await server.load_state()
+    server.state_loaded.set()
+    flusher = asyncio.create_task(server.telemetry_batcher.run())
+    test_server = TestServer(server.create_app())
+    await test_server.start_server()
+    base = str(test_server.make_url("")).rstrip("/")
+
+    print(f"{AGENTS} agents x {PLANETS_PER_AGENT} planets")
+    print(f"{'mode':>8} {'seconds':>8} {'agents/s':>9} {'broadcasts':>11}")
+    async with aiohttp.ClientSession() as session:
+        for name, run in (("single", run_single), ("batch", run_batch)):
+            records = [agent_record(f"{name}-{a}") for a in range(AGENTS)]
+            revision = server.universe.revision
+            start = time.perf_counter()
+            await run(session, base, records)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>8} {elapsed:>8.2f} {AGENTS / elapsed:>9.0f} {server.universe.revision - revision:>11}")
+
+        start = time.perf_counter()
+        async with session.get(f"{base}/api/onboard/export") as resp:
+            lines = size = 0
+            async for line in resp.content:
+                lines += 1
+                size += len(line)
+        elapsed = time.perf_counter() - start
+        print(f"export: {lines} agents, {size / 2**20:.1f} MiB in {elapsed:.2f} s")
+
+    flusher.cancel()
+    await test_server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""
+Per-agent operational metrics: memory of a series as samples pile up, the
+latency sketch's quantiles against the exact ones for a few latency shapes,
+and the cost of recording a sample (into its agent, planet and the fleet,
+as the server does), querying an agent or the fleet, merging many agents
+and digesting a galaxy's window for the universe document.
+
+    python benchmarks/bench_operations.py
+"""
+import random
+import statistics
+import time
+import tracemalloc
+
+import common  # noqa: F401  (sets up the import path)
+
+from operations import LATENCY_ACCURACY, QUANTILES, OperationsStore, parse_operations
+
+AGENTS = 1000
+SAMPLES = 200_000
+QUERIES = 200
+
+
+def payload(rng, latency):
+    return {"latency_ms": latency, "error_count": rng.choice((0, 0, 0, 0, 1, 2)),
+            "prompt_tokens": rng.randint(100, 1000), "completion_tokens": rng.randint(50, 500)}
+
+
+def memory():
+    print("one series' memory as samples arrive over a day")
+    rng = random.Random(0)
+    start = time.time() - 86_400
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    store = OperationsStore()
+    recorded = 0
+    for target in (10, 1_000, 100_000, 1_000_000):
+        while recorded < target:
+            for sample in parse_operations(payload(rng, rng.lognormvariate(5, 0.6))):
+                store.record("agent", sample, start + recorded * 86_400 / 1_000_000)
+            recorded += 1
+        used, _ = tracemalloc.get_traced_memory()
+        print(f"{target:>12} samples {used - base:>9} bytes")
+    tracemalloc.stop()
+    print(f"stats() says {store.stats()['bytes_per_series']} bytes of columns per series")
+
+
+def accuracy():
+    rng = random.Random(1)
+    shapes = {
+        "lognormal (LLM calls)": lambda: rng.lognormvariate(5.5, 0.7),
+        "bimodal (cache hit/miss)": lambda: rng.gauss(20, 4) if rng.random() < 0.7 else rng.gauss(900, 150),
+        "pareto (heavy tail)": lambda: 50 * rng.paretovariate(1.5),
+    }
+    print(f"\nquantile error against exact, {SAMPLES} samples (sketch accuracy {LATENCY_ACCURACY:.0%})")
+    print(f"{'shape':>26} " + " ".join(f"{f'p{q * 100:g}':>16}" for q in QUANTILES))
+    now = time.time()
+    for name, draw in shapes.items():
+        latencies = [max(draw(), 1.0) for _ in range(SAMPLES)]
+        store = OperationsStore()
+        for latency in latencies:
+            store.record("agent", {"latency_ms": latency, "error_count": 0.0, "prompt_tokens": 0.0,
+                                   "completion_tokens": 0.0, "planet_id": None}, now)
+        latencies.sort()
+        reported = store.query(["agent"], now=now)["total"]["latency_ms"]
+        cells = []
+        for q in QUANTILES:
+            exact = latencies[int(q * (len(latencies) - 1))]
+            estimate = reported[f"p{q * 100:g}"]
+            cells.append(f"{exact:>7.1f} {(estimate - exact) / exact:>+7.2%}")
+        print(f"{name:>26} " + " ".join(cells))
+
+
+def timed(fn, runs=QUERIES):
+    times = []
+    for _ in range(runs):
+        began = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - began) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.99)]
+
+
+def costs():
+    rng = random.Random(2)
+    now = time.time()
+    agents, planets, fleet = OperationsStore(), OperationsStore(), OperationsStore()
+    samples = [(f"agent-{i % AGENTS}", parse_operations(payload(rng, rng.lognormvariate(5, 0.6)),
+                                                         f"agent-{i % AGENTS}-p{i % 4}")[0])
+               for i in range(SAMPLES)]
+    began = time.perf_counter()
+    for i, (agent_id, sample) in enumerate(samples):
+        # Spread over the last 15 minutes so every window has data
+        timestamp = now - 900 + i * 900 / SAMPLES
+        agents.record(agent_id, sample, timestamp)
+        planets.record(sample["planet_id"], sample, timestamp)
+        fleet.record("fleet", sample, timestamp)
+    record_us = (time.perf_counter() - began) / SAMPLES * 1e6
+    stats = agents.stats()
+    print(f"\n{AGENTS} agents, 4 planets each, {SAMPLES} samples over 15 minutes")
+    print(f"record (agent + planet + fleet): {record_us:.1f} us per sample; "
+          f"{(stats['bytes'] + planets.stats()['bytes']) / 2**20:.0f} MiB of columns")
+    print(f"{'operation':>34} {'p50 ms':>7} {'p99 ms':>7}")
+    cases = [
+        ("agent query (3 windows + total)", lambda: agents.query([f"agent-{rng.randrange(AGENTS)}"], now=now)),
+        ("galaxy digest (5m window)", lambda: agents.summary(f"agent-{rng.randrange(AGENTS)}", "5m", now)),
+        ("fleet query (fleet series)", lambda: fleet.query(["fleet"], now=now)),
+        (f"{AGENTS} agents merged at query time", lambda: agents.query(list(agents.keys()), now=now)),
+    ]
+    for name, fn in cases:
+        p50, p99 = timed(fn, 20 if "merged" in name else QUERIES)
+        print(f"{name:>34} {p50:>7.2f} {p99:>7.2f}")
+
+
+def main():
+    memory()
+    accuracy()
+    costs()
+
+
+if __name__ == "__main__":
+    main()
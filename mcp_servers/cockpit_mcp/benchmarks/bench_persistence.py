@@ -0,0 +1,109 @@
+"""
+State log cost for a 10k-planet universe: write amplification and fsyncs
+while patches stream in, and restart time from a snapshot plus a log tail
+compared with loading the plain JSON state file.
+
+    python benchmarks/bench_persistence.py
+"""
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from common import build_universe, make_variant
+
+from models import GalaxyMap
+from persistence import StateLog
+from state_store import StateStore
+
+GALAXIES = 100
+PLANETS_PER_GALAXY = 100
+TRACES = 5
+PATCHES = 20_000
+PATCHES_PER_FLUSH = 200  # Roughly one busy flush window
+TAILS = [0, 1_000, 10_000]
+
+
+def build_store(seed: int = 0) -> StateStore:
+    galaxies = GalaxyMap(build_universe(GALAXIES, PLANETS_PER_GALAXY, TRACES, seed=seed))
+    return StateStore({"galaxies": galaxies, "optimizing_planets": []})
+
+
+def mutate(store: StateStore, log: StateLog, rng: random.Random, index: int) -> None:
+    """One optimizer-like patch: a new trace entry, or a score change."""
+    galaxy_id = f"galaxy-{rng.randrange(GALAXIES)}"
+    planet_id = f"{galaxy_id}-p{rng.randrange(PLANETS_PER_GALAXY)}"
+    patch = store.patch()
+    if rng.random() < 0.5:
+        patch.insert("galaxies", galaxy_id, "planets", planet_id, "traceHistory",
+                     value=make_variant(rng, 10**7 + index), limit=15)
+    else:
+        patch.set("galaxies", galaxy_id, "planets", planet_id, "deployedVersion", "evaluation", "score",
+                  value=rng.random())
+    log.append(store.commit(patch))
+
+
+async def write_patches(directory: str, patches: int, compact_ratio: float) -> StateLog:
+    store = build_store()
+    log = StateLog(directory, compact_ratio=compact_ratio)
+    log.open(store)
+    rng = random.Random(1)
+    for i in range(patches):
+        mutate(store, log, rng, i)
+        if (i + 1) % PATCHES_PER_FLUSH == 0:
+            await log.flush()
+    await log.close()
+    return log
+
+
+def timed_restart(directory: str):
+    start = time.perf_counter()
+    log = StateLog(directory)
+    revision, document = log.restore()
+    StateStore({"galaxies": GalaxyMap(document["galaxies"]), "optimizing_planets": []}, revision=revision)
+    return time.perf_counter() - start
+
+
+def timed_json_load(path: str) -> float:
+    start = time.perf_counter()
+    with open(path) as f:
+        galaxies = GalaxyMap(json.load(f))
+    StateStore({"galaxies": galaxies, "optimizing_planets": []})
+    return time.perf_counter() - start
+
+
+async def main():
+    planets = GALAXIES * PLANETS_PER_GALAXY
+    snapshot_size = len(build_store().snapshot())
+    print(f"universe: {GALAXIES} galaxies x {PLANETS_PER_GALAXY} planets, {TRACES} traces each "
+          f"({planets} planets, {snapshot_size / 2**20:.1f} MiB snapshot)")
+
+    print(f"\n{PATCHES} patches, flushed every {PATCHES_PER_FLUSH}:")
+    print(f"{'compact':>8} {'wal MiB':>8} {'snap MiB':>9} {'snaps':>6} {'fsyncs':>7} {'amplif.':>8} {'patches/s':>10}")
+    for ratio in (0.1, 0.25, 1.0):
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            log = await write_patches(directory, PATCHES, ratio)
+            elapsed = time.perf_counter() - start
+            stats = log.stats()
+            print(f"{ratio:>7}x {stats['wal_bytes'] / 2**20:>8.2f} {stats['snapshot_bytes'] / 2**20:>9.2f} "
+                  f"{stats['snapshots']:>6} {stats['fsyncs']:>7} {stats['write_amplification']:>8} "
+                  f"{PATCHES / elapsed:>10.0f}")
+
+    print("\nrestart (load + index):")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.json")
+        with open(path, "w") as f:
+            json.dump(build_universe(GALAXIES, PLANETS_PER_GALAXY, TRACES), f)
+        print(f"{'plain JSON state file':>28}: {timed_json_load(path) * 1000:8.1f} ms")
+    for tail in TAILS:
+        with tempfile.TemporaryDirectory() as directory:
+            # A huge ratio keeps the whole tail in the log
+            await write_patches(directory, tail, compact_ratio=1e9)
+            print(f"{f'snapshot + {tail} log records':>28}: {timed_restart(directory) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
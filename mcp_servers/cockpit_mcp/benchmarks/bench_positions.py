@@ -0,0 +1,91 @@
+"""
+Live galaxy dragging seen by every dashboard: a versioned patch per drag
+step (what broadcasting the PUTs would do) versus the position feed, which
+coalesces steps to 20 Hz ticks and sends packed [id, x, y, z] frames.
+Reports messages and bytes per viewing dashboard per second, and server CPU
+per second of dragging. Sockets are stand-ins that deliver instantly.
+
+    python benchmarks/bench_positions.py
+"""
+import random
+import time
+
+from common import build_universe
+
+from models import GalaxyMap
+from positions import PositionFeed
+from state_store import StateStore
+
+VIEWERS = 500
+POINTER_RATE = 120  # Drag steps per second per dragging dashboard
+SECONDS = 10
+
+
+class FakeChannel:
+    def __init__(self):
+        self.position_tick = 0
+        self.messages = 0
+        self.bytes = 0
+
+    def send(self, revision, data):
+        self.messages += 1
+        self.bytes += len(data)
+
+    def send_positions(self, tick, data):
+        self.send(None, data)
+        self.position_tick = tick
+
+
+def drag_steps(galaxy_ids, rng):
+    """(time, galaxy id, position) for each dragging dashboard's pointer moves."""
+    steps = []
+    for galaxy_id in galaxy_ids:
+        x, z = rng.uniform(-100, 100), rng.uniform(-100, 100)
+        for i in range(SECONDS * POINTER_RATE):
+            x, z = x + rng.uniform(-0.5, 0.5), z + rng.uniform(-0.5, 0.5)
+            steps.append(((i + rng.random()) / POINTER_RATE, galaxy_id, (x, 0.0, z)))
+    return sorted(steps)
+
+
+def run_patches(universe, steps, channels):
+    for _, galaxy_id, position in steps:
+        patch = universe.patch()
+        patch.set("galaxies", galaxy_id, "position", value=list(position))
+        data = universe.commit(patch)
+        for channel in channels:
+            channel.send(universe.revision, data)
+
+
+def run_feed(feed, steps, channels):
+    tick_end = feed.interval
+    for at, galaxy_id, position in steps:
+        while at >= tick_end:
+            feed.flush(channels)
+            tick_end += feed.interval
+        feed.move(galaxy_id, position)
+    feed.flush(channels)
+
+
+def main():
+    rng = random.Random(0)
+    galaxies = build_universe(galaxies=500, planets=4, traces=5)
+    print(f"{VIEWERS} dashboards watching, drag steps at {POINTER_RATE} Hz, {SECONDS} s")
+    print(f"{'dragging':>8} {'mode':>8} {'msgs/s':>7} {'bytes/s':>8} {'CPU ms/s':>9}")
+    for dragging in (1, 5, 20):
+        steps = drag_steps(rng.sample(sorted(galaxies), dragging), rng)
+        for mode in ("patches", "feed"):
+            channels = [FakeChannel() for _ in range(VIEWERS)]
+            start = time.process_time()
+            if mode == "patches":
+                universe = StateStore({"galaxies": GalaxyMap(galaxies), "optimizing_planets": []})
+                run_patches(universe, steps, channels)
+            else:
+                run_feed(PositionFeed(), steps, channels)
+            cpu = time.process_time() - start
+            viewer = channels[0]
+            print(f"{dragging:>8} {mode:>8} {viewer.messages / SECONDS:>7.0f} {viewer.bytes / SECONDS:>8.0f} "
+                  f"{cpu * 1000 / SECONDS:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Optimizer scheduling with one noisy agent: galaxy-0 starts 400 runs while
+nine other galaxies start 10 each. Compares free-running tasks (no cap, no
+budget, as the server used to behave) with the bounded scheduler. Reports
+evaluations per second, peak concurrent steps, event loop lag, and the share
+of evaluations the quiet galaxies received.
+
+    python benchmarks/bench_scheduler.py
+"""
+import asyncio
+import time
+
+import common  # noqa: F401  (sets up the import path)
+
+from scheduler import OptimizerScheduler
+
+NOISY_RUNS = 400
+QUIET_GALAXIES = 9
+QUIET_RUNS = 10
+DURATION = 5.0
+STEP_CPU_SECONDS = 0.0005  # Generating, evaluating and encoding a variant
+COOLDOWN = (0.05, 0.15)  # Scaled down from the server's 3-7 s
+
+
+async def measure(max_concurrent, budget):
+    evaluations = {}
+    in_step = 0
+    peak = 0
+
+    async def step(run):
+        nonlocal in_step, peak
+        in_step += 1
+        peak = max(peak, in_step)
+        deadline = time.perf_counter() + STEP_CPU_SECONDS
+        while time.perf_counter() < deadline:
+            pass
+        await asyncio.sleep(0)
+        in_step -= 1
+        evaluations[run.galaxy_id] = evaluations.get(run.galaxy_id, 0) + 1
+        return 0.5
+
+    async def finish(run):
+        pass
+
+    scheduler = OptimizerScheduler(step, finish, max_concurrent=max_concurrent,
+                                   evaluations_per_second=budget, cooldown=COOLDOWN)
+    for i in range(NOISY_RUNS):
+        scheduler.submit("galaxy-0", f"noisy-{i}", "bench", score_threshold=2.0)
+    for g in range(1, QUIET_GALAXIES + 1):
+        for i in range(QUIET_RUNS):
+            scheduler.submit(f"galaxy-{g}", f"quiet-{g}-{i}", "bench", score_threshold=2.0)
+
+    lags = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        before = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - before - 0.01)
+    await scheduler.close()
+    await asyncio.sleep(0.1)
+
+    total = sum(evaluations.values())
+    quiet = total - evaluations.get("galaxy-0", 0)
+    lags.sort()
+    return total / DURATION, peak, lags[len(lags) // 2], lags[int(len(lags) * 0.99)], quiet / max(total, 1)
+
+
+async def main():
+    runs = NOISY_RUNS + QUIET_GALAXIES * QUIET_RUNS
+    print(f"{runs} runs ({NOISY_RUNS} from one galaxy), {DURATION:.0f}s each")
+    print(f"{'':>26} {'evals/s':>8} {'peak steps':>11} {'lag p50 ms':>11} {'lag p99 ms':>11} {'quiet share':>12}")
+    for label, cap, budget in [("unbounded", runs, None), ("cap 50, 200 evals/s", 50, 200.0),
+                               ("cap 20, 100 evals/s", 20, 100.0)]:
+        rate, peak, lag50, lag99, quiet = await measure(cap, budget)
+        print(f"{label:>26} {rate:>8.0f} {peak:>11} {lag50 * 1000:>11.2f} {lag99 * 1000:>11.2f} {quiet:>11.0%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
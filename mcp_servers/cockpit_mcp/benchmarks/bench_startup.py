@@ -0,0 +1,93 @@
+"""
+Server startup with a large universe: starts server.py on a generated
+initial state file, then again on the snapshot that first run left behind,
+and polls /api/universe/summary throughout. Reports the time until the
+server answers, until the first galaxies show up in the summary and until
+the universe is fully loaded, plus how long the summary took to answer
+while the load was going on. Needs port 8080 to be free.
+
+    python benchmarks/bench_startup.py [galaxies]
+"""
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from common import build_universe
+
+GALAXIES = 6000
+PLANETS = 5
+TRACES = 5
+POLL_INTERVAL = 0.1
+TIMEOUT = 600
+SERVER = os.path.join(os.path.dirname(__file__), os.pardir, "server.py")
+SUMMARY_URL = "http://localhost:8080/api/universe/summary"
+
+
+def poll_summary():
+    """(seconds the request took, summary) or (None, None) if the server isn't answering."""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(SUMMARY_URL, timeout=5) as resp:
+            summary = json.load(resp)
+    except (urllib.error.URLError, ConnectionError):
+        return None, None
+    return time.perf_counter() - start, summary
+
+
+def start_server(state_dir, seed_file):
+    """Returns (answering, first galaxies, loaded) seconds after launch, and summary latencies while loading."""
+    env = dict(os.environ, COCKPIT_STATE_DIR=state_dir, COCKPIT_INITIAL_STATE=seed_file, COCKPIT_LOG_LEVEL="WARNING")
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, SERVER], env=env)
+    answering = first = loaded = None
+    latencies = []
+    try:
+        while loaded is None:
+            if time.perf_counter() - started > TIMEOUT:
+                raise RuntimeError("the server did not finish loading")
+            if process.poll() is not None:
+                raise RuntimeError(f"the server exited with {process.returncode}")
+            latency, summary = poll_summary()
+            now = time.perf_counter() - started
+            if summary is not None:
+                answering = answering if answering is not None else now
+                if summary["galaxies"] and first is None:
+                    first = now
+                if summary["loading"] is None:
+                    loaded = now
+                else:
+                    latencies.append(latency)
+            time.sleep(POLL_INTERVAL)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+    return answering, first, loaded, latencies
+
+
+def main():
+    galaxies = int(sys.argv[1]) if len(sys.argv) > 1 else GALAXIES
+    with tempfile.TemporaryDirectory() as directory:
+        seed_file = os.path.join(directory, "universe.json")
+        with open(seed_file, "w") as f:
+            json.dump(build_universe(galaxies, PLANETS, TRACES), f)
+        size = os.path.getsize(seed_file) / 2**20
+        state_dir = os.path.join(directory, "state")
+        print(f"{galaxies} galaxies x {PLANETS} planets x {TRACES} traces, {size:.0f} MiB state file")
+        print(f"{'start':>12} {'answering s':>12} {'first gal. s':>13} {'loaded s':>9} "
+              f"{'summary ms (median/max while loading)':>38}")
+        for name in ("initial file", "snapshot"):
+            answering, first, loaded, latencies = start_server(state_dir, seed_file)
+            latency = (f"{statistics.median(latencies) * 1000:.0f} / {max(latencies) * 1000:.0f}"
+                       if latencies else "-")
+            print(f"{name:>12} {answering:>12.2f} {first or loaded:>13.2f} {loaded:>9.2f} {latency:>38}")
+
+
+if __name__ == "__main__":
+    main()
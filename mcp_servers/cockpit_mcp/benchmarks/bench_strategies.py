@@ -0,0 +1,78 @@
+"""
+Evaluations needed to reach the score threshold for each search strategy,
+against the old random walk (a random modifier appended to the deployed
+prompt every step). Uses the built-in score judge, in which each modifier
+helps or hurts a given prompt by a fixed amount plus noise. Seeded, so
+runs are reproducible.
+
+    python benchmarks/bench_strategies.py
+"""
+import random
+import statistics
+
+import common  # noqa: F401  (sets up the import path)
+
+from judges import ScoreJudge
+from prompts import PROMPT_MODIFIERS, build_prompt, normalize_prompt
+from strategies import STRATEGIES
+
+PROBLEMS = 50  # Different base prompts, so different helpful modifiers
+DEPLOYED_SCORE = 0.7
+SCORE_THRESHOLD = 0.85
+CANDIDATES_PER_STEP = 4
+MAX_EVALUATIONS = 300
+
+
+def legacy_walk(base, judge, rng):
+    """What run_continuous_optimization did: no memory of past scores, no dedup."""
+    evaluations = 0
+    seen = set()
+    while evaluations < MAX_EVALUATIONS:
+        text = f"{base} [{rng.choice(PROMPT_MODIFIERS)}]"
+        evaluations += 1
+        seen.add(text)
+        if judge.evaluate(text, DEPLOYED_SCORE) >= SCORE_THRESHOLD:
+            return evaluations, len(seen)
+    return None, len(seen)
+
+
+def search(cls, base, judge, rng):
+    strategy = cls(base, PROMPT_MODIFIERS, start_score=DEPLOYED_SCORE, rng=rng)
+    cache = {}
+    while len(cache) < MAX_EVALUATIONS:
+        combos = strategy.propose(CANDIDATES_PER_STEP)
+        if not combos:
+            break
+        for combo in combos:
+            key = normalize_prompt(build_prompt(base, combo))
+            if key not in cache:
+                cache[key] = judge.evaluate(strategy.prompt(combo), DEPLOYED_SCORE)
+            strategy.observe(combo, cache[key])
+        if strategy.best_score >= SCORE_THRESHOLD:
+            return len(cache), len(cache)
+    return None, len(cache)
+
+
+def main():
+    judge = ScoreJudge()
+    print(f"{PROBLEMS} prompts, deployed score {DEPLOYED_SCORE}, threshold {SCORE_THRESHOLD}, "
+          f"{CANDIDATES_PER_STEP} candidates per step, at most {MAX_EVALUATIONS} evaluations")
+    print(f"{'':>20} {'reached':>8} {'mean evals':>11} {'median':>7} {'unique prompts':>15}")
+    runners = [("old random walk", legacy_walk)]
+    runners += [(name, lambda base, judge, rng, cls=cls: search(cls, base, judge, rng))
+                for name, cls in STRATEGIES.items()]
+    for name, runner in runners:
+        needed, unique = [], []
+        for problem in range(PROBLEMS):
+            random.seed(problem)  # The judge's noise
+            evaluations, distinct = runner(f"Answer customer inquiry type {problem}.", judge, random.Random(problem))
+            unique.append(distinct)
+            if evaluations is not None:
+                needed.append(evaluations)
+        mean = f"{statistics.mean(needed):.1f}" if needed else "-"
+        median = f"{statistics.median(needed):.0f}" if needed else "-"
+        print(f"{name:>20} {len(needed):>5}/{PROBLEMS} {mean:>11} {median:>7} {statistics.mean(unique):>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
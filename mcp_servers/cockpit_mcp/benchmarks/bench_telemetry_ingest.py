@@ -0,0 +1,99 @@
+"""
+Telemetry ingestion throughput: one POST per agent versus batched JSON and
+streamed NDJSON requests. Reports planet updates per second and how many
+broadcasts (state revisions) the ingestion produced.
+
+    python benchmarks/bench_telemetry_ingest.py
+"""
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+from common import build_universe
+
+import server
+
+AGENTS = 500
+PLANETS_PER_AGENT = 4
+ROUNDS = 4
+BATCH_SIZE = 100
+CONCURRENCY = 32
+
+
+def agent_record(rng: random.Random, agent_id: str):
+    return {
+        "agent_id": agent_id,
+        "planets": [
+            {"id": f"{agent_id}-p{p}",
+             "deployedVersion": {"id": f"v{rng.randint(0, 10**6)}", "text": "prompt",
+                                 "evaluation": {"score": rng.random(), "speed": rng.randint(50, 500)}}}
+            for p in range(PLANETS_PER_AGENT)
+        ],
+    }
+
+
+async def run_single(session, base, records):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def post(record):
+        async with semaphore:
+            async with session.post(f"{base}/api/telemetry", json=record) as resp:
+                assert resp.status == 200, await resp.text()
+
+    await asyncio.gather(*(post(r) for r in records))
+
+
+async def run_batch(session, base, records):
+    for i in range(0, len(records), BATCH_SIZE):
+        async with session.post(f"{base}/api/telemetry/batch", json={"agents": records[i:i + BATCH_SIZE]}) as resp:
+            assert resp.status == 200, await resp.text()
+
+
+async def run_ndjson(session, base, records):
+    async def body():
+        for record in records:
+            yield (json.dumps(record) + "\n").encode()
+
+    async with session.post(f"{base}/api/telemetry/batch", data=body(),
+                            headers={"Content-Type": "application/x-ndjson"}) as resp:
+        assert resp.status == 200, await resp.text()
+
+
+async def main():
+    await server.load_state()
+    server.state_loaded.set()
+    patch = server.universe.patch()
+    for galaxy_id, galaxy in build_universe(AGENTS, PLANETS_PER_AGENT, traces=0).items():
+        patch.set("galaxies", galaxy_id, value=galaxy)
+    server.publish(patch)
+    flusher = asyncio.create_task(server.telemetry_batcher.run())
+
+    test_server = TestServer(server.create_app())
+    await test_server.start_server()
+    base = str(test_server.make_url("")).rstrip("/")
+    rng = random.Random(0)
+
+    print(f"{AGENTS} agents x {PLANETS_PER_AGENT} planets, {ROUNDS} rounds")
+    print(f"{'mode':>8} {'requests':>9} {'updates/s':>10} {'broadcasts':>11}")
+    async with aiohttp.ClientSession() as session:
+        for name, run in (("single", run_single), ("batch", run_batch), ("ndjson", run_ndjson)):
+            records = [agent_record(rng, f"galaxy-{a}") for _ in range(ROUNDS) for a in range(AGENTS)]
+            requests = {"single": len(records), "batch": -(-len(records) // BATCH_SIZE), "ndjson": 1}[name]
+            revision = server.universe.revision
+            start = time.perf_counter()
+            await run(session, base, records)
+            await server.telemetry_batcher.flush()
+            elapsed = time.perf_counter() - start
+            updates = len(records) * PLANETS_PER_AGENT
+            print(f"{name:>8} {requests:>9} {updates / elapsed:>10.0f} {server.universe.revision - revision:>11}")
+
+    flusher.cancel()
+    await test_server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
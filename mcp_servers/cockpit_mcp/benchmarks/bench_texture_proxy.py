@@ -0,0 +1,96 @@
+"""
+Texture proxy against a local stub upstream (no internet needed): a fresh
+HTTP client per request, as the proxy used to work, versus the pooled,
+coalescing, cached TextureProxy. Reports wall time and upstream hits for a
+burst of dashboard page loads.
+
+    python benchmarks/bench_texture_proxy.py
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import common  # noqa: F401  (sets up the import path)
+
+from textures import TextureProxy
+
+PAGE_LOADS = 10
+PLANETS = 40  # Textures requested per page load
+UPSTREAM_LATENCY = 0.05
+IMAGE = b"\x89PNG\r\n\x1a\n" + os.urandom(64 * 1024)
+
+
+async def start_stub():
+    hits = {"count": 0}
+
+    async def image(request):
+        hits["count"] += 1
+        await asyncio.sleep(UPSTREAM_LATENCY)
+        return web.Response(body=IMAGE, content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", image)
+    server = TestServer(app)
+    await server.start_server()
+    return server, hits
+
+
+def stub_urls(base):
+    proxy = TextureProxy(upstream=base)
+    return [proxy.url_for("pokemon" if i % 2 else "cats", f"planet-{i}") for i in range(PLANETS)]
+
+
+async def page_loads(fetch, urls):
+    # Every page load requests all textures at once, and loads overlap
+    await asyncio.gather(*(fetch(url) for _ in range(PAGE_LOADS) for url in urls))
+
+
+async def main():
+    server, hits = await start_stub()
+    base = str(server.make_url("/"))
+    urls = stub_urls(base)
+    print(f"{PAGE_LOADS} page loads x {PLANETS} textures, {UPSTREAM_LATENCY * 1000:.0f} ms upstream latency")
+    print(f"{'':>28} {'wall ms':>8} {'upstream hits':>14}")
+
+    async def fetch_unpooled(url):
+        async with httpx.AsyncClient() as client:
+            resp = await client.get(url, timeout=15.0)
+            resp.raise_for_status()
+            return resp.content
+
+    def report(label, start, before):
+        print(f"{label:>28} {(time.perf_counter() - start) * 1000:>8.0f} {hits['count'] - before:>14}")
+
+    before, start = hits["count"], time.perf_counter()
+    await page_loads(fetch_unpooled, urls)
+    report("client per request", start, before)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        proxy = TextureProxy(cache_dir=cache_dir, upstream=base)
+        before, start = hits["count"], time.perf_counter()
+        await page_loads(proxy.get, urls)
+        report("proxy, cold", start, before)
+
+        before, start = hits["count"], time.perf_counter()
+        await page_loads(proxy.get, urls)
+        report("proxy, memory cache", start, before)
+        await proxy.close()
+        await asyncio.sleep(0.2)  # Let the disk writes land
+
+        restarted = TextureProxy(cache_dir=cache_dir, upstream=base)
+        before, start = hits["count"], time.perf_counter()
+        await page_loads(restarted.get, urls)
+        report("proxy, disk cache (restart)", start, before)
+        print(f"\nrestarted proxy: {restarted.stats()}")
+        await restarted.close()
+
+    await server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""
+Memory and range-query latency of the metric trend history for 10k planets
+holding a day of 1 Hz samples, plus the cost of recording a sample.
+
+Replaying 864M samples would take hours in Python, so one planet is fed a
+real day at 1 Hz and the others get copies of its buckets; ring buffers are
+preallocated, so the memory is the same either way.
+
+    python benchmarks/bench_timeseries.py
+"""
+import random
+import statistics
+import time
+import tracemalloc
+from array import array
+
+import common  # noqa: F401  (sets up the import path)
+
+from timeseries import TimeSeriesStore
+
+PLANETS = 10_000
+PLANETS_PER_GALAXY = 100
+METRICS = ("score", "factuality", "hallucination", "speed")
+DAY = 86_400
+QUERIES = 200
+
+
+def sample(rng):
+    return {"score": rng.random(), "factuality": rng.random(), "hallucination": rng.random() * 0.3,
+            "speed": rng.randint(50, 500)}
+
+
+def main():
+    rng = random.Random(0)
+    now = time.time()
+    start = now - DAY
+
+    tracemalloc.start()
+    store = TimeSeriesStore(METRICS)
+    began = time.perf_counter()
+    for second in range(DAY):
+        store.record("template", sample(rng), start + second)
+    day_seconds = time.perf_counter() - began
+    template = store._series.pop("template")
+    for i in range(PLANETS):
+        store._series[f"planet-{i}"] = rings = [type(ring)(ring.width, ring.size, ring.metrics) for ring in template]
+        for ring, source in zip(rings, template):
+            for column in ("bucket", "count", "low", "high", "total"):
+                setattr(ring, column, array(getattr(source, column).typecode, getattr(source, column)))
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples = [(f"planet-{i % PLANETS}", sample(rng)) for i in range(100_000)]
+    began = time.perf_counter()
+    for key, values in samples:
+        store.record(key, values, now)
+    record_us = (time.perf_counter() - began) / len(samples) * 1e6
+
+    print(f"{PLANETS} planets x {len(METRICS)} metrics, a day at 1 Hz; tiers {store.tiers}")
+    print(f"memory: {used / 2**20:.0f} MiB total, {used / PLANETS / 1024:.1f} KiB per planet "
+          f"(stats() says {store.stats()['bytes_per_series'] / 1024:.1f} KiB of columns)")
+    print(f"record: {record_us:.1f} us per sample ({DAY} samples into one planet in {day_seconds:.1f} s)")
+
+    cases = [
+        ("planet, last 5 min @ 1 s", lambda: [f"planet-{rng.randrange(PLANETS)}"], now - 300, 1),
+        ("planet, last hour @ 1 min", lambda: [f"planet-{rng.randrange(PLANETS)}"], now - 3600, 60),
+        ("planet, last day @ 1 min", lambda: [f"planet-{rng.randrange(PLANETS)}"], now - DAY, 60),
+        ("planet, last day @ 1 h", lambda: [f"planet-{rng.randrange(PLANETS)}"], now - DAY, 3600),
+        (f"galaxy of {PLANETS_PER_GALAXY}, last day @ 1 h",
+         lambda: [f"planet-{i}" for i in rng.sample(range(PLANETS), PLANETS_PER_GALAXY)], now - DAY, 3600),
+        (f"galaxy of {PLANETS_PER_GALAXY}, last hour @ 1 min",
+         lambda: [f"planet-{i}" for i in rng.sample(range(PLANETS), PLANETS_PER_GALAXY)], now - 3600, 60),
+    ]
+    print(f"{'query':>36} {'points':>7} {'p50 ms':>7} {'p99 ms':>7}")
+    for name, keys, since, width in cases:
+        times = []
+        for _ in range(QUERIES):
+            chosen = keys()
+            began = time.perf_counter()
+            result = store.query(chosen, since, now, width)
+            times.append((time.perf_counter() - began) * 1000)
+        times.sort()
+        print(f"{name:>36} {len(result['t']):>7} {statistics.median(times):>7.2f} {times[int(len(times) * 0.99)]:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
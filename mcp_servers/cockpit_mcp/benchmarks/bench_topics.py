@@ -0,0 +1,105 @@
+"""
+Bytes queued for dashboards and CPU spent routing, when every client takes
+the full patch stream versus when clients subscribe to the scope they show
+(universe summary, one galaxy or one planet).
+
+    python benchmarks/bench_topics.py
+"""
+import random
+import time
+
+from common import build_universe, make_variant
+
+from models import GalaxyMap
+from state_store import StateStore
+from topics import UNIVERSE, TopicRouter
+
+GALAXIES = 20
+PLANETS = 10
+CLIENTS = 100
+PATCHES = 2_000
+# Share of dashboards at each zoom level when they subscribe to topics
+MIXES = {
+    "all universe": (1.0, 0.0, 0.0),
+    "20/60/20": (0.2, 0.6, 0.2),
+    "all planet": (0.0, 0.0, 1.0),
+}
+
+
+class CountingChannel:
+    """Stands in for fanout.ClientChannel; counts what would be queued."""
+
+    def __init__(self):
+        self.topics = None
+        self.messages = 0
+        self.bytes = 0
+
+    def send(self, revision, data):
+        self.messages += 1
+        self.bytes += len(data)
+
+
+def build():
+    store = StateStore({"galaxies": GalaxyMap(build_universe(GALAXIES, PLANETS, traces=15)), "optimizing_planets": []})
+    return store, TopicRouter(store)
+
+
+def optimizer_patch(store, rng, index):
+    """What the optimizer loop and telemetry produce most of the time."""
+    galaxy_id = f"galaxy-{rng.randrange(GALAXIES)}"
+    planet_id = f"{galaxy_id}-p{rng.randrange(PLANETS)}"
+    patch = store.patch()
+    if rng.random() < 0.8:
+        patch.insert("galaxies", galaxy_id, "planets", planet_id, "traceHistory",
+                     value=make_variant(rng, 10**6 + index), limit=15)
+    else:
+        patch.set("galaxies", galaxy_id, "status", value=rng.choice(["stable", "critical", "optimizing"]))
+    return patch
+
+
+def run(mix):
+    store, router = build()
+    rng = random.Random(0)
+    channels = [CountingChannel() for _ in range(CLIENTS)]
+    if mix is not None:
+        for channel in channels:
+            galaxy_id = f"galaxy-{rng.randrange(GALAXIES)}"
+            pick = rng.random()
+            if pick < mix[0]:
+                topic = UNIVERSE
+            elif pick < mix[0] + mix[1]:
+                topic = ("galaxy", galaxy_id)
+            else:
+                topic = ("planet", galaxy_id, f"{galaxy_id}-p{rng.randrange(PLANETS)}")
+            router.subscribe(channel, topic)
+    for channel in channels:
+        channel.messages = channel.bytes = 0  # Only count the updates
+
+    rng = random.Random(1)
+    elapsed = 0.0
+    for i in range(PATCHES):
+        patch = optimizer_patch(store, rng, i)
+        start = time.process_time()
+        data = store.commit(patch)
+        for channel in channels:
+            if channel.topics is None:
+                channel.send(store.revision, data)
+        router.publish(store.revision, patch)
+        elapsed += time.process_time() - start
+    return sum(c.bytes for c in channels), sum(c.messages for c in channels), elapsed
+
+
+def main():
+    print(f"{CLIENTS} dashboards, {PATCHES} patches, {GALAXIES} galaxies x {PLANETS} planets")
+    print(f"{'subscriptions':>22} {'MiB queued':>11} {'messages':>9} {'fan-out CPU ms':>15}")
+    full_bytes, messages, elapsed = run(None)
+    print(f"{'full stream':>22} {full_bytes / 2**20:>11.2f} {messages:>9} {elapsed * 1000:>15.1f}")
+    for name, mix in MIXES.items():
+        total, messages, elapsed = run(mix)
+        label = f"topics ({name})"
+        print(f"{label:>22} {total / 2**20:>11.2f} {messages:>9} {elapsed * 1000:>15.1f}"
+              f"   {full_bytes / max(total, 1):.0f}x less")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Bandwidth and server CPU of each WebSocket wire format for a 500-galaxy
+universe: the initial snapshot and a stream of optimization patches as the
+server commits them, fanned out to 500 dashboards.
+
+"json+pmd" is JSON text with permessage-deflate negotiated per socket (what
+browsers get from aiohttp by default): every socket keeps its own
+compressor, so every message is compressed once per client. The binary
+formats are encoded once per message through the frame cache.
+
+    python benchmarks/bench_wire.py
+"""
+import random
+import time
+import zlib
+
+from common import MODIFIERS, build_universe, make_variant
+
+from models import GalaxyMap
+from state_store import StateStore
+from wire import FrameCache, build_dictionary
+
+GALAXIES = 500
+PLANETS = 4
+TRACES = 5
+CLIENTS = 500
+PATCHES = 2000
+
+
+def optimization_patches(universe, rng):
+    """Patches shaped like the optimizer's: comet progress, traces and deploys."""
+    messages = []
+    galaxy_ids = list(universe.document["galaxies"])
+    for step in range(PATCHES):
+        galaxy_id = rng.choice(galaxy_ids)
+        planet_id = f"{galaxy_id}-p{rng.randrange(PLANETS)}"
+        variant = make_variant(rng, 10**6 + step)
+        patch = universe.patch()
+        patch.set("galaxies", galaxy_id, "comets",
+                  value=[{"id": f"comet-{planet_id}", "planet_id": planet_id, "progress": rng.random()}])
+        patch.insert("galaxies", galaxy_id, "planets", planet_id, "traceHistory", value=variant, limit=TRACES)
+        if step % 5 == 0:
+            patch.set("galaxies", galaxy_id, "planets", planet_id, "deployedVersion", value=dict(variant, isDeployed=True))
+        messages.append(universe.commit(patch))
+    return messages
+
+
+class PerSocketDeflate:
+    """permessage-deflate as aiohttp does it: level 1, context kept per socket."""
+
+    def __init__(self):
+        self.compressor = zlib.compressobj(1, zlib.DEFLATED, -zlib.MAX_WBITS)
+
+    def encode(self, data):
+        return self.compressor.compress(data.encode("utf-8")) + self.compressor.flush(zlib.Z_SYNC_FLUSH)[:-4]
+
+
+def fan_out(fmt, messages, frames, clients=CLIENTS):
+    """
+    Returns (bytes per client, server CPU seconds) to send `messages` to
+    `clients` sockets. Text frames are UTF-8 encoded per socket, as send_str does.
+    """
+    sent = 0
+    start = time.process_time()
+    if fmt == "json+pmd":
+        sockets = [PerSocketDeflate() for _ in range(clients)]
+        for data in messages:
+            for socket in sockets:
+                size = len(socket.encode(data))
+            sent += size
+    else:
+        for data in messages:
+            for _ in range(clients):
+                size = len(frames.encode(data, fmt) if fmt != "json" else data.encode("utf-8"))
+            sent += size
+    return sent, time.process_time() - start
+
+
+def main():
+    rng = random.Random(0)
+    universe = StateStore({"galaxies": GalaxyMap(build_universe(GALAXIES, PLANETS, TRACES)), "optimizing_planets": []})
+    snapshot = universe.snapshot()
+    patches = optimization_patches(universe, rng)
+
+    print(f"{GALAXIES} galaxies x {PLANETS} planets x {TRACES} traces, {CLIENTS} clients, {PATCHES} patches")
+    print(f"{'format':>9} {'snapshot KiB':>13} {'ms':>7} {'patch B':>8} {'CPU ms/patch':>13} {'KiB/s/client @10/s':>19}")
+    print(f"{'':>9} {'(one client)':>13} {'':>7} {'':>8} {f'({CLIENTS} clients)':>13}")
+    for fmt in ("json", "json+pmd", "deflate", "msgpack"):
+        frames = FrameCache(build_dictionary(MODIFIERS))
+        # The snapshot goes to one client at a time, as dashboards connect
+        snapshot_bytes, snapshot_seconds = fan_out(fmt, [snapshot], frames, clients=1)
+        patch_bytes, patch_seconds = fan_out(fmt, patches, frames)
+        per_patch = patch_bytes / PATCHES
+        print(f"{fmt:>9} {snapshot_bytes / 1024:>13.0f} {snapshot_seconds * 1000:>7.1f} {per_patch:>8.0f} "
+              f"{patch_seconds * 1000 / PATCHES:>13.3f} {per_patch * 10 / 1024:>19.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Shared helpers for the cockpit server benchmarks."""
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict
+
+# Benchmarks live next to the server modules; make them importable.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+MODIFIERS = [
+    "Be more direct.", "Use simpler language.", "Adopt a professional tone.",
+    "Focus on the key takeaways.", "Provide a step-by-step guide.", "Cite sources.",
+]
+
+
+def make_variant(rng: random.Random, index: int, deployed: bool = False) -> Dict[str, Any]:
+    """Builds a variant dict shaped like the ones the server generates."""
+    text = "Initial prompt for classifying customer inquiries."
+    for _ in range(rng.randint(0, 6)):
+        text = f"{text} [{rng.choice(MODIFIERS)}]"
+    return {
+        "id": f"var_{index}_{rng.randint(1000, 9999)}",
+        "text": text,
+        "evaluation": {
+            "score": rng.random(),
+            "factuality": rng.choice(["Meets Expectations", "Exceeds Expectations", "Needs Improvement"]),
+            "hallucination": "Detected" if rng.random() < 0.1 else "Not Detected",
+            "speed": rng.randint(50, 500),
+        },
+        "timestamp": "2025-01-01T12:00:00.000000Z",
+        "isDeployed": deployed,
+    }
+
+
+def build_universe(galaxies: int, planets: int, traces: int, seed: int = 0) -> Dict[str, Any]:
+    """Builds a synthetic `galaxies` dict of the given size."""
+    rng = random.Random(seed)
+    universe = {}
+    counter = 0
+    for g in range(galaxies):
+        galaxy_id = f"galaxy-{g}"
+        planet_list = []
+        for p in range(planets):
+            counter += 1
+            history = []
+            for _ in range(traces):
+                counter += 1
+                history.append(make_variant(rng, counter))
+            planet_list.append({
+                "id": f"{galaxy_id}-p{p}",
+                "name": f"Planet-{p}",
+                "orbitRadius": rng.uniform(10, 40),
+                "status": "active",
+                "deployedVersion": make_variant(rng, counter, deployed=True),
+                "traceHistory": history,
+            })
+        universe[galaxy_id] = {
+            "id": galaxy_id,
+            "name": f"Agent {g}",
+            "position": [rng.uniform(-100, 100), 0, rng.uniform(-100, 100)],
+            "theme": {"hue": rng.random()},
+            "status": "stable",
+            "status_message": "All systems operating within normal parameters.",
+            "config": {"metricMapping": {"planetSize": "score"}, "opikMetrics": []},
+            "planets": planet_list,
+            "comets": [],
+        }
+    return universe
+
+
+def cpu_time(fn: Callable[[], Any], repeat: int) -> float:
+    """Returns the mean CPU seconds per call of fn over `repeat` calls."""
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat
@@ -0,0 +1,283 @@
+"""
+Load generator for the cockpit server's HTTP and WebSocket paths.
+
+Simulates N agents posting telemetry, M dashboards connected to /ws and K
+concurrent optimizer runs, then reports request latency percentiles,
+broadcast fan-out latency (telemetry POST sent -> patch received by each
+dashboard), WebSocket messages per second and the server's RSS.
+
+    # Against a server started here, with a throwaway state directory
+    python benchmarks/load_test.py --spawn --agents 200 --dashboards 50 --optimizers 20
+
+    # Against an already running server (pass its pid to sample RSS)
+    python benchmarks/load_test.py --url http://localhost:8080 --pid 12345
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "server.py")
+# Telemetry variant ids carry the send time, so dashboards can time delivery
+MARKER = "lt-"
+
+
+def percentile(samples: List[float], fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def read_rss(pid: Optional[int]) -> Optional[int]:
+    """Returns the resident set size of a process in bytes (Linux only)."""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class Results:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.fanout: List[float] = []
+        self.messages = 0
+        self.message_bytes = 0
+        self.rss: List[int] = []
+        self.duration = 0.0
+
+    def record(self, name: str, started: float, ok: bool) -> None:
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+async def timed(results: Results, session: aiohttp.ClientSession, name: str, method: str, url: str, **kwargs) -> Optional[int]:
+    started = time.perf_counter()
+    try:
+        async with session.request(method, url, **kwargs) as resp:
+            await resp.read()
+            results.record(name, started, resp.status < 400)
+            return resp.status
+    except aiohttp.ClientError:
+        results.record(name, started, False)
+        return None
+
+
+def telemetry_record(rng: random.Random, agent_id: str, planets: int) -> dict:
+    sent = time.perf_counter()
+    return {
+        "agent_id": agent_id,
+        "planets": [
+            {
+                "id": f"{agent_id}-p{p}",
+                "name": f"Load planet {p}",
+                "deployedVersion": {
+                    "id": f"{MARKER}{sent!r}-{rng.randrange(10**6)}",
+                    "text": "Load test prompt.",
+                    "evaluation": {"score": round(rng.uniform(0.3, 0.99), 3), "speed": rng.randint(50, 500)},
+                    "isDeployed": True,
+                },
+            }
+            for p in range(planets)
+        ],
+    }
+
+
+async def agent(results: Results, session, base: str, agent_id: str, args, stop: asyncio.Event) -> None:
+    rng = random.Random(agent_id)
+    interval = 1.0 / args.rate
+    await asyncio.sleep(rng.uniform(0, interval))
+    while not stop.is_set():
+        started = time.perf_counter()
+        await timed(results, session, "POST /api/telemetry", "POST", f"{base}/api/telemetry",
+                    json=telemetry_record(rng, agent_id, args.planets))
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+
+async def dashboard(results: Results, session, base: str, ready: asyncio.Event, stop: asyncio.Event) -> None:
+    async with session.ws_connect(f"{base}/ws", max_msg_size=0) as ws:
+        ready.set()
+        while not stop.is_set():
+            try:
+                msg = await asyncio.wait_for(ws.receive(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                break
+            received = time.perf_counter()
+            results.messages += 1
+            results.message_bytes += len(msg.data)
+            if MARKER not in msg.data:
+                continue
+            message = json.loads(msg.data)
+            for op in message.get("ops", []):
+                value = op.get("value")
+                variant_id = value.get("id", "") if isinstance(value, dict) else ""
+                if variant_id.startswith(MARKER):
+                    sent = float(variant_id[len(MARKER):].split("-")[0])
+                    results.fanout.append(received - sent)
+
+
+async def optimizer(results: Results, session, base: str, galaxy_id: str, planet_id: str, stop: asyncio.Event) -> None:
+    body = {"galaxy_id": galaxy_id, "planet_id": planet_id, "score_threshold": 2.0}  # Never reached
+    await timed(results, session, "POST /api/optimizer/start", "POST", f"{base}/api/optimizer/start", json=body)
+    await stop.wait()
+    await timed(results, session, "POST /api/optimizer/stop", "POST", f"{base}/api/optimizer/stop",
+                json={"planet_id": planet_id})
+
+
+async def sample_rss(results: Results, pid: Optional[int], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        rss = read_rss(pid)
+        if rss is not None:
+            results.rss.append(rss)
+        await asyncio.sleep(0.5)
+
+
+async def wait_for_server(base: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(f"{base}/api/clients") as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server at {base} did not come up")
+            await asyncio.sleep(0.2)
+
+
+async def run(args, base: str, pid: Optional[int]) -> Results:
+    results = Results()
+    stop = asyncio.Event()
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        agent_ids = [f"load-agent-{i}" for i in range(args.agents)]
+        await asyncio.gather(*(timed(results, session, "POST /api/onboard", "POST", f"{base}/api/onboard",
+                                     json={"id": agent_id, "name": agent_id}) for agent_id in agent_ids))
+        # Seed every agent's planets so optimizers have something to run on
+        rng = random.Random(0)
+        await asyncio.gather(*(timed(results, session, "POST /api/telemetry", "POST", f"{base}/api/telemetry",
+                                     json=telemetry_record(rng, agent_id, args.planets)) for agent_id in agent_ids))
+        await asyncio.sleep(0.5)
+
+        tasks = [asyncio.create_task(sample_rss(results, pid, stop))]
+        ws_session = aiohttp.ClientSession()  # Sockets don't count against the HTTP pool
+        readies = []
+        for _ in range(args.dashboards):
+            ready = asyncio.Event()
+            readies.append(ready)
+            tasks.append(asyncio.create_task(dashboard(results, ws_session, base, ready, stop)))
+        await asyncio.gather(*(ready.wait() for ready in readies))
+
+        for i in range(min(args.optimizers, args.agents * args.planets)):
+            agent_id = agent_ids[i % args.agents]
+            planet_id = f"{agent_id}-p{(i // args.agents) % args.planets}"
+            tasks.append(asyncio.create_task(optimizer(results, session, base, agent_id, planet_id, stop)))
+
+        results.latencies.pop("POST /api/telemetry", None)  # Only time the steady state
+        results.errors.pop("POST /api/telemetry", None)
+        results.messages = results.message_bytes = 0
+        started = time.perf_counter()
+        tasks += [asyncio.create_task(agent(results, session, base, agent_id, args, stop)) for agent_id in agent_ids]
+        await asyncio.sleep(args.duration)
+        stop.set()
+        results.duration = time.perf_counter() - started
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await ws_session.close()
+
+        await asyncio.gather(*(timed(results, session, "DELETE /api/agent", "DELETE", f"{base}/api/agent/{agent_id}")
+                               for agent_id in agent_ids))
+    return results
+
+
+def report(args, results: Results) -> dict:
+    ms = lambda value: round(value * 1000, 2) if value is not None else None  # noqa: E731
+    summary = {
+        "config": {k: getattr(args, k) for k in ("agents", "planets", "rate", "dashboards", "optimizers", "duration")},
+        "requests": {
+            name: {"count": len(samples), "errors": results.errors.get(name, 0),
+                   "p50_ms": ms(percentile(samples, 0.5)), "p99_ms": ms(percentile(samples, 0.99))}
+            for name, samples in sorted(results.latencies.items())
+        },
+        "fanout": {"count": len(results.fanout), "p50_ms": ms(percentile(results.fanout, 0.5)),
+                   "p99_ms": ms(percentile(results.fanout, 0.99))},
+        "ws_messages_per_s": round(results.messages / results.duration, 1),
+        "ws_mib_per_s": round(results.message_bytes / results.duration / 2**20, 2),
+        "server_rss_mib": {"start": round(results.rss[0] / 2**20, 1), "peak": round(max(results.rss) / 2**20, 1),
+                           "end": round(results.rss[-1] / 2**20, 1)} if results.rss else None,
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return summary
+
+    config = summary["config"]
+    print(f"{config['agents']} agents x {config['planets']} planets at {config['rate']}/s, "
+          f"{config['dashboards']} dashboards, {config['optimizers']} optimizers, {config['duration']}s")
+    print(f"{'':>28} {'count':>7} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, row in summary["requests"].items():
+        print(f"{name:>28} {row['count']:>7} {row['errors']:>7} {row['p50_ms']:>8} {row['p99_ms']:>8}")
+    fanout = summary["fanout"]
+    print(f"{'telemetry -> dashboard':>28} {fanout['count']:>7} {'':>7} {fanout['p50_ms']!s:>8} {fanout['p99_ms']!s:>8}")
+    print(f"ws messages/s: {summary['ws_messages_per_s']} ({summary['ws_mib_per_s']} MiB/s)")
+    if summary["server_rss_mib"]:
+        rss = summary["server_rss_mib"]
+        print(f"server RSS MiB: start {rss['start']}, peak {rss['peak']}, end {rss['end']}")
+    return summary
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--spawn", action="store_true", help="start server.py with a temporary state directory")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for --spawn (COCKPIT_WORKERS)")
+    parser.add_argument("--pid", type=int, help="server process to sample RSS from")
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--planets", type=int, default=3, help="planets per agent")
+    parser.add_argument("--rate", type=float, default=2.0, help="telemetry posts per agent per second")
+    parser.add_argument("--dashboards", type=int, default=20)
+    parser.add_argument("--optimizers", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of steady-state load")
+    parser.add_argument("--connections", type=int, default=100, help="HTTP connection pool size")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    process = None
+    pid = args.pid
+    state_dir = None
+    if args.spawn:
+        state_dir = tempfile.TemporaryDirectory()
+        env = dict(os.environ, COCKPIT_STATE_DIR=state_dir.name, COCKPIT_WORKERS=str(args.workers))
+        process = subprocess.Popen([sys.executable, SERVER], env=env, stdout=subprocess.DEVNULL)
+        pid = process.pid
+    try:
+        await wait_for_server(args.url)
+        results = await run(args, args.url, pid)
+        report(args, results)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            state_dir.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from wire import decode_message
+
+logger = logging.getLogger(__name__)
+
+# --- Cluster mode ---
+# With several workers, one of them (the leader) owns the authoritative state:
+# it runs every mutation, the optimizer, telemetry and the state log, exactly
+# as a single server does. Each committed patch message is published on a
+# broker. The other workers (replicas) keep a copy of the state by applying
+# those messages in revision order, and serve reads and WebSockets from it;
+# writes they receive are forwarded to the leader. All workers listen on the
+# same port (SO_REUSEPORT), so the kernel spreads connections across them.
+# Messages outside the versioned state (live galaxy positions) go over the
+# same broker without a revision; replicas hand them to `on_event`.
+
+
+class Broker:
+    """
+    Carries the leader's patch messages to the replicas, in order.
+
+    `publish` never blocks; implementations queue or buffer as needed and
+    must deliver messages in the order they were published.
+    """
+
+    async def start(self) -> None:
+        pass
+
+    def publish(self, data: str) -> None:
+        raise NotImplementedError
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        """
+        Subscribes, and returns an iterator over the messages published from
+        then on. The iterator raises ConnectionError if the connection is lost.
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class LocalBroker(Broker):
+    """Delivers to subscribers in the same process; for tests and benchmarks."""
+
+    def __init__(self):
+        self._queues: Set[asyncio.Queue] = set()
+        self.published = 0
+
+    def publish(self, data: str) -> None:
+        self.published += 1
+        for queue in self._queues:
+            queue.put_nowait(data)
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._queues.add(queue)
+
+        async def messages() -> AsyncIterator[str]:
+            try:
+                while True:
+                    yield await queue.get()
+            finally:
+                self._queues.discard(queue)
+        return messages()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "local", "published": self.published, "subscribers": len(self._queues)}
+
+
+class UnixSocketBroker(Broker):
+    """
+    A hub on a Unix socket, run by the leader. Replicas connect and receive
+    every published message as one line (encoded messages never contain a
+    raw newline). A subscriber that stops reading is disconnected once
+    `max_buffer` bytes are waiting for it; it reconnects and resyncs.
+    """
+
+    def __init__(self, path: str, serve: bool = False, max_buffer: int = 16 * 2**20):
+        self.path = path
+        self.serve = serve
+        self.max_buffer = max_buffer
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._subscribers: Set[asyncio.StreamWriter] = set()
+        self.published = 0
+        self.disconnected = 0
+
+    async def start(self) -> None:
+        if not self.serve:
+            return
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Left over from a previous run
+        self._server = await asyncio.start_unix_server(self._accept, path=self.path)
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._subscribers.add(writer)
+        try:
+            await reader.read()  # Subscribers never send; wait for them to go away
+        finally:
+            self._subscribers.discard(writer)
+            writer.close()
+
+    def publish(self, data: str) -> None:
+        self.published += 1
+        line = data.encode("utf-8") + b"\n"
+        for writer in list(self._subscribers):
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                logger.warning("Disconnecting a replica that fell too far behind")
+                self.disconnected += 1
+                self._subscribers.discard(writer)
+                writer.close()
+                continue
+            writer.write(line)
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        reader, writer = await asyncio.open_unix_connection(self.path, limit=self.max_buffer)
+
+        async def messages() -> AsyncIterator[str]:
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        raise ConnectionError("broker closed the connection")
+                    yield line.decode("utf-8")
+            finally:
+                writer.close()
+        return messages()
+
+    async def close(self) -> None:
+        for writer in list(self._subscribers):
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "unix", "path": self.path, "published": self.published,
+                "subscribers": len(self._subscribers), "disconnected": self.disconnected}
+
+
+class RedisBroker(Broker):
+    """
+    Redis (or any server speaking its pub/sub protocol) as the broker.
+    Messages are published from one connection, one at a time, so Redis
+    delivers them in order. Needs the optional `redis` package.
+    """
+
+    def __init__(self, url: str, channel: str = "cockpit:patches"):
+        self.url = url
+        self.channel = channel
+        self._client: Any = None
+        self._outbox: asyncio.Queue = asyncio.Queue()
+        self._sender: Optional[asyncio.Task] = None
+        self.published = 0
+
+    def _connect(self) -> Any:
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("The redis broker needs the redis package (pip install redis)")
+        return aioredis.from_url(self.url)
+
+    async def start(self) -> None:
+        self._client = self._connect()
+        self._sender = asyncio.create_task(self._send())
+
+    def publish(self, data: str) -> None:
+        self._outbox.put_nowait(data)
+
+    async def _send(self) -> None:
+        while True:
+            data = await self._outbox.get()
+            while True:
+                try:
+                    await self._client.publish(self.channel, data)
+                    self.published += 1
+                    break
+                except Exception as e:
+                    # Later messages wait in the outbox, so the order holds
+                    logger.warning("Redis publish failed, retrying", extra={"error": str(e)})
+                    await asyncio.sleep(1.0)
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        client = self._client or self._connect()
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.channel)
+
+        async def messages() -> AsyncIterator[str]:
+            try:
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        data = message["data"]
+                        yield data.decode("utf-8") if isinstance(data, bytes) else data
+                raise ConnectionError("redis subscription ended")
+            finally:
+                await pubsub.close()
+        return messages()
+
+    async def close(self) -> None:
+        if self._sender is not None:
+            self._sender.cancel()
+        if self._client is not None:
+            await self._client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "url": self.url, "published": self.published, "queued": self._outbox.qsize()}
+
+
+def make_broker(spec: str, socket_path: str, leader: bool) -> Broker:
+    """
+    Builds the broker named by COCKPIT_BROKER: "unix" (the default; a hub on
+    `socket_path` run by the leader), "local", or a redis:// URL.
+    """
+    if spec.startswith(("redis://", "rediss://")):
+        return RedisBroker(spec)
+    if spec == "local":
+        return LocalBroker()
+    if spec == "unix":
+        return UnixSocketBroker(socket_path, serve=leader)
+    raise ValueError(f"Unknown broker: {spec}")
+
+
+class Replica:
+    """
+    Keeps a replica's state in step with the leader. It subscribes to the
+    broker, loads a snapshot, then applies each patch message whose revision
+    follows the one it holds. On a revision gap or a lost connection it
+    loads a fresh snapshot.
+
+    `fetch_snapshot()` returns the leader's current snapshot message;
+    `reset(revision, document)` replaces the local state with it and
+    `apply(message)` applies one decoded patch message; any other message
+    goes to `on_event(message)`.
+    """
+
+    def __init__(self, broker: Broker, fetch_snapshot: Callable[[], Awaitable[Dict[str, Any]]],
+                 reset: Callable[[int, Dict[str, Any]], None], apply: Callable[[Dict[str, Any]], None],
+                 revision: Callable[[], int], retry_interval: float = 1.0,
+                 on_event: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.broker = broker
+        self.fetch_snapshot = fetch_snapshot
+        self.reset = reset
+        self.apply = apply
+        self.on_event = on_event
+        self.revision = revision
+        self.retry_interval = retry_interval
+        self.ready = asyncio.Event()
+        self.applied = 0
+        self.snapshots = 0
+        self.gaps = 0
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self._follow()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Replication interrupted; resyncing", extra={"error": str(e)})
+                self.ready.clear()
+                await asyncio.sleep(self.retry_interval)
+
+    async def _follow(self) -> None:
+        # Subscribe before loading the snapshot so nothing in between is missed
+        messages = await self.broker.subscribe()
+        try:
+            await self._load_snapshot()
+            async for data in messages:
+                message = decode_message(data)
+                if message.get("type") != "patch":
+                    if self.on_event is not None:
+                        self.on_event(message)
+                    continue
+                revision = message.get("revision", 0)
+                if revision <= self.revision():
+                    continue  # Already part of the snapshot
+                if revision != self.revision() + 1:
+                    self.gaps += 1
+                    await self._load_snapshot()
+                    continue
+                self.apply(message)
+                self.applied += 1
+        finally:
+            await messages.aclose()
+
+    async def _load_snapshot(self) -> None:
+        snapshot = await self.fetch_snapshot()
+        self.reset(snapshot["revision"], snapshot["payload"])
+        self.snapshots += 1
+        self.ready.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"revision": self.revision(), "applied": self.applied, "snapshots": self.snapshots,
+                "gaps": self.gaps, "broker": self.broker.stats()}
@@ -0,0 +1,5 @@
+"""
+Custom judges and metrics. Every Metric subclass (see judges.py) defined in
+a module here is loaded at startup, and runs for galaxies that list its
+name in their opikMetrics config.
+"""
@@ -0,0 +1,23 @@
+from judges import Metric
+
+POSITIVE = {"clear", "helpful", "friendly", "empathetic", "accurate", "concise", "simple", "compelling"}
+NEGATIVE = {"confusing", "rude", "vague", "wrong", "harsh", "verbose", "misleading"}
+
+
+class SentimentMetric(Metric):
+    """A custom metric to evaluate the sentiment of the output."""
+
+    name = "sentiment"
+    timeout = 2.0
+
+    def evaluate(self, text: str, base_score: float) -> float:
+        """
+        Analyzes the sentiment of the output.
+        Returns a score between -1 (negative) and 1 (positive).
+        """
+        words = [word.strip(".,!?[]()").lower() for word in text.split()]
+        positive = sum(word in POSITIVE for word in words)
+        negative = sum(word in NEGATIVE for word in words)
+        if not positive and not negative:
+            return 0.0
+        return (positive - negative) / (positive + negative)
@@ -0,0 +1,235 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+from aiohttp import web, WSCloseCode
+
+from state_sync import VersionedState
+from wire import FrameCache
+
+logger = logging.getLogger(__name__)
+
+# What to do when a client's outbound queue is full:
+#   "coalesce"   - throw the queued patches away and send the latest state instead
+#   "drop"       - drop the oldest queued patch; the client resyncs on the gap
+#   "disconnect" - close the socket, the client reconnects with ?since=
+QUEUE_POLICIES = ("coalesce", "drop", "disconnect")
+
+_client_ids = itertools.count(1)
+
+
+class ClientChannel:
+    """
+    A bounded outbound queue plus a writer task for one WebSocket client.
+    Producers only ever enqueue, so a slow or stalled browser tab never blocks
+    the handler that produced an update; the writer drains at the socket's pace.
+
+    A channel receives every patch until it subscribes to topics (see
+    topics.TopicRouter); from then on it only receives its topics' messages,
+    and catching up means resending their snapshots.
+
+    Messages are queued as JSON text and written in the client's wire
+    format (see wire.FrameCache), so each is encoded once for all clients.
+    """
+
+    def __init__(self, ws: web.WebSocketResponse, state: VersionedState, router: Any = None,
+                 max_queue: int = 64, policy: str = "coalesce", max_lag: float = 30.0,
+                 encoding: str = "json", frames: Optional[FrameCache] = None):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        if encoding != "json" and frames is None:
+            raise ValueError(f"The {encoding} wire format needs a frame cache")
+        self.id = next(_client_ids)
+        self.ws = ws
+        self.encoding = encoding
+        self.frames = frames
+        self.state = state
+        self.max_queue = max_queue
+        self.policy = policy
+        self.max_lag = max_lag
+        self.router = router
+        self.topics: Optional[Set[Tuple[str, ...]]] = None  # None: the full stream
+
+        # (revision or None if not tied to one, data, enqueued_at)
+        self._queue: Deque[Tuple[Optional[int], str, float]] = deque()
+        self._wakeup = asyncio.Event()
+        self._resync_from: Optional[int] = None
+        self._resync_pending = False
+        self._positions: Optional[Tuple[int, str]] = None  # Latest galaxy positions frame, not yet written
+        self._writer: Optional[asyncio.Task] = None
+        self._closing: Set[asyncio.Task] = set()  # Socket closes started by evict()
+        self.closed = False
+
+        # Lag metrics
+        self.revision = 0  # Last revision delivered to the client
+        self.position_tick = 0  # Last positions tick delivered (see positions.PositionFeed)
+        self._caught_up = 0  # Revision covered by the last catch-up
+        self.sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.last_send_latency = 0.0
+
+    # --- Producer side (never blocks) ---
+
+    def send(self, revision: Optional[int], data: str) -> None:
+        """Queues an encoded message for this client, applying the queue policy."""
+        if self.closed:
+            return
+
+        if self._queue and time.monotonic() - self._queue[0][2] > self.max_lag:
+            self.evict(f"lagging more than {self.max_lag:.0f}s behind")
+            return
+
+        if len(self._queue) >= self.max_queue:
+            if self.policy == "disconnect":
+                self.evict("outbound queue full")
+                return
+            if self.policy == "coalesce":
+                # Whatever is queued is superseded by a catch-up to the latest state
+                self.coalesced += len(self._queue)
+                self._queue.clear()
+                if not self._resync_pending:
+                    self.sync(self.revision)
+                return
+            self._queue.popleft()
+            self.dropped += 1
+
+        self._queue.append((revision, data, time.monotonic()))
+        self._wakeup.set()
+
+    def send_positions(self, tick: int, data: str) -> None:
+        """
+        Queues a galaxy positions frame. Each frame holds every move since
+        the client's last one, so it replaces a frame not yet written.
+        """
+        if self.closed:
+            return
+        self._positions = (tick, data)
+        self._wakeup.set()
+
+    def sync(self, since: Optional[int] = None) -> None:
+        """Asks the writer to bring the client up to date from `since`."""
+        self._resync_pending = True
+        self._resync_from = since
+        self._wakeup.set()
+
+    def evict(self, reason: str) -> None:
+        """Disconnects a client that can't keep up."""
+        if self.closed:
+            return
+        logger.warning("Evicting a WebSocket client", extra={"client": self.id, "reason": reason})
+        self.closed = True
+        self._queue.clear()
+        if self._writer:
+            self._writer.cancel()
+        task = asyncio.create_task(self.ws.close(code=WSCloseCode.TRY_AGAIN_LATER, message=reason.encode()))
+        self._closing.add(task)
+        task.add_done_callback(self._closed)
+
+    def _closed(self, task: asyncio.Task) -> None:
+        self._closing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Closing an evicted WebSocket client failed",
+                           extra={"client": self.id, "error": str(task.exception())})
+
+    # --- Writer side ---
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self.closed = True
+        if self._writer:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        try:
+            while not self.closed:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+
+                if self._resync_pending:
+                    self._resync_pending = False
+                    await self._send_catch_up(self._resync_from)
+
+                while self._queue and not self._resync_pending:
+                    revision, data, enqueued_at = self._queue.popleft()
+                    if revision is not None and revision <= self._caught_up:
+                        continue  # Already covered by a catch-up
+                    await self._write(data)
+                    if revision is not None:
+                        self.revision = max(self.revision, revision)
+                    self.sent += 1
+                    self.last_send_latency = time.monotonic() - enqueued_at
+                if self._positions is not None and not self._resync_pending:
+                    tick, data = self._positions
+                    self._positions = None
+                    await self._write(data)
+                    self.position_tick = tick
+                if self._resync_pending:
+                    self._wakeup.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info("Writing to a WebSocket client failed", extra={"client": self.id, "error": str(e)})
+            self.closed = True
+
+    async def _send_catch_up(self, since: Optional[int]) -> None:
+        """
+        Sends the patches after `since`, or a full snapshot when the client is
+        new or the backlog no longer reaches back that far. Topic subscribers
+        get a snapshot of each of their topics.
+        """
+        revision = self.state.revision
+        if self.topics is not None:
+            # All taken before the first write: a patch committed while one is
+            # being written must not land in the later snapshots as well as in
+            # the queued messages after `revision`
+            snapshots = [self.router.snapshot(topic) for topic in list(self.topics)]
+            for data in snapshots:
+                await self._write(data)
+        else:
+            patches = self.state.patches_since(since) if since is not None else None
+            if patches is None:
+                await self._write(self.state.snapshot())
+            else:
+                for data in patches:
+                    await self._write(data)
+        self.revision = self._caught_up = revision
+        self.sent += 1
+
+    async def _write(self, data: str) -> None:
+        if self.encoding == "json":
+            self.bytes_sent += len(data)
+            await self.ws.send_str(data)
+        else:
+            frame = self.frames.encode(data, self.encoding)
+            self.bytes_sent += len(frame)
+            await self.ws.send_bytes(frame)
+
+    def metrics(self) -> Dict[str, Any]:
+        oldest_age = time.monotonic() - self._queue[0][2] if self._queue else 0.0
+        return {
+            "id": self.id,
+            "policy": self.policy,
+            "encoding": self.encoding,
+            "topics": sorted("/".join(topic) for topic in self.topics) if self.topics is not None else None,
+            "queued": len(self._queue),
+            "oldest_queued_age_s": round(oldest_age, 3),
+            "revision": self.revision,
+            # Topic subscribers only receive the revisions that touch their topics
+            "revisions_behind": self.state.revision - self.revision if self.topics is None else None,
+            "sent": self.sent,
+            "bytes_sent": self.bytes_sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "last_send_latency_ms": round(self.last_send_latency * 1000, 2),
+        }
@@ -0,0 +1,309 @@
+import asyncio
+import importlib.util
+import inspect
+import logging
+import multiprocessing
+import os
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from prompts import normalize_prompt, split_prompt, stable_fraction
+
+logger = logging.getLogger(__name__)
+
+# One variant to evaluate: its prompt text and the deployed version's score
+Candidate = Tuple[str, float]
+# Evaluations are cached by normalized prompt, deployed score and metric names
+CacheKey = Tuple[str, float, Tuple[str, ...]]
+
+
+class Metric:
+    """
+    A judge or metric that evaluates prompt variants.
+
+    Subclasses set `name`, the evaluation field they fill in, and implement
+    `evaluate`. Judges that can score several variants in one call (one LLM
+    request for a whole batch, say) override `evaluate_batch` instead.
+
+    Metrics run in worker processes or threads, never on the event loop,
+    so they may block. `timeout` bounds each batch call in seconds.
+    """
+
+    name = ""
+    timeout = 5.0
+
+    def evaluate(self, text: str, base_score: float) -> Any:
+        raise NotImplementedError
+
+    def evaluate_batch(self, candidates: Sequence[Candidate]) -> List[Any]:
+        return [self.evaluate(text, base_score) for text, base_score in candidates]
+
+
+# --- Built-in placeholder judges (simulated Opik judges) ---
+
+class ScoreJudge(Metric):
+    """
+    Each modifier helps or hurts a given base prompt by a fixed amount
+    (up to `max_effect` of the score), plus some noise, so that a search
+    over modifiers has something to find.
+    """
+
+    name = "score"
+    max_effect = 0.12
+    noise = 0.03
+
+    def evaluate(self, text: str, base_score: float) -> float:
+        base, modifiers = split_prompt(text)
+        effect = sum((2 * stable_fraction(f"{base}|{modifier}") - 1) * self.max_effect
+                     for modifier in set(modifiers))
+        score_multiplier = 1 + effect + random.uniform(-self.noise, self.noise)  # Simulate variability
+        return max(0, min(1, base_score * score_multiplier))
+
+
+class FactualityJudge(Metric):
+    name = "factuality"
+
+    def evaluate(self, text: str, base_score: float) -> str:
+        return random.choice(["Meets Expectations", "Exceeds Expectations", "Needs Improvement"])
+
+
+class HallucinationJudge(Metric):
+    name = "hallucination"
+
+    def evaluate(self, text: str, base_score: float) -> str:
+        return "Detected" if random.random() < 0.1 else "Not Detected"
+
+
+class SpeedMetric(Metric):
+    name = "speed"
+
+    def evaluate(self, text: str, base_score: float) -> int:
+        return int(random.uniform(50, 500))
+
+
+BUILTIN_METRICS = (ScoreJudge, FactualityJudge, HallucinationJudge, SpeedMetric)
+# Evaluated for every variant, whatever the galaxy's opikMetrics list says;
+# the dashboard shows these fields for every trace.
+DEFAULT_METRICS = ("score", "factuality", "hallucination", "speed")
+
+
+def load_metrics(directory: Optional[str] = None) -> Dict[str, Metric]:
+    """
+    Returns the built-in metrics plus every Metric subclass defined in the
+    .py files of `directory`, by name. A custom metric replaces a built-in
+    one of the same name. Files starting with an underscore are skipped.
+    """
+    metrics: Dict[str, Metric] = {cls.name: cls() for cls in BUILTIN_METRICS}
+    if not directory or not os.path.isdir(directory):
+        return metrics
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".py") or filename.startswith("_"):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            spec = importlib.util.spec_from_file_location(f"custom_metrics.{filename[:-3]}", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        except Exception as e:
+            logger.exception("Could not load custom metrics", extra={"path": path})
+            continue
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if issubclass(cls, Metric) and cls.__module__ == module.__name__ and cls.name:
+                metrics[cls.name] = cls()
+    return metrics
+
+
+# --- Worker side ---
+# Each worker process loads the metrics once, when it starts.
+_worker_metrics: Dict[str, Metric] = {}
+
+
+def _init_worker(directory: Optional[str]) -> None:
+    global _worker_metrics
+    random.seed()  # Forked workers would otherwise share the parent's sequence
+    _worker_metrics = load_metrics(directory)
+
+
+def _run_metric(name: str, candidates: List[Candidate]) -> List[Any]:
+    return _worker_metrics[name].evaluate_batch(candidates)
+
+
+class JudgePool:
+    """
+    Evaluates prompt variants off the event loop.
+
+    `evaluate()` calls made within `batch_window` seconds of each other are
+    grouped (up to `max_batch`), and each metric then scores the whole batch
+    in one call on the executor: a process pool by default, or a thread pool
+    for judges that mostly wait on I/O. A metric that fails or exceeds its
+    timeout leaves its field out of the evaluation and is reported under
+    "errors"; a missing score falls back to the deployed version's score.
+
+    Evaluations are cached by normalized prompt text (see
+    prompts.normalize_prompt), the deployed version's score they were
+    judged against and the metric set, and concurrent requests for the same
+    prompt share one evaluation, so a duplicate candidate is never scored
+    twice against the same deployment. Evaluations with errors aren't
+    cached.
+
+    A process pool can't interrupt a metric that has timed out; the worker
+    stays busy until the call returns, but nobody waits for it.
+    """
+
+    def __init__(self, directory: Optional[str] = None, executor: str = "process",
+                 workers: Optional[int] = None, batch_window: float = 0.01, max_batch: int = 32,
+                 cache_size: int = 10_000):
+        self.directory = directory
+        self.executor_kind = executor
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.metrics = load_metrics(directory)
+        self._executor: Optional[Executor] = None
+        self._pending: List[Tuple[Candidate, Tuple[str, ...], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[CacheKey, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+
+        # Counters
+        self.evaluations = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.timeouts: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.busy_seconds: Dict[str, float] = {}
+
+        if executor == "process" and "fork" not in multiprocessing.get_all_start_methods():
+            # Spawned workers would re-run the server module on import
+            self.executor_kind = "thread"
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("fork"),
+                                                     initializer=_init_worker, initargs=(self.directory,))
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="judge")
+        return self._executor
+
+    def start(self) -> None:
+        """Starts the workers now, while the server has few threads to fork."""
+        self._get_executor().submit(int).result()
+
+    def metric_names(self, requested: Sequence[str]) -> Tuple[str, ...]:
+        """The defaults plus whichever requested metrics are registered."""
+        names = list(DEFAULT_METRICS)
+        names += [name for name in requested if name in self.metrics and name not in names]
+        return tuple(names)
+
+    async def evaluate(self, text: str, base_score: float, requested: Sequence[str] = ()) -> Dict[str, Any]:
+        """Evaluates one variant with the default and requested metrics."""
+        names = self.metric_names(requested)
+        key = (normalize_prompt(text), base_score, names)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return dict(cached)
+        future = self._inflight.get(key)
+        if future is not None:
+            self.cache_hits += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self._pending.append(((text, base_score), names, future))
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+        # Shielded: one caller giving up mustn't cancel it for the others
+        return dict(await asyncio.shield(future))
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._evaluate_batch(batch))
+
+    async def _evaluate_batch(self, batch: List[Tuple[Candidate, Tuple[str, ...], asyncio.Future]]) -> None:
+        self.batches += 1
+        evaluations: List[Dict[str, Any]] = [{} for _ in batch]
+        # Each metric scores the variants that asked for it, all in one call
+        by_metric: Dict[str, List[int]] = {}
+        for index, (_, names, _) in enumerate(batch):
+            for name in names:
+                by_metric.setdefault(name, []).append(index)
+        names = list(by_metric)
+        results = await asyncio.gather(*(
+            self._run(name, [batch[i][0] for i in by_metric[name]]) for name in names
+        ))
+        for name, (values, error) in zip(names, results):
+            for position, index in enumerate(by_metric[name]):
+                if error is None:
+                    evaluations[index][name] = values[position]
+                else:
+                    evaluations[index].setdefault("errors", {})[name] = error
+
+        for (candidate, names, future), evaluation in zip(batch, evaluations):
+            evaluation.setdefault("score", candidate[1])
+            self.evaluations += 1
+            key = (normalize_prompt(candidate[0]), candidate[1], names)
+            self._inflight.pop(key, None)
+            if "errors" not in evaluation:
+                self._cache[key] = evaluation
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            if not future.done():
+                future.set_result(evaluation)
+
+    async def _run(self, name: str, candidates: List[Candidate]) -> Tuple[Optional[List[Any]], Optional[str]]:
+        """Runs one metric over a batch; returns its values or an error."""
+        metric = self.metrics[name]
+        loop = asyncio.get_running_loop()
+        if self.executor_kind == "process":
+            call = loop.run_in_executor(self._get_executor(), _run_metric, name, candidates)
+        else:
+            call = loop.run_in_executor(self._get_executor(), metric.evaluate_batch, candidates)
+        started = time.perf_counter()
+        try:
+            values = await asyncio.wait_for(call, timeout=metric.timeout)
+            if len(values) != len(candidates):
+                raise ValueError(f"returned {len(values)} results for {len(candidates)} variants")
+            return values, None
+        except asyncio.TimeoutError:
+            logger.warning("Metric timed out", extra={"metric": name, "timeout_s": metric.timeout,
+                                                     "variants": len(candidates)})
+            self.timeouts[name] = self.timeouts.get(name, 0) + 1
+            return None, "timeout"
+        except Exception as e:
+            logger.exception("Metric failed", extra={"metric": name})
+            self.failures[name] = self.failures.get(name, 0) + 1
+            return None, "failed"
+        finally:
+            self.busy_seconds[name] = self.busy_seconds.get(name, 0.0) + time.perf_counter() - started
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "metrics": sorted(self.metrics),
+            "pending": len(self._pending),
+            "evaluations": self.evaluations,
+            "cache_hits": self.cache_hits,
+            "cached": len(self._cache),
+            "batches": self.batches,
+            "timeouts": dict(self.timeouts),
+            "failures": dict(self.failures),
+            "busy_s": {name: round(seconds, 3) for name, seconds in self.busy_seconds.items()},
+        }
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from metrics import REGISTRY
+
+LOCK_WAIT = REGISTRY.histogram("cockpit_galaxy_lock_wait_seconds",
+                               "Time spent waiting to acquire galaxy locks.")
+LOCK_HOLD = REGISTRY.histogram("cockpit_galaxy_lock_hold_seconds",
+                               "Time galaxy locks were held.")
+
+
+class GalaxyLocks:
+    """
+    A registry of per-galaxy asyncio locks. Every mutation of a galaxy runs
+    while holding that galaxy's lock, so read-await-write sequences (like an
+    optimizer step) stay consistent, while unrelated galaxies proceed
+    concurrently.
+
+    A patch must be committed before the locks covering it are released, so
+    revisions are handed out in the same order the state was changed.
+
+    A galaxy's lock exists while tasks hold or wait for it: `hold` counts
+    them, and the last one out drops it, so deleted galaxies leave nothing
+    behind and a lock is never replaced while a woken waiter still has to
+    run.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}  # Tasks holding or waiting for each lock
+
+    def _enter(self, galaxy_id: str) -> asyncio.Lock:
+        lock = self._locks.get(galaxy_id)
+        if lock is None:
+            lock = self._locks[galaxy_id] = asyncio.Lock()
+        self._users[galaxy_id] = self._users.get(galaxy_id, 0) + 1
+        return lock
+
+    def _leave(self, galaxy_id: str) -> None:
+        users = self._users[galaxy_id] - 1
+        if users:
+            self._users[galaxy_id] = users
+        else:
+            del self._users[galaxy_id]
+            del self._locks[galaxy_id]
+
+    @asynccontextmanager
+    async def hold(self, *galaxy_ids: str) -> AsyncIterator[None]:
+        """
+        Holds the locks of all given galaxies. They are acquired in sorted
+        order so multi-galaxy writers can't deadlock each other.
+        """
+        entered = []
+        acquired = []
+        started = time.perf_counter()
+        held = None
+        try:
+            for galaxy_id in sorted(set(galaxy_ids)):
+                lock = self._enter(galaxy_id)
+                entered.append(galaxy_id)
+                await lock.acquire()
+                acquired.append(lock)
+            held = time.perf_counter()
+            LOCK_WAIT.observe(held - started)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+            for galaxy_id in entered:
+                self._leave(galaxy_id)
+            if held is not None:
+                LOCK_HOLD.observe(time.perf_counter() - held)
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -0,0 +1,66 @@
+import json
+import logging
+import os
+import sys
+from typing import Any, Dict
+
+# --- Logging ---
+# Every module logs through the standard logging package; context goes in
+# `extra={...}` fields rather than into the message text, so logs can be
+# filtered and aggregated on them. COCKPIT_LOG_FORMAT picks the output:
+#   text - one readable line per record, fields appended as key=value (default)
+#   json - one JSON object per line, for log shippers
+LOG_FORMAT = os.environ.get('COCKPIT_LOG_FORMAT', 'text')
+LOG_LEVEL = os.environ.get('COCKPIT_LOG_LEVEL', 'INFO').upper()
+
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def record_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            # Keep a traceback (added by the base class) on the lines after the fields
+            first, _, rest = line.partition("\n")
+            first += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+            line = first + ("\n" + rest if rest else "")
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "pid": record.process,
+            "msg": record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(fmt: str = LOG_FORMAT, level: str = LOG_LEVEL) -> None:
+    """Sends every log record to stderr in the chosen format."""
+    if fmt not in ("text", "json"):
+        raise ValueError(f"Unknown log format: {fmt}")
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    # aiohttp and httpx (a replica's calls to the leader) log every request
+    # at INFO; the metrics cover that
+    logging.getLogger("aiohttp.access").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -0,0 +1,222 @@
+import sys
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+
+
+# --- Compact Records ---
+# Galaxies, planets and variants are stored as __slots__ records instead of
+# plain dicts. They keep the JSON key names as attribute names and support the
+# dict-style access used throughout the server (record["key"], .get, `in`),
+# so patches and handlers work on them unchanged. Keys a record doesn't know
+# about (e.g. custom Opik metrics in an evaluation) go into a small `extra`
+# dict that is only allocated when needed.
+
+class _Missing:
+    """Marks a field that is absent, so it's skipped when serializing."""
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+class Record:
+    __slots__ = ("extra",)
+
+    _fields: Tuple[str, ...] = ()
+    # Fields with a small set of repeated string values; these are interned
+    # so thousands of variants share one string object per value.
+    _interned: FrozenSet[str] = frozenset()
+    # Fields holding nested records, mapped to their converter.
+    _children: Dict[str, Callable[[Any], Any]] = {}
+    # Per-field converter (or None), derived from the two above.
+    _converters: Dict[str, Optional[Callable[[Any], Any]]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._converters = {
+            name: cls._children.get(name) or (_intern if name in cls._interned else None)
+            for name in cls._fields
+        }
+
+    def __init__(self, **values: Any):
+        self.extra: Optional[Dict[str, Any]] = None
+        for name in self._fields:
+            object.__setattr__(self, name, MISSING)
+        for key, value in values.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Record":
+        return cls(**data)
+
+    @classmethod
+    def coerce(cls, value: Any) -> Any:
+        """Converts a dict into this record type; records pass through."""
+        if isinstance(value, dict):
+            return cls.from_dict(value)
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the present fields as a shallow dict (children stay records)."""
+        data = {}
+        for name in self._fields:
+            value = getattr(self, name)
+            if value is not MISSING:
+                data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    # --- Mapping protocol ---
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._fields:
+            value = getattr(self, key)
+            if value is MISSING:
+                raise KeyError(key)
+            return value
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        converters = self._converters
+        if key in converters:
+            convert = converters[key]
+            if convert is not None and value is not None:
+                value = convert(value)
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._fields:
+            return getattr(self, key) is not MISSING
+        return self.extra is not None and key in self.extra
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key: str, *default: Any) -> Any:
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        if key in self._fields:
+            setattr(self, key, MISSING)
+        else:
+            del self.extra[key]
+        return value
+
+    def keys(self) -> Iterable[str]:
+        return self.to_dict().keys()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class RecordList(list):
+    """A list that converts the dicts added to it into records."""
+    __slots__ = ()
+    item_type = Record
+
+    def __init__(self, items: Iterable[Any] = ()):
+        super().__init__(self.item_type.coerce(item) for item in items)
+
+    def append(self, item: Any) -> None:
+        super().append(self.item_type.coerce(item))
+
+    def insert(self, index: int, item: Any) -> None:
+        super().insert(index, self.item_type.coerce(item))
+
+    def __setitem__(self, index, item) -> None:
+        if isinstance(index, slice):
+            item = [self.item_type.coerce(i) for i in item]
+        else:
+            item = self.item_type.coerce(item)
+        super().__setitem__(index, item)
+
+
+# --- Model ---
+
+class Evaluation(Record):
+    __slots__ = ("score", "factuality", "hallucination", "speed")
+    _fields = __slots__
+    _interned = frozenset(("factuality", "hallucination"))
+
+
+class Variant(Record):
+    __slots__ = ("id", "text", "evaluation", "timestamp", "isDeployed")
+    _fields = __slots__
+    _children = {"evaluation": Evaluation.coerce}
+
+
+class VariantList(RecordList):
+    __slots__ = ()
+    item_type = Variant
+
+
+class Planet(Record):
+    __slots__ = ("id", "name", "status", "orbitRadius", "deployedVersion", "traceHistory")
+    _fields = __slots__
+    _interned = frozenset(("status",))
+    _children = {"deployedVersion": Variant.coerce, "traceHistory": VariantList}
+
+
+class PlanetList(RecordList):
+    __slots__ = ()
+    item_type = Planet
+
+
+class Galaxy(Record):
+    __slots__ = ("id", "name", "position", "theme", "status", "status_message", "config", "planets", "comets",
+                 "operations")
+    _fields = __slots__
+    _interned = frozenset(("status",))
+    _children = {"planets": PlanetList}
+
+
+class GalaxyMap(dict):
+    """The galaxies dict; galaxies assigned into it are converted to records."""
+
+    def __init__(self, galaxies: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        for galaxy_id, galaxy in (galaxies or {}).items():
+            self[galaxy_id] = galaxy
+
+    def __setitem__(self, galaxy_id: str, galaxy: Any) -> None:
+        super().__setitem__(galaxy_id, Galaxy.coerce(galaxy))
+
+
+def to_json(value: Any) -> Any:
+    """`default` hook for JSON encoders: serializes records as dicts."""
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,84 @@
+import random
+from typing import Any, Callable, Dict, List, Optional
+
+# Config fields left out of an export unless asked for
+SECRET_CONFIG_FIELDS = ("authToken",)
+
+
+def new_planet(planet_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """A planet for an agent's prompt, seeded from onboarding or telemetry fields."""
+    return {
+        "id": planet_id,
+        "name": fields.get("name", "Unnamed Planet"),
+        "status": fields.get("status", "active"),
+        "orbitRadius": fields.get("orbitRadius", random.uniform(10, 40)),
+        "deployedVersion": fields.get("deployedVersion", {}),
+        "traceHistory": fields.get("traceHistory", []),
+    }
+
+
+def new_galaxy(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The galaxy for an onboarded agent. Accepts the onboarding fields (name,
+    apiUrl, authToken, opikMetrics, metricMapping, planets) as well as a
+    galaxy line from the export, so an export can be imported as-is.
+    """
+    config = dict(record.get("config") or {})
+    for key in ("apiUrl", "authToken", "opikMetrics", "metricMapping"):
+        if key in record:
+            config[key] = record[key]
+    config.setdefault("apiUrl", None)
+    config.setdefault("authToken", None)
+    config.setdefault("opikMetrics", [])
+    return {
+        "id": record["id"],
+        "name": record.get("name", "Unnamed Agent"),
+        "position": record.get("position") or [random.uniform(-100, 100), 0, random.uniform(-100, 100)],
+        "theme": record.get("theme") or {"hue": random.random()},
+        "status": "initializing",
+        "status_message": "Onboarding complete. Awaiting first telemetry.",
+        "config": config,
+        "planets": [new_planet(planet["id"], planet) for planet in record.get("planets") or []],
+        "comets": [],
+    }
+
+
+def validate_onboard_record(record: Any, owner_of: Callable[[str], Optional[str]]) -> Dict[str, Any]:
+    """
+    Checks one agent record for a bulk onboarding and returns its galaxy.
+    `owner_of(planet_id)` names the agent a planet id already belongs to (in
+    the universe or earlier in the batch), if any; planet ids must stay
+    unique. Raises ValueError with a message suitable for the per-record
+    error list.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    agent_id = record.get("id")
+    if not agent_id or not isinstance(agent_id, str):
+        raise ValueError("missing agent id")
+    mapping = record.get("metricMapping", (record.get("config") or {}).get("metricMapping"))
+    if mapping is not None and not isinstance(mapping, dict):
+        raise ValueError("metricMapping must be an object")
+    planets = record.get("planets") or []
+    if not isinstance(planets, list):
+        raise ValueError("planets must be a list")
+    seen: List[str] = []
+    for planet in planets:
+        if not isinstance(planet, dict) or not planet.get("id"):
+            raise ValueError("every planet needs an id")
+        owner = owner_of(planet["id"])
+        if (owner is not None and owner != agent_id) or planet["id"] in seen:
+            raise ValueError(f"planet id '{planet['id']}' is already in use")
+        seen.append(planet["id"])
+    return new_galaxy(record)
+
+
+def export_galaxy(galaxy: Dict[str, Any], include_secrets: bool = False) -> Dict[str, Any]:
+    """A galaxy as an export line: everything but live optimizations and operational figures (and secrets)."""
+    data = dict(galaxy.to_dict() if hasattr(galaxy, "to_dict") else galaxy)
+    data.pop("comets", None)
+    data.pop("operations", None)
+    if not include_secrets and data.get("config"):
+        data["config"] = {key: value for key, value in dict(data["config"]).items()
+                          if key not in SECRET_CONFIG_FIELDS}
+    return data
@@ -0,0 +1,326 @@
+import math
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# --- Operational metrics ---
+# Agents report raw operational metrics with their telemetry, under "payload":
+# one request's latency_ms, error_count, prompt_tokens and completion_tokens.
+# They are rolled up on arrival into per-agent and per-planet series of fixed
+# size (see OperationsSeries): request, error and token counters plus a
+# latency quantile sketch, per minute over the last few minutes and since the
+# series started. No samples are kept, so memory per series is the same after
+# ten samples or ten million.
+
+# Relative accuracy of the latency sketch: a reported quantile is within 2%
+# of the latency actually observed at that rank (DDSketch's alpha)
+LATENCY_ACCURACY = 0.02
+# Latencies the sketch tells apart (ms); anything outside counts as the bound
+LATENCY_RANGE_MS = (1.0, 300_000.0)
+# Sliding windows are made of 1 minute slots; each names how many it spans,
+# the current (partial) minute included
+SLOT_SECONDS = 60
+WINDOWS: Tuple[Tuple[str, int], ...] = (("1m", 1), ("5m", 5), ("15m", 15))
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+# A galaxy's digest (see summary) keeps this many significant digits, about
+# what the sketch resolves. It is only worth republishing once a figure has
+# moved by more than the tolerance (relative; absolute for the error rate),
+# so the sampling noise of steady traffic doesn't produce a patch per tick.
+DIGEST_DIGITS = 2
+DIGEST_TOLERANCE = 0.15
+DIGEST_ERROR_RATE_TOLERANCE = 0.03
+# Fields of a payload, and the counters each slot keeps (latency_ms is the
+# sum, for the mean)
+PAYLOAD_FIELDS = ("latency_ms", "error_count", "prompt_tokens", "completion_tokens")
+COUNTERS = ("requests", "errors", "prompt_tokens", "completion_tokens", "latency_ms")
+
+# Bin i of the sketch counts latencies in (gamma^(k-1), gamma^k], k = i + _MIN_INDEX
+_GAMMA = (1 + LATENCY_ACCURACY) / (1 - LATENCY_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+_MIN_INDEX = math.ceil(math.log(LATENCY_RANGE_MS[0]) / _LOG_GAMMA)
+LATENCY_BINS = math.ceil(math.log(LATENCY_RANGE_MS[1]) / _LOG_GAMMA) - _MIN_INDEX + 1
+SLOTS = max(slots for _, slots in WINDOWS)
+_EMPTY_BINS = array("I", bytes(4 * LATENCY_BINS))
+_EMPTY_COUNTERS = array("d", bytes(8 * len(COUNTERS)))
+
+
+def latency_bin(latency_ms: float) -> int:
+    if latency_ms <= LATENCY_RANGE_MS[0]:
+        return 0
+    return min(math.ceil(math.log(latency_ms) / _LOG_GAMMA) - _MIN_INDEX, LATENCY_BINS - 1)
+
+
+def bin_latency(i: int) -> float:
+    """The latency a bin stands for: within LATENCY_ACCURACY of everything in it."""
+    return 2 * _GAMMA ** (i + _MIN_INDEX) / (_GAMMA + 1)
+
+
+def sketch_quantiles(bins: Sequence[int], quantiles: Sequence[float]) -> List[Optional[float]]:
+    """Quantiles of a latency sketch's bin counts; None for an empty sketch."""
+    count = sum(bins)
+    if not count:
+        return [None] * len(quantiles)
+    ranks = sorted((q * (count - 1), j) for j, q in enumerate(quantiles))
+    result: List[Optional[float]] = [None] * len(quantiles)
+    seen = 0
+    r = 0
+    for i, n in enumerate(bins):
+        seen += n
+        while r < len(ranks) and ranks[r][0] < seen:
+            result[ranks[r][1]] = bin_latency(i)
+            r += 1
+        if r == len(ranks):
+            break
+    return result
+
+
+def _number(payload: Dict[str, Any], name: str) -> float:
+    value = payload.get(name, 0)
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or not math.isfinite(value) or value < 0:
+        raise ValueError(f"payload {name} must be a non-negative number")
+    return float(value)
+
+
+def parse_operations(payload: Any, planet_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Validates the "payload" of a telemetry record: one request's metrics, or
+    a list of them. Returns one sample per request, with the planet it is
+    counted for (the payload's planet_id, else `planet_id`). Fields other
+    than PAYLOAD_FIELDS (e.g. a score) are ignored. Raises ValueError.
+    """
+    if payload is None:
+        return []
+    payloads = payload if isinstance(payload, list) else [payload]
+    samples = []
+    for item in payloads:
+        if not isinstance(item, dict):
+            raise ValueError("payload must be an object or a list of objects")
+        if not any(name in item for name in PAYLOAD_FIELDS):
+            continue
+        sample = {name: _number(item, name) for name in PAYLOAD_FIELDS}
+        if "latency_ms" not in item:
+            sample["latency_ms"] = None
+        if item.get("planet_id") is not None and not isinstance(item["planet_id"], str):
+            raise ValueError("payload planet_id must be a string")
+        sample["planet_id"] = item.get("planet_id") or planet_id
+        samples.append(sample)
+    return samples
+
+
+class OperationsSeries:
+    """
+    One agent's or planet's operational metrics: SLOTS one-minute slots,
+    reused in a ring, each holding the minute's counters and latency sketch
+    (LATENCY_BINS counts), plus the same since the series started. Columns
+    are flat typed arrays like timeseries.Ring's; sketches merge by adding
+    bin counts, so any window is its slots summed.
+    """
+
+    __slots__ = ("minute", "bins", "counters", "total_bins", "total_counters", "first_seen", "last_seen")
+
+    def __init__(self, timestamp: float):
+        # Which minute (time // SLOT_SECONDS) each slot currently holds; 0 is empty
+        self.minute = array("I", bytes(4 * SLOTS))
+        self.bins = array("I", bytes(4 * SLOTS * LATENCY_BINS))
+        self.counters = array("d", bytes(8 * SLOTS * len(COUNTERS)))
+        self.total_bins = array("Q", bytes(8 * LATENCY_BINS))
+        self.total_counters = array("d", bytes(8 * len(COUNTERS)))
+        self.first_seen = self.last_seen = timestamp
+
+    def add(self, timestamp: float, sample: Dict[str, Any]) -> None:
+        latency = sample["latency_ms"]
+        row = (1.0, sample["error_count"], sample["prompt_tokens"], sample["completion_tokens"], latency or 0.0)
+        b = None if latency is None else latency_bin(latency)
+        totals = self.total_counters
+        for c, value in enumerate(row):
+            totals[c] += value
+        if b is not None:
+            self.total_bins[b] += 1
+        self.last_seen = max(self.last_seen, timestamp)
+
+        minute = int(timestamp // SLOT_SECONDS)
+        slot = minute % SLOTS
+        held = self.minute[slot]
+        if held > minute:
+            return  # Arrived after its slot was reused; only the totals count it
+        if held != minute:
+            # The slot held an older minute; start it over
+            self.minute[slot] = minute
+            self.bins[slot * LATENCY_BINS:(slot + 1) * LATENCY_BINS] = _EMPTY_BINS
+            self.counters[slot * len(COUNTERS):(slot + 1) * len(COUNTERS)] = _EMPTY_COUNTERS
+        i = slot * len(COUNTERS)
+        counters = self.counters
+        for value in row:
+            counters[i] += value
+            i += 1
+        if b is not None:
+            self.bins[slot * LATENCY_BINS + b] += 1
+
+    def minutes(self, last: int, slots: int = SLOTS) -> Iterable[Tuple[int, array, array]]:
+        """(minute, counters, sketch) of the minutes among the `slots` up to `last` that had samples."""
+        for minute in range(last - slots + 1, last + 1):
+            slot = minute % SLOTS
+            if self.minute[slot] == minute:
+                yield (minute, self.counters[slot * len(COUNTERS):(slot + 1) * len(COUNTERS)],
+                       self.bins[slot * LATENCY_BINS:(slot + 1) * LATENCY_BINS])
+
+
+def _window_seconds(slots: int, now: float, first_seen: float) -> float:
+    """Seconds a window spans: its full minutes and the current one so far, or the series' age if less."""
+    return max(min((slots - 1) * SLOT_SECONDS + now % SLOT_SECONDS, now - first_seen), 1.0)
+
+
+def _significant(value: Optional[float], digits: int = DIGEST_DIGITS) -> Optional[float]:
+    if not value:
+        return value
+    return round(value, digits - 1 - math.floor(math.log10(abs(value))))
+
+
+def _figures(counters: Sequence[float], bins: Sequence[int], seconds: float,
+             quantiles: Sequence[float]) -> Dict[str, Any]:
+    requests, errors, prompt_tokens, completion_tokens, latency_total = counters
+    count = sum(bins)
+    latency: Dict[str, Any] = {"count": count, "mean": latency_total / count if count else None}
+    for q, value in zip(quantiles, sketch_quantiles(bins, quantiles)):
+        latency[f"p{q * 100:g}"] = value
+    return {
+        "seconds": round(seconds, 1),
+        "requests": int(requests),
+        "requests_per_s": requests / seconds,
+        "errors": int(errors),
+        "error_rate": errors / requests if requests else None,
+        "prompt_tokens": int(prompt_tokens),
+        "completion_tokens": int(completion_tokens),
+        "tokens_per_s": (prompt_tokens + completion_tokens) / seconds,
+        "latency_ms": latency,
+    }
+
+
+def _merge(columns: Iterable[Sequence[Any]], width: int) -> List[Any]:
+    """Adds up counters or sketches of the same width."""
+    columns = list(columns)
+    if len(columns) == 1:
+        return list(columns[0])
+    return [sum(column) for column in zip(*columns)] if columns else [0] * width
+
+
+def digest_moved(published: Optional[Dict[str, Any]], digest: Dict[str, Any]) -> bool:
+    """Whether a new digest differs enough from the published one to replace it."""
+    if not published or published.keys() != digest.keys():
+        return True
+    for name, value in digest.items():
+        old = published[name]
+        if value == old:
+            continue
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+            return True  # Another window, or a figure appearing or going away
+        if name == "error_rate":
+            if abs(value - old) > DIGEST_ERROR_RATE_TOLERANCE:
+                return True
+        elif not value or not old or abs(value - old) > DIGEST_TOLERANCE * abs(old):
+            return True
+    return False
+
+
+class OperationsStore:
+    """
+    Operational metrics of agents or planets, one OperationsSeries per key.
+    Queries merge the series of any number of keys, so a fleet's latency
+    quantiles come from the same sketches as a single agent's.
+    """
+
+    def __init__(self):
+        self._series: Dict[str, OperationsSeries] = {}
+        self.samples = 0
+
+    def record(self, key: str, sample: Dict[str, Any], timestamp: Optional[float] = None) -> None:
+        """Adds one request's metrics (a sample from parse_operations)."""
+        timestamp = time.time() if timestamp is None else timestamp
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = OperationsSeries(timestamp)
+        series.add(timestamp, sample)
+        self.samples += 1
+
+    def drop(self, key: str) -> None:
+        self._series.pop(key, None)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._series
+
+    def keys(self) -> Iterable[str]:
+        return self._series.keys()
+
+    def active(self, slots: int, now: Optional[float] = None) -> List[str]:
+        """Keys with samples in the last `slots` minutes, or in the minute before (their window just emptied)."""
+        now = time.time() if now is None else now
+        since = (int(now // SLOT_SECONDS) - slots) * SLOT_SECONDS
+        return [key for key, series in self._series.items() if series.last_seen >= since]
+
+    def query(self, keys: Sequence[str], quantiles: Sequence[float] = QUANTILES,
+              now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        The figures of every window and since the series started, merged
+        across `keys`: {"windows": {name: figures}, "total": figures}, where
+        figures are the request, error and token counts and rates over the
+        window's seconds, and {"count", "mean", "p50", ...} of latency.
+        Windows of series younger than the window cover only their age.
+        """
+        now = time.time() if now is None else now
+        series = [self._series[key] for key in keys if key in self._series]
+        first_seen = min((s.first_seen for s in series), default=now)
+        last = int(now // SLOT_SECONDS)
+        # Each minute merged across the keys once; windows add up whole minutes
+        by_minute: Dict[int, Tuple[List[array], List[array]]] = {}
+        for s in series:
+            for minute, counters, bins in s.minutes(last):
+                merged = by_minute.setdefault(minute, ([], []))
+                merged[0].append(counters)
+                merged[1].append(bins)
+        minutes = {minute: (_merge(counters, len(COUNTERS)), _merge(sketches, LATENCY_BINS))
+                   for minute, (counters, sketches) in by_minute.items()}
+
+        result: Dict[str, Any] = {"windows": {}}
+        for name, slots in WINDOWS:
+            held = [minutes[minute] for minute in range(last - slots + 1, last + 1) if minute in minutes]
+            result["windows"][name] = _figures(_merge((counters for counters, _ in held), len(COUNTERS)),
+                                               _merge((bins for _, bins in held), LATENCY_BINS),
+                                               _window_seconds(slots, now, first_seen), quantiles)
+        result["total"] = _figures(_merge((s.total_counters for s in series), len(COUNTERS)),
+                                   _merge((s.total_bins for s in series), LATENCY_BINS),
+                                   max(now - first_seen, 1.0), quantiles)
+        return result
+
+    def summary(self, key: str, window: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        A compact digest of one window, small enough to live in the universe
+        document: rates and latency quantiles only (counts grow with the
+        window's seconds), to DIGEST_DIGITS significant digits.
+        """
+        now = time.time() if now is None else now
+        series = self._series.get(key)
+        slots = dict(WINDOWS)[window]
+        held = list(series.minutes(int(now // SLOT_SECONDS), slots)) if series is not None else []
+        counters = _merge((counters for _, counters, _ in held), len(COUNTERS))
+        bins = _merge((bins for _, _, bins in held), LATENCY_BINS)
+        first_seen = series.first_seen if series is not None else now
+        figures = _figures(counters, bins, _window_seconds(slots, now, first_seen), (0.5, 0.95, 0.99))
+        summary = {"window": window}
+        for name in ("requests_per_s", "error_rate", "tokens_per_s"):
+            summary[name] = _significant(figures[name])
+        for name in ("p50", "p95", "p99"):
+            summary[f"latency_{name}"] = _significant(figures["latency_ms"][name])
+        return summary
+
+    def stats(self) -> Dict[str, Any]:
+        per_series = (SLOTS * (4 + LATENCY_BINS * 4 + len(COUNTERS) * 8)
+                      + LATENCY_BINS * 8 + len(COUNTERS) * 8)
+        return {
+            "series": len(self._series),
+            "samples": self.samples,
+            "windows": [{"name": name, "seconds": slots * SLOT_SECONDS} for name, slots in WINDOWS],
+            "latency_bins": LATENCY_BINS,
+            "latency_accuracy": LATENCY_ACCURACY,
+            "bytes_per_series": per_series,
+            "bytes": per_series * len(self._series),
+        }
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from state_loader import JsonStream, read_snapshot
+from state_sync import VersionedState, apply_ops
+from wire import decode_message, encode_message
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "snapshot.json"
+WAL_PREFIX = "wal-"
+WAL_SUFFIX = ".ndjson"
+# The log is never compacted into a snapshot before it reaches this size, so
+# a small universe isn't rewritten on every flush.
+COMPACT_MIN_BYTES = 1 << 20
+
+
+def _fsync_directory(directory: str) -> None:
+    """Makes renames and unlinks in the directory durable (POSIX only)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class StateLog:
+    """
+    Durable storage for the universe: the last compacted snapshot plus an
+    append-only write-ahead log of every patch committed since.
+
+    The log records are the encoded patch messages that are broadcast to the
+    dashboards, so persisting a patch costs no extra encoding. They are
+    buffered on the event loop and written by a single background thread,
+    with one fsync per flush window no matter how many patches it holds.
+    Once the log has grown to the size of the snapshot, a new snapshot is
+    written and the log is started over, which keeps both restart time and
+    write amplification bounded. The new snapshot is rebuilt by the writer
+    thread from the old one and the log, as a restart would, so the live
+    universe is never copied or encoded on the event loop for it.
+
+    On restart the snapshot is loaded and the log replayed on top of it. A
+    torn final record (a crash mid-write) ends the replay.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 0.05, compact_ratio: float = 1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.compact_ratio = compact_ratio
+        self.state: Optional[VersionedState] = None
+
+        self._pending: List[str] = []
+        self._has_pending = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-log")
+        self._wal = None  # Only touched on the writer thread
+        self._wal_path: Optional[str] = None
+        self._replayed = 0
+        self._segment_bytes = 0
+        self._snapshot_bytes = 0
+
+        # Write counters (the snapshot written when the log is opened isn't counted)
+        self.records = 0
+        self.wal_bytes = 0
+        self.snapshot_bytes = 0
+        self.snapshots = 0
+        self.fsyncs = 0
+        self.last_flush_duration = 0.0
+
+    # --- Restore ---
+
+    def _segments(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        names = [name for name in os.listdir(self.directory)
+                 if name.startswith(WAL_PREFIX) and name.endswith(WAL_SUFFIX)]
+        # Segment names carry their zero-padded first revision, so they sort in order
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    def snapshot_file(self) -> Optional[str]:
+        """The snapshot to restore from, or None if nothing has been persisted yet."""
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(snapshot_path):
+            return None
+        self._snapshot_bytes = os.path.getsize(snapshot_path)
+        return snapshot_path
+
+    def replay(self, revision: int) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the logged patch records after the snapshot's `revision`, in
+        order. A torn final record or a gap in the revisions ends the replay.
+        """
+        self._replayed = 0
+        for path in self._segments():
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        record = decode_message(line)
+                    except ValueError:
+                        logger.warning("Ignoring a torn record at the end of the state log", extra={"path": path})
+                        return
+                    if record["revision"] <= revision:
+                        continue  # Already part of the snapshot
+                    if record["revision"] != revision + 1:
+                        logger.warning("State log skips a revision; stopping the replay there",
+                                       extra={"revision": revision, "next_revision": record["revision"]})
+                        return
+                    revision = record["revision"]
+                    self._replayed += 1
+                    yield record
+
+    def restore(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Returns (revision, document) rebuilt from the snapshot and log, or
+        None if nothing has been persisted yet. The server streams the
+        snapshot in instead (see state_loader.py); this reads it whole.
+        """
+        snapshot_path = self.snapshot_file()
+        if snapshot_path is None:
+            return None
+        with open(snapshot_path, "rb") as f:
+            snapshot = decode_message(f.read())
+        revision = snapshot["revision"]
+        document = snapshot["payload"]
+        for record in self.replay(revision):
+            apply_ops(document, record["ops"])
+            revision = record["revision"]
+        return revision, document
+
+    # --- Writing ---
+
+    def open(self, state: VersionedState) -> None:
+        """
+        Starts logging the patches committed to `state`. Replayed records
+        are first folded into a fresh snapshot, so every run starts with an
+        empty log.
+        """
+        self.state = state
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if self._replayed or not os.path.exists(snapshot_path):
+            self._write_snapshot(state.snapshot().encode("utf-8"))
+        for path in self._segments():
+            os.remove(path)
+        self._open_segment(state.revision + 1)
+        self._replayed = 0
+
+    def append(self, message: str) -> None:
+        """Queues an encoded, committed patch message for the log."""
+        self._pending.append(message)
+        self._has_pending.set()
+
+    async def flush(self) -> None:
+        """Writes and fsyncs everything appended so far, compacting if due."""
+        lines, self._pending = self._pending, []
+        self._has_pending.clear()
+        if not lines:
+            return
+        self.records += len(lines)
+        self._segment_bytes += sum(len(line) + 1 for line in lines)
+
+        compact = self._segment_bytes >= self.compact_ratio * max(self._snapshot_bytes, COMPACT_MIN_BYTES)
+        if compact:
+            self._segment_bytes = 0
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        # The revision is read on the loop between patches, so it is exactly
+        # the last one in `lines`
+        await loop.run_in_executor(self._executor, self._write, lines, compact, self.state.revision)
+        self.last_flush_duration = time.perf_counter() - start
+
+    async def run(self) -> None:
+        """Flushes appended patches at most once per flush window."""
+        while True:
+            await self._has_pending.wait()
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception("Error writing the state log")
+
+    async def close(self) -> None:
+        """Flushes what's left and closes the log."""
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._close_segment)
+        self._executor.shutdown()
+
+    # --- Writer thread ---
+
+    def _write(self, lines: List[str], compact: bool, revision: int) -> None:
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        self._wal.write(data)
+        self._wal.flush()
+        os.fsync(self._wal.fileno())
+        self.fsyncs += 1
+        self.wal_bytes += len(data)
+        if compact:
+            snapshot = self._build_snapshot(revision)
+            self._write_snapshot(snapshot)
+            self.fsyncs += 1
+            self.snapshots += 1
+            self.snapshot_bytes += len(snapshot)
+            old_path = self._wal_path
+            self._close_segment()
+            self._open_segment(revision + 1)
+            os.remove(old_path)
+
+    def _build_snapshot(self, revision: int) -> bytes:
+        """
+        Encodes the state at `revision` from the snapshot on disk and the
+        current log segment, which ends at that revision. The snapshot is
+        read a galaxy at a time, so the loop gets the GIL back in between.
+        """
+        with open(os.path.join(self.directory, SNAPSHOT_FILE), "rb") as f:
+            document: Dict[str, Any] = {"galaxies": {}}
+            for kind, value in read_snapshot(JsonStream(f)):
+                if kind == "revision":
+                    last = value
+                elif kind == "galaxy":
+                    document["galaxies"][value[0]] = value[1]
+                else:
+                    document[value[0]] = value[1]
+        with open(self._wal_path, "rb") as f:
+            for line in f:
+                record = decode_message(line)
+                apply_ops(document, record["ops"])
+                last = record["revision"]
+        if last != revision:
+            raise ValueError(f"Snapshot and log end at revision {last}, not {revision}")
+        return encode_message({"type": "snapshot", "revision": revision, "payload": document}).encode("utf-8")
+
+    def _write_snapshot(self, data: bytes) -> None:
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        _fsync_directory(self.directory)
+        self._snapshot_bytes = len(data)
+
+    def _open_segment(self, first_revision: int) -> None:
+        self._wal_path = os.path.join(self.directory, f"{WAL_PREFIX}{first_revision:012d}{WAL_SUFFIX}")
+        self._wal = open(self._wal_path, "wb")
+        _fsync_directory(self.directory)
+
+    def _close_segment(self) -> None:
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+
+    def stats(self) -> Dict[str, Any]:
+        written = self.wal_bytes + self.snapshot_bytes
+        return {
+            "revision": self.state.revision if self.state else None,
+            "records": self.records,
+            "pending": len(self._pending),
+            "wal_bytes": self.wal_bytes,
+            "snapshot_bytes": self.snapshot_bytes,
+            "snapshots": self.snapshots,
+            "fsyncs": self.fsyncs,
+            "write_amplification": round(written / self.wal_bytes, 2) if self.wal_bytes else None,
+            "last_flush_ms": round(self.last_flush_duration * 1000, 2),
+        }
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from wire import encode_message
+
+logger = logging.getLogger(__name__)
+
+# Galaxy positions go out at most this many times a second while dragged
+POSITION_TICK_RATE = 20.0
+# Decimals kept in broadcast coordinates; the PUT that ends a drag persists
+# the exact position
+POSITION_DECIMALS = 2
+
+Position = Tuple[float, float, float]
+
+
+def parse_position(value: Any) -> Position:
+    """Validates [x, y, z] from a client; raises ValueError otherwise."""
+    if not isinstance(value, (list, tuple)) or len(value) != 3:
+        raise ValueError("position must be [x, y, z]")
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in value):
+        raise ValueError("position coordinates must be finite numbers")
+    return (float(value[0]), float(value[1]), float(value[2]))
+
+
+def pack_positions(positions: Iterable[Tuple[str, Position]]) -> List[Any]:
+    """Flattens (galaxy id, position) pairs into [id, x, y, z, id, x, y, z, ...]."""
+    packed: List[Any] = []
+    for galaxy_id, (x, y, z) in positions:
+        packed += (galaxy_id, round(x, POSITION_DECIMALS), round(y, POSITION_DECIMALS), round(z, POSITION_DECIMALS))
+    return packed
+
+
+def unpack_positions(packed: Sequence[Any]) -> List[Tuple[str, Position]]:
+    """The inverse of pack_positions; raises ValueError on a malformed list."""
+    if len(packed) % 4:
+        raise ValueError("packed positions must be [id, x, y, z, ...]")
+    return [(str(packed[i]), parse_position(packed[i + 1:i + 4])) for i in range(0, len(packed), 4)]
+
+
+class PositionFeed:
+    """
+    Live positions of galaxies being dragged, kept off the versioned state.
+    Dashboards report each drag step over their WebSocket; moves are
+    coalesced and go out once per tick, to every dashboard, as one packed
+    `{"type": "positions", "tick", "p": [id, x, y, z, ...]}` message with
+    just the galaxies that moved since the dashboard's last frame. The PUT
+    that ends a drag persists the position through a normal patch and
+    settles the galaxy here (see settle).
+
+    A dashboard still writing its previous frame gets the next one instead
+    of both (see ClientChannel.send_positions), so a slow client never
+    queues up positions; dashboards at the same tick share one encoded frame.
+    """
+
+    def __init__(self, rate: float = POSITION_TICK_RATE, on_tick: Optional[Callable[[List[Any]], None]] = None):
+        self.interval = 1.0 / rate
+        self.on_tick = on_tick  # Gets the packed moves of each tick (the leader relays them to replicas)
+        self.tick = 0
+        self._pending: Dict[str, Position] = {}
+        self._has_pending = asyncio.Event()
+        # Galaxies being dragged: latest position and the tick it changed at
+        self._live: Dict[str, Tuple[int, Position]] = {}
+        self._settling: Set[str] = set()  # Pending moves that end a drag
+        self._settled: Dict[str, int] = {}  # Galaxy -> the tick its drag ended at
+        self._last_flush = 0.0
+        self.moves = 0
+        self.frames = 0
+
+    def move(self, galaxy_id: str, position: Position) -> None:
+        """Records a drag step; it goes out with the next tick."""
+        self._pending[galaxy_id] = position
+        self._settling.discard(galaxy_id)
+        self._settled.pop(galaxy_id, None)
+        self.moves += 1
+        self._has_pending.set()
+
+    def settle(self, galaxy_id: str, position: Optional[Position] = None) -> None:
+        """
+        Ends a galaxy's drag once its position is persisted. The persisted
+        position goes out with one last tick, so a frame from earlier in the
+        drag still on its way to a dashboard can't leave it behind; the
+        galaxy is forgotten once every dashboard has had that tick. Without
+        a position (a deleted galaxy), or if it wasn't being dragged, it is
+        forgotten right away.
+        """
+        if position is None or (galaxy_id not in self._live and galaxy_id not in self._pending):
+            self._pending.pop(galaxy_id, None)
+            self._live.pop(galaxy_id, None)
+            self._settling.discard(galaxy_id)
+            self._settled.pop(galaxy_id, None)
+            return
+        self._pending[galaxy_id] = position
+        self._settling.add(galaxy_id)
+        self._has_pending.set()
+
+    def frame(self, since: int) -> Optional[str]:
+        """The encoded positions message for a dashboard at tick `since`, if anything moved."""
+        moved = [(galaxy_id, position) for galaxy_id, (tick, position) in self._live.items() if tick > since]
+        if not moved:
+            return None
+        return encode_message({"type": "positions", "tick": self.tick, "p": pack_positions(moved)})
+
+    def flush(self, channels: Iterable[Any]) -> None:
+        """Starts a tick: applies the pending moves and sends each channel what it lacks."""
+        if not self._pending:
+            return
+        moves, self._pending = self._pending, {}
+        settled, self._settling = self._settling, set()
+        self._has_pending.clear()
+        self.tick += 1
+        for galaxy_id, position in moves.items():
+            self._live[galaxy_id] = (self.tick, position)
+        for galaxy_id in settled:
+            self._settled[galaxy_id] = self.tick
+        if self.on_tick is not None:
+            self.on_tick(pack_positions(moves.items()))
+
+        frames: Dict[int, Optional[str]] = {}
+        for channel in channels:
+            since = channel.position_tick
+            if since not in frames:
+                frames[since] = self.frame(since)
+            if frames[since] is not None:
+                channel.send_positions(self.tick, frames[since])
+                self.frames += 1
+
+        # Ended drags every dashboard has seen the end of are done with
+        behind = min(frames, default=self.tick)
+        for galaxy_id, tick in list(self._settled.items()):
+            if tick <= behind:
+                del self._settled[galaxy_id]
+                self._live.pop(galaxy_id, None)
+
+    async def run(self, channels: Callable[[], Iterable[Any]]) -> None:
+        """Sends a tick whenever galaxies have moved, at most once per interval."""
+        while True:
+            await self._has_pending.wait()
+            delay = self._last_flush + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_flush = time.monotonic()
+            try:
+                self.flush(channels())
+            except Exception as e:
+                logger.exception("Error sending galaxy positions")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tick": self.tick, "rate": 1.0 / self.interval, "dragging": len(self._live) - len(self._settled),
+                "moves": self.moves, "frames": self.frames}
@@ -0,0 +1,46 @@
+import hashlib
+import re
+from typing import Iterable, Tuple
+
+# Prompt variants are a base prompt followed by modifiers in brackets:
+#   "Classify the inquiry. [Be more direct.] [Cite sources.]"
+MAX_MODIFIERS = 3
+# The modifiers the optimizer picks from
+PROMPT_MODIFIERS = [
+    "Be more direct.", "Use simpler language.", "Adopt a professional tone.",
+    "Explain it like I'm five.", "Be more expressive and use emojis.",
+    "Sound more empathetic.", "Focus on the key takeaways.", "Provide a step-by-step guide.",
+    "Ensure the answer is factually accurate.", "Format the response as a list.",
+    "Summarize the main point in one sentence.", "Add a historical context.",
+    "Use a persuasive tone.", "Incorporate a compelling narrative.", "Cite sources.",
+    "Be more concise and to the point.", "Expand on the previous point."
+]
+
+_MODIFIER = re.compile(r"\s*\[([^\[\]]*)\]")
+_SPACES = re.compile(r"\s+")
+
+
+def split_prompt(text: str) -> Tuple[str, Tuple[str, ...]]:
+    """Splits a prompt into its base text and its modifiers, in order."""
+    modifiers = tuple(match.strip() for match in _MODIFIER.findall(text))
+    base = _SPACES.sub(" ", _MODIFIER.sub("", text)).strip()
+    return base, modifiers
+
+
+def build_prompt(base: str, modifiers: Iterable[str]) -> str:
+    return " ".join([base] + [f"[{modifier}]" for modifier in modifiers])
+
+
+def normalize_prompt(text: str) -> str:
+    """
+    The form under which two prompts count as the same candidate: whitespace
+    collapsed, case folded, and each modifier once, in a fixed order.
+    """
+    base, modifiers = split_prompt(text)
+    return build_prompt(base.casefold(), sorted({modifier.casefold() for modifier in modifiers}))
+
+
+def stable_fraction(key: str) -> float:
+    """Maps a string to [0, 1) the same way in every process."""
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2**64
@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class OptimizationRun:
+    """One planet's continuous optimization, from submission until it ends."""
+
+    def __init__(self, galaxy_id: str, planet_id: str, optimizer: str, score_threshold: float, priority: int,
+                 candidates: int = 1, strategy: Any = None):
+        self.galaxy_id = galaxy_id
+        self.planet_id = planet_id
+        self.optimizer = optimizer
+        self.score_threshold = score_threshold
+        self.priority = priority
+        self.candidates = candidates  # Variants generated and evaluated per step
+        self.strategy = strategy  # Proposes the candidates (see strategies.py)
+        # "queued" (waiting for a worker and budget) -> "running" (in a step)
+        # -> "cooling" (pause between steps) -> "queued" ...; a run stopped
+        # outside a step is "stopping" until it has ended
+        self.state = "queued"
+        self.steps = 0
+        self.last_score: Optional[float] = None
+        self.best_score: Optional[float] = None
+        self.submitted_at = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "planet_id": self.planet_id,
+            "galaxy_id": self.galaxy_id,
+            "optimizer": self.optimizer,
+            "strategy": getattr(self.strategy, "name", None),
+            "state": self.state,
+            "priority": self.priority,
+            "candidates": self.candidates,
+            "steps": self.steps,
+            "last_score": self.last_score,
+            "best_score": self.best_score,
+            "score_threshold": self.score_threshold,
+            "age_s": round(time.monotonic() - self.submitted_at, 2),
+        }
+
+
+class OptimizerScheduler:
+    """
+    Runs continuous optimizations as individual steps on a bounded pool.
+
+    A run alternates between waiting in the ready queue, executing one step
+    and cooling down. At most `max_concurrent` steps execute at once, and
+    every step draws from a global evaluations-per-second budget (a token
+    bucket, one token per candidate the step evaluates), so starting
+    hundreds of runs doesn't mean hundreds of free-running tasks.
+
+    The ready queue is ordered by priority (lower value first). Among ready
+    runs of equal priority, the galaxy that has been served the fewest steps
+    goes next, so one agent with hundreds of runs gets no more than its
+    share while others are waiting.
+
+    The server supplies `step(run)`, which performs one optimization step
+    and returns its score (None ends the run), and `finish(run)`, called
+    once a run has ended for any reason.
+    """
+
+    def __init__(self, step: Callable[[OptimizationRun], Awaitable[Optional[float]]],
+                 finish: Callable[[OptimizationRun], Awaitable[None]],
+                 max_concurrent: int = 50, evaluations_per_second: Optional[float] = 20.0,
+                 cooldown: Tuple[float, float] = (3.0, 7.0)):
+        self.step = step
+        self.finish = finish
+        self.max_concurrent = max_concurrent
+        self.evaluations_per_second = evaluations_per_second
+        self.cooldown = cooldown
+
+        # Every run that hasn't ended, by planet id
+        self.runs: Dict[str, OptimizationRun] = {}
+        self._ready: Dict[str, List[Tuple[int, int, OptimizationRun]]] = {}  # galaxy -> heap
+        self._ready_count = 0
+        self._served: Dict[str, int] = {}  # Steps dispatched per galaxy
+        self._running = 0
+        self._order = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        # Evaluation budget (token bucket, one token per candidate evaluated)
+        self._tokens = max(1.0, evaluations_per_second or 0.0)
+        self._refilled_at = time.monotonic()
+
+        # Counters
+        self.evaluations = 0
+        self.steps = 0
+        self.completed = 0
+        self.budget_wait = 0.0
+
+    # --- Submission ---
+
+    def submit(self, galaxy_id: str, planet_id: str, optimizer: str, score_threshold: float,
+               priority: int = 1, candidates: int = 1, strategy: Any = None) -> OptimizationRun:
+        """Adds a run for the planet; its first step is queued right away."""
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        run = OptimizationRun(galaxy_id, planet_id, optimizer, score_threshold, priority, candidates, strategy)
+        self.runs[planet_id] = run
+        self._make_ready(run)
+        return run
+
+    def stop(self, planet_id: str) -> bool:
+        """Cancels a run wherever it is. Returns False if there is none."""
+        run = self.runs.get(planet_id)
+        if run is None:
+            return False
+        if run.state == "stopping":
+            return True  # Already on its way out; don't end it twice
+        if run.state == "running":
+            run.task.cancel()  # The step's task ends the run
+            return True
+        if run.state == "queued":
+            queue = self._ready[run.galaxy_id]
+            queue[:] = [entry for entry in queue if entry[2] is not run]
+            heapq.heapify(queue)
+            if not queue:
+                del self._ready[run.galaxy_id]
+            self._ready_count -= 1
+        elif run.timer is not None:
+            run.timer.cancel()
+        run.state = "stopping"
+        logger.info("Optimization was cancelled", extra={"planet_id": run.planet_id})
+        asyncio.ensure_future(self._end(run))
+        return True
+
+    async def close(self) -> None:
+        """Stops every run and the dispatcher."""
+        for planet_id in list(self.runs):
+            self.stop(planet_id)
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        await asyncio.sleep(0)  # Let the cancelled steps unwind
+
+    # --- Dispatching ---
+
+    def _make_ready(self, run: OptimizationRun) -> None:
+        run.state = "queued"
+        run.timer = None
+        galaxy_id = run.galaxy_id
+        if galaxy_id not in self._ready:
+            # A galaxy that was idle rejoins at the current service level
+            # rather than claiming every step it didn't use.
+            floor = min((self._served.get(g, 0) for g in self._ready), default=0)
+            self._served[galaxy_id] = max(self._served.get(galaxy_id, 0), floor)
+        heapq.heappush(self._ready.setdefault(galaxy_id, []), (run.priority, next(self._order), run))
+        self._ready_count += 1
+        self._wakeup.set()
+
+    def _pop_ready(self) -> Optional[OptimizationRun]:
+        if not self._ready:
+            return None
+        galaxy_id = min(
+            self._ready,
+            key=lambda g: (self._ready[g][0][0], self._served.get(g, 0), self._ready[g][0][1]),
+        )
+        queue = self._ready[galaxy_id]
+        _, _, run = heapq.heappop(queue)
+        if not queue:
+            del self._ready[galaxy_id]
+        self._ready_count -= 1
+        self._served[galaxy_id] = self._served.get(galaxy_id, 0) + 1
+        return run
+
+    async def _acquire_evaluation(self) -> None:
+        rate = self.evaluations_per_second
+        if not rate:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(max(1.0, rate), self._tokens + (now - self._refilled_at) * rate)
+            self._refilled_at = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return
+            wait = (1.0 - self._tokens) / rate
+            self.budget_wait += wait
+            await asyncio.sleep(wait)
+
+    async def _dispatch(self) -> None:
+        while True:
+            while not self._ready_count or self._running >= self.max_concurrent:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            await self._acquire_evaluation()
+            run = self._pop_ready()
+            if run is None:
+                continue  # Stopped while waiting for the budget
+            if self.evaluations_per_second:
+                # A step larger than one evaluation goes into debt, which
+                # delays the steps after it
+                self._tokens -= run.candidates - 1
+            self._running += 1
+            run.state = "running"
+            run.task = asyncio.ensure_future(self._execute(run))
+
+    async def _execute(self, run: OptimizationRun) -> None:
+        try:
+            score = await self.step(run)
+        except asyncio.CancelledError:
+            logger.info("Optimization was cancelled", extra={"planet_id": run.planet_id})
+            score = None
+        except Exception:
+            logger.exception("Optimization step failed", extra={"planet_id": run.planet_id})
+            score = None
+        finally:
+            self._running -= 1
+            self._wakeup.set()
+
+        if score is not None:
+            self.evaluations += run.candidates
+            run.steps += 1
+            self.steps += 1
+            run.last_score = score
+            run.best_score = score if run.best_score is None else max(run.best_score, score)
+            if score < run.score_threshold:
+                run.state = "cooling"
+                run.timer = asyncio.get_running_loop().call_later(
+                    random.uniform(*self.cooldown), self._make_ready, run)
+                return
+            logger.info("Score threshold reached; stopping the optimization",
+                        extra={"planet_id": run.planet_id, "score_threshold": run.score_threshold, "score": score})
+        await self._end(run)
+
+    async def _end(self, run: OptimizationRun) -> None:
+        run.state = "ended"
+        self.runs.pop(run.planet_id, None)
+        self.completed += 1
+        await self.finish(run)
+
+    def stats(self) -> Dict[str, Any]:
+        cooling = len(self.runs) - self._ready_count - self._running
+        return {
+            "max_concurrent": self.max_concurrent,
+            "evaluations_per_second": self.evaluations_per_second,
+            "runs": len(self.runs),
+            "queue_depth": self._ready_count,
+            "running": self._running,
+            "cooling": cooling,
+            "evaluations": self.evaluations,
+            "steps": self.steps,
+            "completed": self.completed,
+            "budget_wait_s": round(self.budget_wait, 2),
+            "galaxy_steps": dict(self._served),
+            "active": [run.status() for run in self.runs.values()],
+        }
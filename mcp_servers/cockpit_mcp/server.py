@@ -1,44 +1,184 @@
 import asyncio
 import json
-import websockets
+import itertools
+import logging
 import random
 import os
+import signal
+import subprocess
+import sys
 import copy
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import traceback
-import httpx
 from aiohttp import web
 import aiohttp_cors
-from typing import Set, Dict, Any
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Any, Iterable, List, Optional, Tuple
+from state_sync import Patch
+from wire import PROTOCOL_PREFIX, FrameCache, build_dictionary, encode_message, negotiate_format
+from state_store import StateStore
+from models import GalaxyMap
+from locks import GalaxyLocks
+from persistence import StateLog
+from textures import TextureProxy
+from telemetry import TelemetryBatch, TelemetryBatcher, iter_ndjson, validate_agent_telemetry
+from fanout import ClientChannel
+from topics import UNIVERSE, TopicRouter, parse_topic
+from scheduler import OptimizationRun, OptimizerScheduler
+from judges import JudgePool
+from prompts import MAX_MODIFIERS, PROMPT_MODIFIERS, build_prompt, split_prompt
+from strategies import make_strategy
+from cluster import Replica, make_broker
+from traces import TraceStore
+from timeseries import TimeSeriesStore
+from operations import QUANTILES, WINDOWS, OperationsStore, digest_moved
+from onboarding import export_galaxy, new_galaxy, new_planet, validate_onboard_record
+from positions import PositionFeed, pack_positions, parse_position, unpack_positions
+from logs import configure_logging
+from metrics import REGISTRY
+from state_loader import StateFileReader
+
+if TYPE_CHECKING:
+    import httpx
+
+# Configured before the state is loaded, which already logs
+configure_logging()
+logger = logging.getLogger("server")
 
 # --- Constants and Configuration ---
-PROMPT_MODIFIERS = [
-    "Be more direct.", "Use simpler language.", "Adopt a professional tone.",
-    "Explain it like I'm five.", "Be more expressive and use emojis.",
-    "Sound more empathetic.", "Focus on the key takeaways.", "Provide a step-by-step guide.",
-    "Ensure the answer is factually accurate.", "Format the response as a list.",
-    "Summarize the main point in one sentence.", "Add a historical context.",
-    "Use a persuasive tone.", "Incorporate a compelling narrative.", "Cite sources.",
-    "Be more concise and to the point.", "Expand on the previous point."
-]
-INITIAL_STATE_FILE = os.path.join(os.path.dirname(__file__), 'simulated_data.json')
-# This lock ensures that only one simulation runs at a time globally.
-simulation_lock = asyncio.Lock()
+INITIAL_STATE_FILE = os.environ.get('COCKPIT_INITIAL_STATE',
+                                    os.path.join(os.path.dirname(__file__), 'simulated_data.json'))
+# Snapshot and write-ahead log; the initial state file only seeds the first run.
+STATE_DIR = os.environ.get('COCKPIT_STATE_DIR', os.path.join(os.path.dirname(__file__), 'state'))
+# Committed patches are written and fsynced to the log once per flush window
+STATE_FLUSH_INTERVAL = 0.05
+# Texture proxy: disk cache location, memory cache budget, browser cache lifetime,
+# and an optional stand-in for the upstream image hosts (e.g. a local stub server).
+TEXTURE_CACHE_DIR = os.path.join(STATE_DIR, 'textures')
+TEXTURE_MEMORY_CACHE_BYTES = 32 * 2**20
+TEXTURE_MAX_AGE_SECONDS = 7 * 24 * 3600
+TEXTURE_UPSTREAM = os.environ.get('COCKPIT_TEXTURE_UPSTREAM')
+# Per-galaxy locks; every mutation of a galaxy happens while holding its lock.
+galaxy_locks = GalaxyLocks()
+# Outbound WebSocket queues: size, what to do when one is full
+# ("coalesce", "drop" or "disconnect"), and the lag after which a client is dropped.
+CLIENT_QUEUE_SIZE = 64
+CLIENT_QUEUE_POLICY = "coalesce"
+CLIENT_MAX_LAG_SECONDS = 30.0
+# Optimizer runs: how many run at once (the rest queue), the global budget of
+# evaluations per second across all runs, and the pause between a run's steps.
+OPTIMIZER_MAX_CONCURRENT = 50
+OPTIMIZER_EVALUATIONS_PER_SECOND = 20.0
+OPTIMIZER_COOLDOWN_SECONDS = (3.0, 7.0)
+# Each step asks the run's search strategy for a batch of candidates, evaluates
+# them together and keeps the best few in the trace history. Runs can ask for
+# a different batch size.
+OPTIMIZER_CANDIDATES_PER_STEP = 4
+OPTIMIZER_KEEP_PER_STEP = 2
+# Every variant is kept in the trace store (see traces.py); the universe only
+# carries each planet's most recent few for the live view.
+TRACE_LIVE_WINDOW = 5
+TRACE_PAGE_SIZE = 50
+# Trend history of each planet's deployed evaluation, rolled up in memory at
+# 1 s, 1 min and 1 h (see timeseries.py). Range queries default to the last hour.
+SERIES_METRICS = ("score", "factuality", "hallucination", "speed")
+# The judges grade factuality and hallucination in words; their trends are
+# recorded on these scales (seeded data already holds numbers there)
+SERIES_LEVELS = {
+    "factuality": {"Needs Improvement": 0.0, "Low": 0.0, "Meets Expectations": 0.5, "Medium": 0.5,
+                   "Exceeds Expectations": 1.0, "High": 1.0},
+    "hallucination": {"Not Detected": 0.0, "None": 0.0, "Detected": 1.0},
+}
+SERIES_DEFAULT_RANGE_SECONDS = 3600
+# Operational metrics agents send with their telemetry (latency, errors,
+# tokens), rolled up per agent and per planet over sliding windows (see
+# operations.py). Each galaxy's figures for one window are put in its
+# "operations" field at most once per interval, and only once they moved.
+OPERATIONS_GALAXY_WINDOW = "5m"
+OPERATIONS_PUBLISH_INTERVAL = 5.0
+# Startup: the server listens right away and streams the universe in from the
+# state files on a thread (see state_loader.py), while only these routes are
+# served; the rest answer 503 and WebSockets wait until it is loaded. Logged
+# patches are replayed in batches of this many records.
+SERVED_WHILE_LOADING = {'/api/universe/summary', '/api/texture', '/api/texture/stats', '/api/clients',
+                        '/api/wire/dictionary', '/api/cluster/status', '/metrics'}
+LOAD_REPLAY_BATCH = 1000
+# Fleet export: NDJSON lines are written out in chunks of about this size
+EXPORT_CHUNK_BYTES = 64 * 1024
+# Telemetry is applied and broadcast at most once per flush window
+TELEMETRY_FLUSH_INTERVAL = 0.1
+# Variant evaluation: where custom judges/metrics are loaded from, and whether
+# they run in worker processes ("process", for CPU-bound metrics) or threads
+# ("thread", for judges that wait on remote APIs). Evaluations requested within
+# the batch window are scored together, up to the batch size.
+CUSTOM_METRICS_DIR = os.path.join(os.path.dirname(__file__), 'custom_metrics')
+JUDGE_EXECUTOR = os.environ.get('COCKPIT_JUDGE_EXECUTOR', 'process')
+JUDGE_WORKERS = os.cpu_count()
+JUDGE_BATCH_WINDOW = 0.01
+JUDGE_MAX_BATCH = 32
+# Cluster mode (see cluster.py): how many worker processes serve the port, the
+# broker carrying patches from the leader to the other workers ("unix", or a
+# redis:// URL), and where the leader's Unix sockets live. Workers started by
+# the leader run with COCKPIT_ROLE=replica.
+WORKERS = int(os.environ.get('COCKPIT_WORKERS', '1'))
+CLUSTER_BROKER = os.environ.get('COCKPIT_BROKER', 'unix')
+CLUSTER_DIR = os.environ.get('COCKPIT_CLUSTER_DIR', STATE_DIR)
+CLUSTER_BUS_SOCKET = os.path.join(CLUSTER_DIR, 'cluster-bus.sock')
+CLUSTER_HTTP_SOCKET = os.path.join(CLUSTER_DIR, 'cluster-http.sock')
+IS_REPLICA = os.environ.get('COCKPIT_ROLE') == 'replica'
+# GET routes that only the leader can answer; replicas forward them like writes
+LEADER_ONLY_PATHS = {'/api/optimizer/status', '/api/telemetry/stats', '/api/cluster/snapshot', '/metrics',
+                     '/api/operations'}
+LEADER_ONLY_PREFIXES = ('/api/planet/', '/api/galaxy/')
+
+# --- Metrics ---
+# Hot-path timings; everything the components already count is read when
+# /metrics is scraped (see register_metrics). Only the leader serves
+# /metrics, so the request metrics are the leader's own.
+HTTP_REQUEST_SECONDS = REGISTRY.histogram("cockpit_http_request_duration_seconds",
+                                          "HTTP request latency by route.", ("method", "route"))
+HTTP_REQUESTS = REGISTRY.counter("cockpit_http_requests_total", "HTTP requests by route and status.",
+                                 ("method", "route", "status"))
+PUBLISH_SECONDS = REGISTRY.histogram("cockpit_publish_seconds",
+                                     "Time to commit, log and broadcast a patch.")
+BROADCAST_SECONDS = REGISTRY.histogram("cockpit_broadcast_seconds",
+                                       "Time to queue a message for every full-stream client.")
+BROADCAST_CLIENTS = REGISTRY.histogram("cockpit_broadcast_clients", "Clients each broadcast was queued for.",
+                                       buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000))
 
 # --- Data Loading and State Management ---
-def load_initial_state():
-    """Loads the initial galaxy state from the JSON file."""
-    with open(INITIAL_STATE_FILE, 'r') as f:
-        return json.load(f)
-
-# The global state of the universe
-galaxies: Dict[str, Any] = load_initial_state()
-clients: Set[web.WebSocketResponse] = set()
-# In-memory store for active optimization tasks
-active_optimizations: Dict[str, asyncio.Task] = {} # {planet_id: asyncio.Task}
+state_log = StateLog(STATE_DIR, flush_interval=STATE_FLUSH_INTERVAL)
+trace_store = TraceStore(STATE_DIR)
+metric_history = TimeSeriesStore(SERIES_METRICS, levels=SERIES_LEVELS)
+agent_operations = OperationsStore()
+planet_operations = OperationsStore()
+# Every agent's requests in one more series, so the fleet's figures don't
+# need all the agents' merged
+fleet_operations = OperationsStore()
+
+
+# The global state of the universe; empty until load_state() has streamed it in
+galaxies = GalaxyMap()
+# Set once the universe is loaded and writable
+state_loaded = asyncio.Event()
+load_progress: Dict[str, Any] = {"file": None, "bytes": 0, "total_bytes": 0, "galaxies": 0, "records": 0}
+clients: Dict[web.WebSocketResponse, ClientChannel] = {}
+# Broadcasts encoded once per wire format, for dashboards not on plain JSON
+frame_cache = FrameCache(build_dictionary(PROMPT_MODIFIERS))
+# Dragged galaxies' live positions, sent to dashboards at a fixed tick rate
+position_feed = PositionFeed()
+# On a replica: drag steps from this worker's dashboards, on their way to the leader
+position_outbox: Dict[str, Tuple[float, float, float]] = {}
+# Versioned, indexed view of the universe; every mutation goes through a patch
+universe = StateStore({"galaxies": galaxies, "optimizing_planets": []})
+# Routes patches to dashboards subscribed to a universe, galaxy or planet scope
+topic_router = TopicRouter(universe)
 
 # --- Image Proxy Logic ---
+texture_proxy = TextureProxy(cache_dir=TEXTURE_CACHE_DIR, max_memory_bytes=TEXTURE_MEMORY_CACHE_BYTES,
+                             upstream=TEXTURE_UPSTREAM)
+
+
 async def get_texture(request: web.Request) -> web.Response:
     theme = request.query.get('theme')
     item_id = request.query.get('id')
@@ -46,26 +186,39 @@ async def get_texture(request: web.Request) -> web.Response:
     if not theme or not item_id:
         return web.Response(status=400, text="Bad Request: Missing theme or id")
 
-    theme_generators = {
-        'cats': f"https://cataas.com/cat/cute/says/galaxy-agent?width=512&height=512&color=white&type=square&s=20&id={item_id}",
-        'pokemon': f"https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/other/official-artwork/{(abs(hash(item_id)) % 898) + 1}.png",
-    }
-
-    image_url = theme_generators.get(theme)
+    image_url = texture_proxy.url_for(theme, item_id)
     if not image_url:
         return web.Response(status=404, text="Not Found: Invalid theme")
 
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(image_url, timeout=15.0)
-            resp.raise_for_status()  # Raise an exception for bad status codes
-            
-            headers = {'Content-Type': resp.headers.get('Content-Type', 'image/png')}
-            return web.Response(body=resp.content, headers=headers)
-        
-        except httpx.RequestError as exc:
-            print(f"An error occurred while requesting {exc.request.url!r}.")
-            return web.Response(status=500, text=f"Error fetching image: {exc}")
+    import httpx  # Only needed once textures are fetched, like in textures.py
+    try:
+        texture = await texture_proxy.get(image_url)
+    except httpx.HTTPStatusError as exc:
+        logger.warning("Texture upstream returned an error",
+                       extra={"status": exc.response.status_code, "url": str(exc.request.url)})
+        return web.Response(status=502, text=f"Error fetching image: {exc}")
+    except httpx.RequestError as exc:
+        logger.warning("Texture request failed", extra={"url": str(exc.request.url), "error": str(exc)})
+        return web.Response(status=500, text=f"Error fetching image: {exc}")
+
+    # The image for a theme and id never changes, so browsers may keep it
+    headers = {
+        'ETag': texture.etag,
+        'Cache-Control': f"public, max-age={TEXTURE_MAX_AGE_SECONDS}",
+    }
+    if texture.etag in request.headers.get('If-None-Match', ''):
+        return web.Response(status=304, headers=headers)
+    headers['Content-Type'] = texture.content_type
+    return web.Response(body=texture.body, headers=headers)
+
+
+async def handle_texture_stats(request: web.Request) -> web.Response:
+    """Reports texture cache hits, upstream fetches and coalesced requests."""
+    return web.json_response(texture_proxy.stats())
+
+
+async def close_texture_proxy(app: web.Application) -> None:
+    await texture_proxy.close()
 
 async def handle_onboard(request: web.Request) -> web.Response:
     """Handles onboarding of a new agent."""
@@ -77,55 +230,161 @@ async def handle_onboard(request: web.Request) -> web.Response:
             return web.Response(status=400, text="Bad Request: Missing agent id")
 
         # Create a new galaxy structure for the agent
-        new_galaxy = {
-            "id": agent_id,
-            "name": data.get("name", "Unnamed Agent"),
-            "position": [random.uniform(-100, 100), 0, random.uniform(-100, 100)],
-            "theme": {"hue": random.random()},
-            "status": "initializing",
-            "status_message": "Onboarding complete. Awaiting first telemetry.",
-            "config": {
-                "apiUrl": data.get("apiUrl"),
-                "authToken": data.get("authToken"),
-                "opikMetrics": data.get("opikMetrics", [])
-            },
-            "planets": [],
-            "comets": []
-        }
+        galaxy = new_galaxy({"id": agent_id, "name": data.get("name", "Unnamed Agent"),
+                             "apiUrl": data.get("apiUrl"), "authToken": data.get("authToken"),
+                             "opikMetrics": data.get("opikMetrics", [])})
         
-        galaxies[agent_id] = new_galaxy
-        
-        # Announce the update to all clients
-        await broadcast_message({"type": "update", "payload": {"galaxies": copy.deepcopy(galaxies)}})
+        async with galaxy_locks.hold(agent_id):
+            patch = universe.patch()
+            patch.set("galaxies", agent_id, value=galaxy)
+            
+            # Announce the update to all clients
+            publish(patch)
 
         return web.Response(status=200, text=f"Agent {agent_id} onboarded successfully.")
 
     except Exception as e:
-        print(f"Onboarding error: {e}")
-        traceback.print_exc()
+        logger.exception("Onboarding error")
         return web.Response(status=500, text="Internal Server Error during onboarding.")
 
-def _update_galaxy_status_based_on_planets(galaxy: Dict[str, Any]) -> None:
+async def read_records(request: web.Request) -> AsyncIterator[Tuple[int, Any]]:
     """
-    Recalculates the galaxy's status based on the average score of its planets.
-    This is called when an optimization completes or is cancelled.
+    Yields (position, record) for the records of a bulk request body: a
+    streamed NDJSON body, read line by line, or JSON ({"agents": [...]} or a
+    bare list). Undecodable NDJSON lines come through as ValueError records.
     """
-    if galaxy.get("comets"):
-        galaxy["status"] = "optimizing"
+    if request.content_type in ('application/x-ndjson', 'application/ndjson'):
+        async for position, record in iter_ndjson(request.content):
+            yield position, record
         return
+    data = await request.json()
+    items = data.get("agents", []) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("Expected a list of agent records")
+    for index, item in enumerate(items):
+        yield index, item
 
-    planets = galaxy.get("planets", [])
-    if not planets:
-        galaxy["status"] = "stable"
-        return
 
-    total_score = sum(p.get("deployedVersion", {}).get("evaluation", {}).get("score", 0) for p in planets)
-    average_score = total_score / len(planets)
+async def handle_onboard_batch(request: web.Request) -> web.Response:
+    """
+    Onboards a fleet of agents, one record per agent as for /api/onboard plus
+    optional "planets" and "metricMapping" (a line of the export works too).
+    Valid records are applied together as one patch and broadcast once;
+    invalid ones, and agents that already exist, are reported individually.
+    """
+    try:
+        galaxies_to_add: Dict[str, Tuple[int, Dict[str, Any]]] = {}  # Agent -> (record position, galaxy)
+        claimed: Dict[str, str] = {}  # Planet id -> agent, for this batch
+        errors = []
+
+        def owner_of(planet_id: str) -> Optional[str]:
+            if planet_id in claimed:
+                return claimed[planet_id]
+            galaxy = universe.galaxy_of(planet_id)
+            return galaxy["id"] if galaxy else None
+
+        def check_new(galaxy: Dict[str, Any]) -> None:
+            """Raises ValueError if the agent or one of its planets already exists in the universe."""
+            if universe.galaxy(galaxy["id"]):
+                raise ValueError(f"agent '{galaxy['id']}' already exists")
+            for planet in galaxy["planets"]:
+                if universe.galaxy_of(planet["id"]):
+                    raise ValueError(f"planet id '{planet['id']}' is already in use")
+
+        async for position, record in read_records(request):
+            try:
+                if isinstance(record, ValueError):
+                    raise record
+                galaxy = validate_onboard_record(record, owner_of)
+                if galaxy["id"] in galaxies_to_add:
+                    raise ValueError(f"agent '{galaxy['id']}' appears twice in this batch")
+                check_new(galaxy)
+            except ValueError as e:
+                errors.append({"record": position, "error": str(e)})
+                continue
+            galaxies_to_add[galaxy["id"]] = (position, galaxy)
+            claimed.update((planet["id"], galaxy["id"]) for planet in galaxy["planets"])
+
+        accepted = 0
+        if galaxies_to_add:
+            async with galaxy_locks.hold(*galaxies_to_add):
+                # Checked again now that the agents are locked: another request may have
+                # onboarded them, or claimed their planets, while this body was read.
+                # Nothing awaits from here to the publish, so the check holds.
+                patch = universe.patch()
+                for agent_id, (position, galaxy) in galaxies_to_add.items():
+                    try:
+                        check_new(galaxy)
+                    except ValueError as e:
+                        errors.append({"record": position, "error": str(e)})
+                        continue
+                    patch.set("galaxies", agent_id, value=galaxy)
+                    for planet in galaxy["planets"]:
+                        for variant in reversed(planet["traceHistory"]):
+                            trace_store.append(planet["id"], agent_id, variant)
+                        sample_planet_metrics(planet["id"])
+                    accepted += 1
+                publish(patch)
+            errors.sort(key=lambda error: error["record"])
+
+        return web.json_response({"accepted": accepted, "rejected": len(errors),
+                                  "errors": errors, "revision": universe.revision})
+
+    except ValueError as e:
+        return web.Response(status=400, text=f"Bad Request: {e}")
+    except Exception as e:
+        logger.exception("Batch onboarding error")
+        return web.Response(status=500, text="Internal Server Error during onboarding.")
+
 
-    if average_score < 0.6:
-        galaxy["status"] = "critical"
+async def handle_export(request: web.Request) -> web.StreamResponse:
+    """
+    Streams every agent as NDJSON, one galaxy per line in the format the
+    batch onboarding accepts. Lines are encoded as they are written, so each
+    galaxy is exported as it was at that moment. Auth tokens are left out
+    unless ?secrets=true.
+    """
+    include_secrets = request.query.get('secrets', '').lower() in ('1', 'true', 'yes')
+    response = web.StreamResponse(headers={
+        'Content-Type': 'application/x-ndjson',
+        'Content-Disposition': 'attachment; filename="agents.ndjson"',
+        'X-Cockpit-Revision': str(universe.revision),
+    })
+    await response.prepare(request)
+    chunk: List[str] = []
+    size = 0
+    for galaxy_id in list(galaxies):
+        galaxy = universe.galaxy(galaxy_id)
+        if galaxy is None:
+            continue  # Deleted while the export was being written
+        line = encode_message(export_galaxy(galaxy, include_secrets))
+        chunk.append(line)
+        size += len(line) + 1
+        if size >= EXPORT_CHUNK_BYTES:
+            await response.write(("\n".join(chunk) + "\n").encode("utf-8"))
+            chunk, size = [], 0
+    if chunk:
+        await response.write(("\n".join(chunk) + "\n").encode("utf-8"))
+    await response.write_eof()
+    return response
+
+
+def _update_galaxy_status_based_on_planets(patch: Patch, galaxy: Dict[str, Any]) -> None:
+    """
+    Recalculates the galaxy's status based on the average score of its planets.
+    This is called when an optimization completes or is cancelled.
+    """
+    # The store keeps the galaxy's totals current, so this doesn't visit its planets
+    stats = universe.galaxy_stats(galaxy["id"])
+    if stats.comets:
+        status = "optimizing"
+    elif not stats.planets:
+        status = "stable"
     else:
-        galaxy["status"] = "stable"
+        status = "critical" if stats.average_score < 0.6 else "stable"
+
+    if galaxy.get("status") != status:
+        patch.set("galaxies", galaxy["id"], "status", value=status)
 
 # --- Frontend-driven Optimizer Endpoints ---
 
@@ -139,32 +398,59 @@ async def handle_optimizer_start(request: web.Request) -> web.Response:
         planet_id = data.get("planet_id")
         optimizer = data.get("optimizer", "Few-shot Bayesian")
         score_threshold = data.get("score_threshold", 0.95)
-
-        if planet_id in active_optimizations:
-            return web.json_response({"status": "already_running"}, status=409)
-
-        galaxy = galaxies.get(galaxy_id)
-        if not galaxy:
-            return web.Response(status=404, text="Galaxy not found")
-        planet = next((p for p in galaxy.get('planets', []) if p['id'] == planet_id), None)
-        if not planet:
-            return web.Response(status=404, text="Planet not found")
-
-        # Start the background task
-        task = asyncio.create_task(
-            run_continuous_optimization(galaxy_id, planet_id, optimizer, score_threshold)
-        )
-        active_optimizations[planet_id] = task
-
-        # Update galaxy status and broadcast
-        galaxy["status"] = "optimizing"
-        await broadcast_message({"type": "update", "payload": {"galaxies": copy.deepcopy(galaxies)}})
+        priority = data.get("priority")
+        try:
+            candidates = int(data.get("candidates", OPTIMIZER_CANDIDATES_PER_STEP))
+            if priority is not None:
+                priority = int(priority)
+        except (TypeError, ValueError):
+            return web.json_response({"status": "error", "message": "candidates and priority must be integers"},
+                                     status=400)
+        if not 1 <= candidates <= len(PROMPT_MODIFIERS):
+            return web.json_response({"status": "error",
+                                      "message": f"candidates must be between 1 and {len(PROMPT_MODIFIERS)}"},
+                                     status=400)
+
+        async with galaxy_locks.hold(galaxy_id):
+            if planet_id in active_optimizations:
+                return web.json_response({"status": "already_running"}, status=409)
+
+            galaxy = universe.galaxy(galaxy_id)
+            if not galaxy:
+                return web.Response(status=404, text="Galaxy not found")
+            planet = universe.planet(planet_id, galaxy_id)
+            if not planet:
+                return web.Response(status=404, text="Planet not found")
+
+            # Critical galaxies are optimized first unless the caller says otherwise
+            if priority is None:
+                priority = 0 if galaxy.get("status") == "critical" else 1
+            # The search starts from the deployed prompt's modifiers and score
+            deployed = planet["deployedVersion"]
+            base_text, modifiers = split_prompt(deployed["text"])
+            try:
+                strategy = make_strategy(optimizer, base_text, PROMPT_MODIFIERS, start=modifiers,
+                                         start_score=deployed.get("evaluation", {}).get("score"))
+            except ValueError as e:
+                return web.Response(status=400, text=f"Bad Request: {e}")
+            run = optimizer_scheduler.submit(galaxy_id, planet_id, optimizer, score_threshold,
+                                             priority=priority, candidates=candidates, strategy=strategy)
+
+            # Update galaxy status and broadcast
+            patch = universe.patch()
+            patch.set("galaxies", galaxy_id, "status", value="optimizing")
+            patch.set("optimizing_planets", value=list(active_optimizations.keys()))
+            publish(patch)
         
-        return web.json_response({"status": "success", "message": f"Optimization started for planet {planet_id}."})
+        return web.json_response({
+            "status": "success",
+            "state": run.state,
+            "strategy": strategy.name,
+            "message": f"Optimization started for planet {planet_id}.",
+        })
 
     except Exception as e:
-        print(f"Optimizer start error: {e}")
-        traceback.print_exc()
+        logger.exception("Optimizer start error")
         return web.Response(status=500, text="Internal Server Error")
 
 async def handle_optimizer_generate_variant(request: web.Request) -> web.Response:
@@ -174,28 +460,32 @@ async def handle_optimizer_generate_variant(request: web.Request) -> web.Respons
         galaxy_id = data.get("galaxy_id")
         planet_id = data.get("planet_id")
 
-        galaxy = galaxies.get(galaxy_id)
-        if not galaxy:
-            return web.Response(status=404, text="Galaxy or Planet not found")
-        planet = next((p for p in galaxy.get('planets', []) if p['id'] == planet_id), None)
-        if not planet:
-            return web.Response(status=404, text="Galaxy or Planet not found")
-        
-        base_variant = planet["deployedVersion"]
-        metrics = galaxy.get("config", {}).get("opikMetrics", [])
-        
-        new_variant = generate_new_variant(base_variant["text"])
-        new_variant["evaluation"] = evaluate_with_opik_judges(base_variant["evaluation"]["score"], metrics)
-        
-        planet["traceHistory"].insert(0, new_variant)
-        if len(planet["traceHistory"]) > 15:
-            planet["traceHistory"].pop()
+        async with galaxy_locks.hold(galaxy_id):
+            galaxy = universe.galaxy(galaxy_id)
+            if not galaxy:
+                return web.Response(status=404, text="Galaxy or Planet not found")
+            planet = universe.planet(planet_id, galaxy_id)
+            if not planet:
+                return web.Response(status=404, text="Galaxy or Planet not found")
             
-        await broadcast_message({"type": "update", "payload": {"galaxies": copy.deepcopy(galaxies)}})
+            base_variant = planet["deployedVersion"]
+            metrics = galaxy.get("config", {}).get("opikMetrics", [])
+            new_variant = generate_new_variant(base_variant["text"])
+
+        # Evaluation can take a while; the galaxy stays unlocked meanwhile
+        new_variant["evaluation"] = await evaluate_with_opik_judges(
+            new_variant["text"], base_variant["evaluation"]["score"], metrics)
+
+        async with galaxy_locks.hold(galaxy_id):
+            if not universe.planet(planet_id, galaxy_id):
+                return web.Response(status=404, text="Galaxy or Planet not found")
+            patch = universe.patch()
+            record_trace(patch, galaxy_id, planet_id, new_variant)
+            publish(patch)
         return web.json_response({"status": "success", "variant": new_variant})
 
     except Exception as e:
-        print(f"Generate variant error: {e}")
+        logger.exception("Generate variant error")
         return web.Response(status=500, text="Internal Server Error")
 
 async def handle_optimizer_deploy_variant(request: web.Request) -> web.Response:
@@ -206,28 +496,33 @@ async def handle_optimizer_deploy_variant(request: web.Request) -> web.Response:
         planet_id = data.get("planet_id")
         variant_id = data.get("variant_id")
 
-        galaxy = galaxies.get(galaxy_id)
-        if not galaxy:
-            return web.Response(status=404, text="Galaxy or Planet not found")
-        planet = next((p for p in galaxy.get('planets', []) if p['id'] == planet_id), None)
-        if not planet:
-            return web.Response(status=404, text="Galaxy or Planet not found")
+        async with galaxy_locks.hold(galaxy_id):
+            galaxy = universe.galaxy(galaxy_id)
+            if not galaxy:
+                return web.Response(status=404, text="Galaxy or Planet not found")
+            planet = universe.planet(planet_id, galaxy_id)
+            if not planet:
+                return web.Response(status=404, text="Galaxy or Planet not found")
 
-        variant_to_deploy = next((v for v in planet.get('traceHistory', []) if v['id'] == variant_id), None)
-        if not variant_to_deploy:
-            return web.Response(status=404, text="Variant not found in trace history")
+            # Older variants are only in the trace store
+            variant_to_deploy = universe.trace(planet_id, variant_id, galaxy_id) or await trace_store.get(planet_id, variant_id)
+            if not variant_to_deploy:
+                return web.Response(status=404, text="Variant not found in trace history")
 
-        planet["deployedVersion"] = variant_to_deploy
-        
-        # End optimization for the planet and check if the galaxy is still optimizing
-        galaxy["comets"] = [c for c in galaxy.get("comets", []) if c.get("targetPlanetId") != planet_id]
-        _update_galaxy_status_based_on_planets(galaxy)
+            patch = universe.patch()
+            patch.set("galaxies", galaxy_id, "planets", planet_id, "deployedVersion", value=variant_to_deploy)
+            sample_planet_metrics(planet_id)
+            
+            # End optimization for the planet and check if the galaxy is still optimizing
+            comets = [c for c in galaxy.get("comets", []) if c.get("targetPlanetId") != planet_id]
+            patch.set("galaxies", galaxy_id, "comets", value=comets)
+            _update_galaxy_status_based_on_planets(patch, galaxy)
 
-        await broadcast_message({"type": "update", "payload": {"galaxies": copy.deepcopy(galaxies)}})
+            publish(patch)
         return web.json_response({"status": "success", "deployed_variant_id": variant_id})
 
     except Exception as e:
-        print(f"Deploy variant error: {e}")
+        logger.exception("Deploy variant error")
         return web.Response(status=500, text="Internal Server Error")
 
 async def handle_optimizer_stop(request: web.Request) -> web.Response:
@@ -236,16 +531,19 @@ async def handle_optimizer_stop(request: web.Request) -> web.Response:
         data = await request.json()
         planet_id = data.get("planet_id")
 
-        task = active_optimizations.get(planet_id)
-        if task:
-            task.cancel()
-            # The task's finally block will handle cleanup
-            return web.json_response({"status": "success", "message": f"Optimization stopping for planet {planet_id}."})
+        if optimizer_scheduler.stop(planet_id):
+            # The scheduler's finish callback will handle cleanup
+            galaxy = universe.galaxy_of(planet_id)
+            return web.json_response({
+                "status": "success",
+                "message": f"Optimization stopping for planet {planet_id}.",
+                "galaxy_id": galaxy["id"] if galaxy else None,
+            })
         else:
             return web.Response(status=404, text="No active optimization found for this planet.")
 
     except Exception as e:
-        print(f"Optimizer stop error: {e}")
+        logger.exception("Optimizer stop error")
         return web.Response(status=500, text="Internal Server Error")
 
 async def handle_delete_agent(request: web.Request) -> web.Response:
@@ -254,33 +552,47 @@ async def handle_delete_agent(request: web.Request) -> web.Response:
     if not agent_id:
         return web.Response(status=400, text="Bad Request: Missing agent_id")
 
-    if agent_id in galaxies:
-        del galaxies[agent_id]
-        # Persist changes
-        # ... (removed for simplicity)
-        await broadcast_message({"type": "update", "payload": {"galaxies": copy.deepcopy(galaxies)}})
-        return web.Response(status=200, text=f"Agent {agent_id} deleted.")
-    else:
-        return web.Response(status=404, text="Agent not found.")
+    async with galaxy_locks.hold(agent_id):
+        if agent_id not in galaxies:
+            return web.Response(status=404, text="Agent not found.")
+        for planet in galaxies[agent_id].get("planets", []):
+            metric_history.drop(planet["id"])
+            planet_operations.drop(planet["id"])
+        agent_operations.drop(agent_id)
+        patch = universe.patch()
+        patch.delete("galaxies", agent_id)
+        # Persisted through the state log like every other patch
+        publish(patch)
+        position_feed.settle(agent_id)
+    return web.Response(status=200, text=f"Agent {agent_id} deleted.")
 
 async def handle_update_position(request: web.Request) -> web.Response:
-    """Updates the 3D position of a galaxy."""
+    """
+    Persists the 3D position of a galaxy at the end of a drag. The drag
+    itself streams over the dashboard's WebSocket (see PositionFeed).
+    """
     try:
         agent_id = request.match_info.get('agent_id')
         if not agent_id:
             return web.Response(status=400, text="Bad Request: Missing agent_id")
         
         data = await request.json()
-        new_position = data.get('position')
+        try:
+            new_position = parse_position(data.get('position'))
+        except ValueError as e:
+            return web.Response(status=400, text=f"Bad Request: {e}")
         
-        if agent_id in galaxies:
-            galaxies[agent_id]['position'] = new_position
-            # No broadcast needed, client handles optimistic update
-            return web.Response(status=200)
-        else:
-            return web.Response(status=404, text="Agent not found")
+        async with galaxy_locks.hold(agent_id):
+            if agent_id in galaxies:
+                patch = universe.patch()
+                patch.set("galaxies", agent_id, "position", value=list(new_position))
+                publish(patch)
+                position_feed.settle(agent_id, new_position)
+                return web.Response(status=200)
+            else:
+                return web.Response(status=404, text="Agent not found")
     except Exception as e:
-        print(f"Update position error: {e}")
+        logger.exception("Update position error")
         return web.Response(status=500, text="Internal Server Error")
 
 async def handle_update_metric_mapping(request: web.Request) -> web.Response:
@@ -293,16 +605,18 @@ async def handle_update_metric_mapping(request: web.Request) -> web.Response:
         data = await request.json()
         new_mapping = data.get('metricMapping')
 
-        if agent_id in galaxies:
-            if 'config' not in galaxies[agent_id]:
-                galaxies[agent_id]['config'] = {}
-            galaxies[agent_id]['config']['metricMapping'] = new_mapping
-            await broadcast_message({"type": "update", "payload": {"galaxies": copy.deepcopy(galaxies)}})
-            return web.Response(status=200)
-        else:
-            return web.Response(status=404, text="Agent not found")
+        async with galaxy_locks.hold(agent_id):
+            if agent_id in galaxies:
+                patch = universe.patch()
+                if 'config' not in galaxies[agent_id]:
+                    patch.set("galaxies", agent_id, "config", value={})
+                patch.set("galaxies", agent_id, "config", "metricMapping", value=new_mapping)
+                publish(patch)
+                return web.Response(status=200)
+            else:
+                return web.Response(status=404, text="Agent not found")
     except Exception as e:
-        print(f"Error updating metric mapping: {e}")
+        logger.exception("Error updating metric mapping")
         return web.Response(status=500, text="Internal Server Error")
 
 
@@ -321,46 +635,57 @@ async def handle_toggle_planet_status(request: web.Request) -> web.Response:
         if new_status not in ['active', 'inactive']:
             return web.Response(status=400, text="Bad Request: Invalid status")
 
-        galaxy = galaxies.get(agent_id)
-        if not galaxy:
-            return web.Response(status=404, text="Agent not found")
-        
-        planet = next((p for p in galaxy.get('planets', []) if p['id'] == planet_id), None)
-        if not planet:
-            return web.Response(status=404, text="Planet not found")
+        async with galaxy_locks.hold(agent_id):
+            galaxy = universe.galaxy(agent_id)
+            if not galaxy:
+                return web.Response(status=404, text="Agent not found")
+            
+            planet = universe.planet(planet_id, agent_id)
+            if not planet:
+                return web.Response(status=404, text="Planet not found")
 
-        planet['status'] = new_status
-        await broadcast_message({"type": "update", "payload": {"galaxies": copy.deepcopy(galaxies)}})
+            patch = universe.patch()
+            patch.set("galaxies", agent_id, "planets", planet_id, "status", value=new_status)
+            publish(patch)
         return web.json_response({"status": "success"})
     except Exception as e:
-        print(f"Error toggling planet status: {e}")
+        logger.exception("Error toggling planet status")
         return web.Response(status=500, text="Internal Server Error")
 
 
-def evaluate_with_opik_judges(base_score: float, metrics_to_evaluate: list) -> Dict[str, Any]:
+judge_pool = JudgePool(CUSTOM_METRICS_DIR, executor=JUDGE_EXECUTOR, workers=JUDGE_WORKERS,
+                       batch_window=JUDGE_BATCH_WINDOW, max_batch=JUDGE_MAX_BATCH)
+
+
+async def evaluate_with_opik_judges(text: str, base_score: float, metrics_to_evaluate: list) -> Dict[str, Any]:
     """
-    Simulates calling Opik judges for a more comprehensive evaluation.
-    This is a placeholder for a real-world, complex evaluation system.
+    Evaluates a variant with the built-in judges (simulated Opik judges) and
+    any custom metrics the galaxy asks for, on the judge pool.
     """
-    score_multiplier = random.uniform(0.8, 1.2) # Simulate variability
-    new_score = max(0, min(1, base_score * score_multiplier))
-    
-    return {
-        "score": new_score,
-        "factuality": random.choice(["Meets Expectations", "Exceeds Expectations", "Needs Improvement"]),
-        "hallucination": "Detected" if random.random() < 0.1 else "Not Detected",
-        "speed": int(random.uniform(50, 500)),
-    }
+    return await judge_pool.evaluate(text, base_score, metrics_to_evaluate)
+
+
+async def close_judge_pool(app: web.Application) -> None:
+    await judge_pool.close()
 
 
 def generate_new_variant(base_text: str) -> Dict[str, Any]:
-    """Generates a new prompt variant by applying a random modification."""
+    """
+    Generates a new prompt variant by applying a random modification. The
+    oldest modifier is dropped once there are MAX_MODIFIERS of them, so
+    prompts don't keep growing.
+    """
     modifier = random.choice(PROMPT_MODIFIERS)
-    new_text = f"{base_text} [{modifier}]"
-    
+    base, modifiers = split_prompt(base_text)
+    modifiers = [m for m in modifiers if m != modifier] + [modifier]
+    return make_variant(build_prompt(base, modifiers[-MAX_MODIFIERS:]))
+
+
+def make_variant(text: str) -> Dict[str, Any]:
+    """Wraps prompt text in a new, not yet evaluated variant."""
     return {
         "id": f"var_{int(time.time() * 1000)}_{random.randint(1000, 9999)}",
-        "text": new_text,
+        "text": text,
         "evaluation": {},
         "timestamp": datetime.utcnow().isoformat() + "Z",
         "isDeployed": False,
@@ -389,71 +714,87 @@ def generate_new_planet(galaxy_id: str) -> Dict[str, Any]:
         "traceHistory": [],
     }
 
-async def run_continuous_optimization(galaxy_id: str, planet_id: str, optimizer: str, score_threshold: float):
+async def optimization_step(run: OptimizationRun) -> Optional[float]:
     """
-    A background task that continuously generates and evaluates variants
-    for a given planet until it's cancelled or a score threshold is met.
+    Asks the run's strategy for its next batch of candidates, evaluates them
+    together and records the best of them with one patch. Returns the best
+    score, or None if the galaxy or planet no longer exists or the strategy
+    has nothing left to try.
     """
-    try:
-        while True:
-            galaxy = galaxies.get(galaxy_id)
-            if not galaxy:
-                print(f"Optimization ended: Galaxy {galaxy_id} not found.")
-                break
-                
-            planet = next((p for p in galaxy.get('planets', []) if p['id'] == planet_id), None)
-            if not planet:
-                print(f"Optimization ended: Planet {planet_id} not found.")
-                break
-            
-            base_variant = planet["deployedVersion"]
-            metrics = galaxy.get("config", {}).get("opikMetrics", [])
-            
-            new_variant = generate_new_variant(base_variant["text"])
-            new_variant["evaluation"] = evaluate_with_opik_judges(base_variant["evaluation"]["score"], metrics)
-
-            # Add to the start of the history
-            planet["traceHistory"].insert(0, new_variant)
-            if len(planet["traceHistory"]) > 15:
-                planet["traceHistory"].pop()
-
-            # Broadcast update with the new trace entry
-            await broadcast_message({
-                "type": "update",
-                "payload": {
-                    "galaxies": copy.deepcopy(galaxies),
-                    "optimizing_planets": list(active_optimizations.keys())
-                }
-            })
+    # The galaxy is locked to read the planet and to record the result,
+    # not during evaluation or the wait between steps
+    async with galaxy_locks.hold(run.galaxy_id):
+        galaxy = universe.galaxy(run.galaxy_id)
+        if not galaxy:
+            logger.info("Optimization ended: galaxy not found", extra={"galaxy_id": run.galaxy_id})
+            return None
+        
+        planet = universe.planet(run.planet_id, run.galaxy_id)
+        if not planet:
+            logger.info("Optimization ended: planet not found", extra={"planet_id": run.planet_id})
+            return None
+    
+        base_variant = planet["deployedVersion"]
+        metrics = galaxy.get("config", {}).get("opikMetrics", [])
 
-            # Check for score threshold
-            if new_variant["evaluation"]["score"] >= score_threshold:
-                print(f"Score threshold {score_threshold} reached for planet {planet_id}. Stopping optimization.")
-                break # Exit the loop, which will end the task
+    strategy = run.strategy
+    combos = strategy.propose(run.candidates)
+    if not combos:
+        logger.info("Optimization ended: every candidate has been tried", extra={"planet_id": run.planet_id})
+        return None
+    candidates = [make_variant(strategy.prompt(combo)) for combo in combos]
+    evaluations = await asyncio.gather(*(
+        evaluate_with_opik_judges(candidate["text"], base_variant["evaluation"]["score"], metrics)
+        for candidate in candidates
+    ))
+    for combo, candidate, evaluation in zip(combos, candidates, evaluations):
+        candidate["evaluation"] = evaluation
+        strategy.observe(combo, evaluation["score"])
+    candidates.sort(key=lambda candidate: candidate["evaluation"]["score"], reverse=True)
+    kept = candidates[:OPTIMIZER_KEEP_PER_STEP]
+
+    async with galaxy_locks.hold(run.galaxy_id):
+        if not universe.planet(run.planet_id, run.galaxy_id):
+            logger.info("Optimization ended: planet not found", extra={"planet_id": run.planet_id})
+            return None
+
+        # Add the kept candidates to the start of the history, best first,
+        # and broadcast them together
+        patch = universe.patch()
+        for candidate in reversed(kept):
+            record_trace(patch, run.galaxy_id, run.planet_id, candidate)
+        publish(patch)
+    return kept[0]["evaluation"]["score"]
+
+
+async def finish_optimization(run: OptimizationRun) -> None:
+    """Runs once a scheduled run has ended, whether it completed, failed or was cancelled."""
+    logger.info("Ending optimization", extra={"planet_id": run.planet_id})
+    
+    # Update the galaxy status and broadcast the final state
+    async with galaxy_locks.hold(run.galaxy_id):
+        patch = universe.patch()
+        patch.set("optimizing_planets", value=list(active_optimizations.keys()))
+        galaxy = universe.galaxy(run.galaxy_id)
+        if galaxy:
+            _update_galaxy_status_based_on_planets(patch, galaxy)
+        publish(patch)
 
-            # Wait a bit before the next iteration
-            await asyncio.sleep(random.uniform(3, 7))
 
-    except asyncio.CancelledError:
-        print(f"Optimization for {planet_id} was cancelled.")
-        
-    finally:
-        # This block executes on cancellation or completion
-        print(f"Ending optimization for {planet_id}.")
-        if planet_id in active_optimizations:
-            del active_optimizations[planet_id]
-        
-        # Update the galaxy status and broadcast the final state
-        galaxy = galaxies.get(galaxy_id)
-        if galaxy:
-            _update_galaxy_status_based_on_planets(galaxy)
-            await broadcast_message({
-                "type": "update",
-                "payload": {
-                    "galaxies": copy.deepcopy(galaxies),
-                    "optimizing_planets": list(active_optimizations.keys())
-                }
-            })
+optimizer_scheduler = OptimizerScheduler(
+    optimization_step, finish_optimization,
+    max_concurrent=OPTIMIZER_MAX_CONCURRENT,
+    evaluations_per_second=OPTIMIZER_EVALUATIONS_PER_SECOND,
+    cooldown=OPTIMIZER_COOLDOWN_SECONDS,
+)
+# Queued and running optimizations, by planet id (a live view of the scheduler)
+active_optimizations: Dict[str, OptimizationRun] = optimizer_scheduler.runs
+
+
+async def handle_optimizer_status(request: web.Request) -> web.Response:
+    """Reports the optimizer queue depth, the budget, every queued or running run, the judge pool and trace store."""
+    return web.json_response({**optimizer_scheduler.stats(), "judges": judge_pool.stats(),
+                              "traces": trace_store.stats()})
 
 
 async def telemetry_ingestion_loop():
@@ -463,118 +804,820 @@ async def telemetry_ingestion_loop():
             # Wait for a random interval before the next telemetry push
             await asyncio.sleep(random.uniform(15, 30))
             
-            # This lock prevents race conditions if multiple background tasks modify the state
-            async with simulation_lock:
-                print("Simulating telemetry data ingestion...")
+            # The simulated push touches every galaxy, so it holds all their locks
+            galaxy_ids = list(galaxies.keys())
+            async with galaxy_locks.hold(*galaxy_ids):
+                logger.info("Simulating telemetry data ingestion")
+                patch = universe.patch()
                 
-                for galaxy in galaxies.values():
+                for galaxy_id in galaxy_ids:
+                    galaxy = universe.galaxy(galaxy_id)
+                    if not galaxy:
+                        continue  # Deleted while waiting for the locks
                     if not galaxy.get("planets"):
                         # If no planets, maybe create one
                         if random.random() < 0.2:
                             new_planet = generate_new_planet(galaxy["id"])
-                            galaxy["planets"].append(new_planet)
-                            print(f"New planet '{new_planet['name']}' discovered in {galaxy['name']}.")
+                            patch.set("galaxies", galaxy["id"], "planets", new_planet["id"], value=new_planet)
+                            logger.info("New planet discovered",
+                                        extra={"galaxy_id": galaxy["id"], "planet_id": new_planet["id"]})
 
                     for planet in galaxy.get("planets", []):
                         # Randomly degrade or improve the score
-                        if random.random() < 0.3:
+                        evaluation = planet.get("deployedVersion", {}).get("evaluation")
+                        if evaluation is not None and random.random() < 0.3:
                             score_change = random.uniform(-0.15, 0.08)
-                            current_score = planet["deployedVersion"]["evaluation"].get("score", 0.7)
+                            current_score = evaluation.get("score", 0.7)
                             new_score = max(0, min(1, current_score + score_change))
-                            planet["deployedVersion"]["evaluation"]["score"] = new_score
-                            print(f"Score for planet '{planet['name']}' in {galaxy['name']} changed to {new_score:.2f}")
-
-                # After all updates, broadcast the new state
-                await broadcast_message({
-                    "type": "update",
-                    "payload": {
-                        "galaxies": copy.deepcopy(galaxies),
-                        "optimizing_planets": list(active_optimizations.keys())
-                    }
-                })
+                            patch.set("galaxies", galaxy["id"], "planets", planet["id"],
+                                      "deployedVersion", "evaluation", "score", value=new_score)
+                            sample_planet_metrics(planet["id"])
+                            logger.debug("Planet score changed", extra={"galaxy_id": galaxy["id"],
+                                         "planet_id": planet["id"], "score": round(new_score, 2)})
+                    _update_galaxy_status_based_on_planets(patch, galaxy)
+
+                # After all updates, broadcast the changes as one patch
+                publish(patch)
 
         except Exception as e:
-            print(f"Error in telemetry loop: {e}")
-            traceback.print_exc()
+            logger.exception("Error in telemetry loop")
 
 
-async def handle_telemetry(request: web.Request) -> web.Response:
+async def apply_telemetry_batch(batch: TelemetryBatch) -> int:
     """
-    Handles incoming telemetry data from agents.
-    This would be the primary way the simulation state is updated in a real system.
+    Applies buffered telemetry for any number of agents in one critical
+    section, as a single patch and broadcast. Returns how many planet
+    updates were rejected: a planet id another agent already owns is not
+    taken over.
     """
-    try:
-        data = await request.json()
-        agent_id = data.get("agent_id")
-        
-        galaxy = galaxies.get(agent_id)
-        if not galaxy:
-            return web.Response(status=404, text=f"Agent '{agent_id}' not found.")
+    rejected = 0
+    # Only the galaxies in this batch are locked; others stay writable meanwhile
+    async with galaxy_locks.hold(*batch.keys()):
+        patch = universe.patch()
+        for agent_id, telemetry_planets in batch.items():
+            galaxy = universe.galaxy(agent_id)
+            if not galaxy:
+                continue  # Deleted while the telemetry was buffered
 
-        # This lock is crucial to prevent multiple telemetry updates from interfering
-        async with simulation_lock:
             # Update planets based on telemetry
-            telemetry_planets = data.get("planets", [])
-            existing_planets = {p["id"]: p for p in galaxy.get("planets", [])}
-
-            for tel_planet in telemetry_planets:
-                planet_id = tel_planet["id"]
-                if planet_id in existing_planets:
+            for planet_id, tel_planet in telemetry_planets.items():
+                existing_planet = universe.planet(planet_id, agent_id)
+                if existing_planet:
                     # Update existing planet's deployed version
-                    existing_planet = existing_planets[planet_id]
-                    existing_planet["name"] = tel_planet.get("name", existing_planet["name"])
+                    if "name" in tel_planet and tel_planet["name"] != existing_planet["name"]:
+                        patch.set("galaxies", agent_id, "planets", planet_id, "name", value=tel_planet["name"])
                     
                     # Update deployed version if telemetry contains it
                     if "deployedVersion" in tel_planet:
-                        existing_planet["deployedVersion"] = tel_planet["deployedVersion"]
+                        patch.set("galaxies", agent_id, "planets", planet_id, "deployedVersion",
+                                  value=tel_planet["deployedVersion"])
+                        sample_planet_metrics(planet_id)
                 else:
+                    owner = universe.galaxy_of(planet_id)
+                    if owner:
+                        # Same rule as onboarding: planet ids aren't shared between agents
+                        logger.warning("Telemetry reported a planet owned by another agent",
+                                       extra={"agent_id": agent_id, "planet_id": planet_id, "owner": owner["id"]})
+                        rejected += 1
+                        continue
                     # Onboard a new planet
-                    new_planet = {
-                        "id": planet_id,
-                        "name": tel_planet.get("name", "Unnamed Planet"),
-                        "status": "active",
-                        "orbitRadius": random.uniform(10, 40),
-                        "deployedVersion": tel_planet.get("deployedVersion", {}),
-                        "traceHistory": []
-                    }
-                    galaxy.setdefault("planets", []).append(new_planet)
+                    planet = new_planet(planet_id, {"name": tel_planet.get("name", "Unnamed Planet"),
+                                                    "deployedVersion": tel_planet.get("deployedVersion", {})})
+                    if "planets" not in galaxy:
+                        patch.set("galaxies", agent_id, "planets", value=[])
+                    patch.set("galaxies", agent_id, "planets", planet_id, value=planet)
+                    sample_planet_metrics(planet_id)
             
-            _update_galaxy_status_based_on_planets(galaxy)
-            
-            # Broadcast the changes to all connected clients
-            await broadcast_message({
-                "type": "update",
-                "payload": {
-                    "galaxies": {agent_id: copy.deepcopy(galaxy)},
-                    "optimizing_planets": list(active_optimizations.keys())
-                }
-            })
+            _update_galaxy_status_based_on_planets(patch, galaxy)
+        
+        # Broadcast the changes to all connected clients
+        publish(patch)
+    return rejected
+
+
+telemetry_batcher = TelemetryBatcher(apply_telemetry_batch, flush_interval=TELEMETRY_FLUSH_INTERVAL)
+
 
+async def handle_telemetry(request: web.Request) -> web.Response:
+    """
+    Handles incoming telemetry data from agents.
+    This would be the primary way the simulation state is updated in a real system.
+    """
+    try:
+        data = await request.json()
+        try:
+            agent_id, planets, samples = validate_agent_telemetry(data)
+        except ValueError as e:
+            return web.Response(status=400, text=f"Bad Request: {e}")
+        
+        if not universe.galaxy(agent_id):
+            return web.Response(status=404, text=f"Agent '{agent_id}' not found.")
+
+        telemetry_batcher.submit(agent_id, planets)
+        record_operations(agent_id, planets, samples)
         return web.Response(status=200, text="Telemetry received.")
         
     except Exception as e:
-        print(f"Telemetry error: {e}")
-        traceback.print_exc()
+        logger.exception("Telemetry error")
         return web.Response(status=500, text="Internal Server Error")
 
 
-async def broadcast_message(message: Dict[str, Any]):
-    """Sends a JSON message to all connected clients."""
-    if clients:
-        # Use asyncio.gather to send messages concurrently, handling potential errors
-        tasks = [client.send_json(message) for client in clients]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        for result in results:
-            if isinstance(result, Exception):
-                print(f"Error broadcasting message: {result}")
+async def handle_telemetry_batch(request: web.Request) -> web.Response:
+    """
+    Accepts telemetry for many agents in one request, either as JSON
+    ({"agents": [...]} or a bare list) or as a streamed NDJSON body with one
+    {"agent_id": ..., "planets": [...], "payload": ...} record per line. Valid records are
+    buffered for the next flush; invalid ones are reported individually.
+    """
+    try:
+        accepted = 0
+        errors = []
+        async for position, record in read_records(request):
+            try:
+                if isinstance(record, ValueError):
+                    raise record
+                agent_id, planets, samples = validate_agent_telemetry(record)
+                if not universe.galaxy(agent_id):
+                    raise ValueError(f"agent '{agent_id}' not found")
+            except ValueError as e:
+                errors.append({"record": position, "error": str(e)})
+                continue
+            telemetry_batcher.submit(agent_id, planets)
+            record_operations(agent_id, planets, samples)
+            accepted += 1
+
+        return web.json_response({"accepted": accepted, "rejected": len(errors), "errors": errors})
+
+    except ValueError as e:
+        return web.Response(status=400, text=f"Bad Request: {e}")
+    except Exception as e:
+        logger.exception("Telemetry batch error")
+        return web.Response(status=500, text="Internal Server Error")
 
-async def main():
-    """Sets up the web server and starts the simulation loops."""
-    # --- Background tasks ---
-    asyncio.create_task(telemetry_ingestion_loop())
 
+async def handle_telemetry_stats(request: web.Request) -> web.Response:
+    """Reports telemetry ingestion throughput counters and the trend and operational history's size."""
+    return web.json_response({**telemetry_batcher.stats(), "series": metric_history.stats(),
+                              "operations": {"agents": agent_operations.stats(),
+                                             "planets": planet_operations.stats()}})
+
+
+def record_operations(agent_id: str, planets: List[Dict[str, Any]], samples: List[Dict[str, Any]]) -> None:
+    """
+    Rolls the requests an agent reported into its operational metrics, and
+    into those of the planet each was served by, if that planet is the
+    agent's (or arrives with this telemetry).
+    """
+    if not samples:
+        return
+    now = time.time()
+    reported = {planet["id"] for planet in planets}
+    for sample in samples:
+        agent_operations.record(agent_id, sample, now)
+        fleet_operations.record("fleet", sample, now)
+        planet_id = sample["planet_id"]
+        if planet_id and (planet_id in reported or universe.planet(planet_id, agent_id)):
+            planet_operations.record(planet_id, sample, now)
+
+
+async def publish_operations() -> None:
+    """
+    Puts the current window's operational figures of each galaxy that has
+    reported lately into its "operations" field, where they moved beyond
+    the digest's tolerance (see operations.digest_moved), so the galaxy
+    view gets them with the rest of the state without a patch per tick.
+    """
+    now = time.time()
+    slots = dict(WINDOWS)[OPERATIONS_GALAXY_WINDOW]
+    agent_ids = [agent_id for agent_id in agent_operations.active(slots, now) if agent_id in galaxies]
+    if not agent_ids:
+        return
+    async with galaxy_locks.hold(*agent_ids):
+        patch = universe.patch()
+        for agent_id in agent_ids:
+            galaxy = universe.galaxy(agent_id)
+            if not galaxy:
+                continue  # Deleted while waiting for the lock
+            summary = agent_operations.summary(agent_id, OPERATIONS_GALAXY_WINDOW, now)
+            if digest_moved(galaxy.get("operations"), summary):
+                patch.set("galaxies", agent_id, "operations", value=summary)
+        publish(patch)
+
+
+async def operations_publish_loop() -> None:
+    while True:
+        await asyncio.sleep(OPERATIONS_PUBLISH_INTERVAL)
+        try:
+            await publish_operations()
+        except Exception as e:
+            logger.exception("Error publishing operational metrics")
+
+
+def publish(patch: Patch) -> None:
+    """Commits a patch to the versioned universe, logs it and broadcasts it."""
+    started = time.perf_counter()
+    summary = universe.summary()
+    if summary != universe.document.get("summary"):
+        patch.set("summary", value=summary)
+    data = universe.commit(patch)
+    if data:
+        state_log.append(data)
+        if cluster_broker is not None:
+            cluster_broker.publish(data)
+        broadcast_message(universe.revision, data)
+        topic_router.publish(universe.revision, patch)
+        PUBLISH_SECONDS.observe(time.perf_counter() - started)
+
+
+async def load_state() -> None:
+    """
+    Streams the universe into the store: the state log's snapshot plus the
+    patches logged since, or the initial state file on the first run. The
+    files are read and parsed on a thread, a batch of galaxies at a time;
+    each batch is indexed on the loop and shows up in the universe summary
+    right away.
+    """
+    loop = asyncio.get_running_loop()
+    snapshot = state_log.snapshot_file()
+    reader = StateFileReader(snapshot or INITIAL_STATE_FILE, snapshot=snapshot is not None)
+    load_progress.update(file=reader.path, total_bytes=reader.total_bytes)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-load") as executor:
+        try:
+            while True:
+                batch = await loop.run_in_executor(executor, reader.next_batch)
+                if not batch:
+                    break
+                loaded = {}
+                for kind, value in batch:
+                    if kind == "galaxy":
+                        loaded[value[0]] = value[1]
+                    elif kind == "revision":
+                        universe.revision = value
+                    elif value[0] != "summary":  # Recomputed from the galaxies
+                        universe.document[value[0]] = value[1]
+                universe.load(loaded)
+                archive_trace_history(loaded.values())
+                load_progress.update(bytes=reader.bytes_read, galaxies=len(galaxies))
+        finally:
+            reader.close()
+
+        records = state_log.replay(universe.revision)
+        while True:
+            batch = await loop.run_in_executor(executor, list, itertools.islice(records, LOAD_REPLAY_BATCH))
+            if not batch:
+                break
+            for record in batch:
+                for op in record["ops"]:
+                    universe.apply(op)
+                universe.revision = record["revision"]
+            load_progress["records"] += len(batch)
+    logger.info("Loaded the universe", extra={"file": reader.path, "revision": universe.revision,
+                                              "galaxies": len(galaxies), "replayed": load_progress["records"],
+                                              "seconds": round(time.perf_counter() - started, 2)})
+
+
+def settle_interrupted_optimizations() -> None:
+    """
+    Optimizer tasks don't survive a restart; recompute the status of any
+    galaxy that was restored mid-optimization.
+    """
+    patch = universe.patch()
+    if universe.document.get("optimizing_planets"):
+        patch.set("optimizing_planets", value=[])
+    for galaxy in galaxies.values():
+        if galaxy.get("status") == "optimizing":
+            _update_galaxy_status_based_on_planets(patch, galaxy)
+    publish(patch)
+
+
+def record_trace(patch: Patch, galaxy_id: str, planet_id: str, variant: Dict[str, Any]) -> None:
+    """Adds a variant to a planet's history: the trace store and the live window."""
+    trace_store.append(planet_id, galaxy_id, variant)
+    patch.insert("galaxies", galaxy_id, "planets", planet_id, "traceHistory", value=variant, limit=TRACE_LIVE_WINDOW)
+
+
+def sample_planet_metrics(planet_id: str) -> None:
+    """Adds the planet's current deployed evaluation to its trend history."""
+    planet = universe.planet(planet_id)
+    evaluation = (planet.get("deployedVersion") or {}).get("evaluation") if planet else None
+    if evaluation:
+        metric_history.record(planet_id, evaluation)
+
+
+def archive_trace_history(loaded: Iterable[Dict[str, Any]]) -> None:
+    """
+    Copies the trace history already in the universe (e.g. from before the
+    trace store existed) into the store. Runs on each batch of galaxies as
+    the universe loads, so the work is spread over the load.
+    """
+    for galaxy in loaded:
+        for planet in galaxy.get("planets", []):
+            for variant in reversed(planet.get("traceHistory") or []):  # Oldest first
+                trace_store.append(planet["id"], galaxy["id"], variant)
+
+
+def trim_trace_history() -> None:
+    """Trims trace histories longer than the live window, once they are archived."""
+    patch = universe.patch()
+    for galaxy in galaxies.values():
+        for planet in galaxy.get("planets", []):
+            history = planet.get("traceHistory") or []
+            if len(history) > TRACE_LIVE_WINDOW:
+                patch.set("galaxies", galaxy["id"], "planets", planet["id"], "traceHistory",
+                          value=history[:TRACE_LIVE_WINDOW])
+    publish(patch)
+
+
+def broadcast_message(revision: int, data: str) -> None:
+    """
+    Queues an already-encoded message for every client on the full stream
+    (not subscribed to topics). This never waits on a socket; each client's
+    writer task drains its own queue.
+    """
+    started = time.perf_counter()
+    sent = 0
+    for channel in clients.values():
+        if channel.topics is None:
+            channel.send(revision, data)
+            sent += 1
+    BROADCAST_SECONDS.observe(time.perf_counter() - started)
+    BROADCAST_CLIENTS.observe(sent)
+
+
+async def handle_universe_summary(request: web.Request) -> web.Response:
+    """
+    Universe-wide counts plus each galaxy's aggregates, without any planet
+    data. While the server is starting up, it covers the galaxies loaded so
+    far and "loading" reports the progress.
+    """
+    return web.json_response({
+        "revision": universe.revision,
+        "summary": universe.document["summary"],
+        "galaxies": {galaxy_id: universe.galaxy_stats(galaxy_id).to_dict() for galaxy_id in galaxies},
+        "loading": None if state_loaded.is_set() else load_progress,
+    })
+
+
+async def handle_planet_traces(request: web.Request) -> web.Response:
+    """Pages through a planet's full trace history, newest first."""
+    planet_id = request.match_info['planet_id']
+    try:
+        cursor = int(request.query['cursor']) if request.query.get('cursor') else None
+        limit = int(request.query.get('limit', TRACE_PAGE_SIZE))
+    except ValueError:
+        return web.Response(status=400, text="cursor and limit must be integers")
+    try:
+        traces, next_cursor = await trace_store.page(planet_id, cursor, limit)
+        return web.json_response({"planet_id": planet_id, "traces": traces, "next_cursor": next_cursor})
+    except Exception as e:
+        logger.exception("Trace history error")
+        return web.Response(status=500, text="Internal Server Error")
+
+
+async def _handle_series(request: web.Request, planet_ids) -> web.Response:
+    try:
+        end = float(request.query.get('end', time.time()))
+        start = float(request.query.get('start', end - SERIES_DEFAULT_RANGE_SECONDS))
+        resolution = int(request.query['resolution']) if request.query.get('resolution') else None
+    except ValueError:
+        return web.Response(status=400, text="start, end and resolution must be numbers")
+    metrics = [name for name in request.query.get('metrics', '').split(',') if name]
+    if start > end:
+        return web.Response(status=400, text="start must not be after end")
+    try:
+        return web.json_response({"start": start, "end": end,
+                                  **metric_history.query(planet_ids, start, end, resolution, metrics)})
+    except ValueError:
+        return web.Response(status=400, text=f"resolution must be one of {[w for w, _ in metric_history.tiers]} "
+                                             f"and metrics among {list(metric_history.metrics)}")
+
+
+async def handle_planet_series(request: web.Request) -> web.Response:
+    """
+    Score, factuality, hallucination and speed of a planet over time
+    (min/max/avg/count per bucket); graded metrics on their SERIES_LEVELS
+    scale, so a hallucination average is the share of evaluations it was
+    detected in.
+    """
+    planet_id = request.match_info['planet_id']
+    if not universe.planet(planet_id) and planet_id not in metric_history:
+        return web.Response(status=404, text="Planet not found")
+    return await _handle_series(request, [planet_id])
+
+
+async def handle_galaxy_series(request: web.Request) -> web.Response:
+    """The same trends for a galaxy, merged over its planets."""
+    galaxy = universe.galaxy(request.match_info['galaxy_id'])
+    if not galaxy:
+        return web.Response(status=404, text="Galaxy not found")
+    return await _handle_series(request, [planet["id"] for planet in galaxy.get("planets", [])])
+
+
+async def _handle_operations(request: web.Request, store: OperationsStore, keys: List[str]) -> web.Response:
+    try:
+        quantiles = [float(q) for q in request.query.get('quantiles', '').split(',') if q] or QUANTILES
+    except ValueError:
+        return web.Response(status=400, text="quantiles must be numbers")
+    if not all(0 <= q <= 1 for q in quantiles):
+        return web.Response(status=400, text="quantiles must be between 0 and 1")
+    return web.json_response(store.query(keys, quantiles))
+
+
+async def handle_galaxy_operations(request: web.Request) -> web.Response:
+    """
+    An agent's requests, errors, tokens and latency quantiles over the last
+    1, 5 and 15 minutes and since it started reporting (?quantiles=0.5,0.99).
+    """
+    galaxy_id = request.match_info['galaxy_id']
+    if not universe.galaxy(galaxy_id):
+        return web.Response(status=404, text="Galaxy not found")
+    return await _handle_operations(request, agent_operations, [galaxy_id])
+
+
+async def handle_planet_operations(request: web.Request) -> web.Response:
+    """The same for the requests a planet served."""
+    planet_id = request.match_info['planet_id']
+    if not universe.planet(planet_id) and planet_id not in planet_operations:
+        return web.Response(status=404, text="Planet not found")
+    return await _handle_operations(request, planet_operations, [planet_id])
+
+
+async def handle_fleet_operations(request: web.Request) -> web.Response:
+    """The same for the whole fleet, or merged over the agents listed in ?agents=a,b."""
+    agent_ids = [agent_id for agent_id in request.query.get('agents', '').split(',') if agent_id]
+    if not agent_ids:
+        return await _handle_operations(request, fleet_operations, ["fleet"])
+    return await _handle_operations(request, agent_operations, agent_ids)
+
+
+async def handle_clients(request: web.Request) -> web.Response:
+    """Reports per-client outbound queue and lag metrics."""
+    return web.json_response({
+        "revision": universe.revision,
+        "clients": [channel.metrics() for channel in clients.values()],
+        "topics": topic_router.stats(),
+        "wire": frame_cache.stats(),
+        "positions": position_feed.stats(),
+    })
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """Every metric in the Prometheus text exposition format."""
+    return web.Response(body=REGISTRY.render().encode('utf-8'),
+                        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+
+def register_metrics() -> None:
+    """Exposes the counters and sizes the components keep anyway, read at scrape time."""
+    def optimizations_by_state() -> Dict[str, int]:
+        stats = optimizer_scheduler.stats()
+        return {"queued": stats["queue_depth"], "running": stats["running"], "cooling": stats["cooling"]}
+
+    REGISTRY.observe("cockpit_connected_clients", "Connected dashboards.", "gauge", lambda: len(clients))
+    REGISTRY.observe("cockpit_state_revision", "Revision of the universe.", "gauge", lambda: universe.revision)
+    REGISTRY.observe("cockpit_galaxies", "Galaxies (agents) in the universe.", "gauge", lambda: len(galaxies))
+    REGISTRY.observe("cockpit_optimizations", "Optimization runs by state.", "gauge", optimizations_by_state,
+                     ("state",))
+    REGISTRY.observe("cockpit_active_optimizations", "Queued and running optimizations.", "gauge",
+                     lambda: len(active_optimizations))
+    REGISTRY.observe("cockpit_optimizer_steps_total", "Optimizer iterations.", "counter",
+                     lambda: optimizer_scheduler.steps)
+    REGISTRY.observe("cockpit_optimizer_evaluations_total", "Candidate evaluations by the optimizer.", "counter",
+                     lambda: optimizer_scheduler.evaluations)
+    REGISTRY.observe("cockpit_judge_evaluations_total", "Evaluations run by the judge pool.", "counter",
+                     lambda: judge_pool.evaluations)
+    REGISTRY.observe("cockpit_telemetry_received_total", "Telemetry planet updates received.", "counter",
+                     lambda: telemetry_batcher.received)
+    REGISTRY.observe("cockpit_telemetry_applied_total", "Telemetry planet updates applied.", "counter",
+                     lambda: telemetry_batcher.applied)
+    REGISTRY.observe("cockpit_telemetry_rejected_total", "Telemetry planet updates rejected.", "counter",
+                     lambda: telemetry_batcher.rejected)
+    REGISTRY.observe("cockpit_operations_samples_total", "Requests reported in agents' operational metrics.",
+                     "counter", lambda: agent_operations.samples)
+    REGISTRY.observe("cockpit_state_log_records_total", "Patches written to the state log.", "counter",
+                     lambda: state_log.records)
+    REGISTRY.observe("cockpit_state_log_fsyncs_total", "fsyncs of the state log.", "counter",
+                     lambda: state_log.fsyncs)
+    REGISTRY.observe("cockpit_wire_encode_seconds_total", "Time spent encoding binary wire formats.", "counter",
+                     lambda: {fmt: seconds for fmt, (_, _, _, seconds) in frame_cache.encoded.items()},
+                     ("format",))
+
+
+async def handle_wire_dictionary(request: web.Request) -> web.Response:
+    """The preset dictionary dashboards inflate the deflate wire format with."""
+    return web.Response(body=frame_cache.dictionary, content_type='application/octet-stream',
+                        headers={'X-Dictionary-Id': str(frame_cache.dictionary_id)})
+
+
+async def deploy_dashboard_variant(payload: Dict[str, Any]) -> None:
+    """Deploys a variant sent by a dashboard over its WebSocket."""
+    galaxy_id = payload.get('galaxyId')
+    planet_id = payload.get('planetId')
+    variant = payload.get('variant')
+
+    if all([galaxy_id, planet_id, variant]):
+        async with galaxy_locks.hold(galaxy_id):
+            planet = universe.planet(planet_id, galaxy_id)
+
+            if planet:
+                patch = universe.patch()
+                planet_path = ("galaxies", galaxy_id, "planets", planet_id)
+                if 'traceHistory' not in planet:
+                    patch.set(*planet_path, "traceHistory", value=[])
+
+                old_deployed = planet.get("deployedVersion")
+                if old_deployed:
+                    old_deployed_copy = copy.deepcopy(old_deployed)
+                    old_deployed_copy['isDeployed'] = False
+                    if not universe.trace(planet_id, old_deployed_copy['id'], galaxy_id):
+                        record_trace(patch, galaxy_id, planet_id, old_deployed_copy)
+            
+                new_deployed = copy.deepcopy(variant)
+                new_deployed['isDeployed'] = True
+                patch.set(*planet_path, "deployedVersion", value=new_deployed)
+                sample_planet_metrics(planet_id)
+                if universe.trace(planet_id, new_deployed['id'], galaxy_id):
+                    patch.delete(*planet_path, "traceHistory", new_deployed['id'])
+            
+                publish(patch)
+
+
+# --- Cluster Mode ---
+# The leader publishes every committed patch on the broker; replicas apply
+# them to their copy of the universe and forward writes to the leader.
+cluster_broker = make_broker(CLUSTER_BROKER, CLUSTER_BUS_SOCKET, leader=not IS_REPLICA) if WORKERS > 1 or IS_REPLICA else None
+leader_client: Optional["httpx.AsyncClient"] = None
+replica: Optional[Replica] = None
+
+
+async def fetch_leader_snapshot() -> Dict[str, Any]:
+    response = await leader_client.get('/api/cluster/snapshot')
+    response.raise_for_status()
+    return response.json()
+
+
+def reset_replica_state(revision: int, payload: Dict[str, Any]) -> None:
+    """Replaces the replica's universe with the leader's snapshot and resyncs its clients."""
+    global galaxies
+    galaxies = GalaxyMap(payload.get("galaxies", {}))
+    universe.reset({"galaxies": galaxies, "optimizing_planets": payload.get("optimizing_planets", [])}, revision)
+    logger.info("Replica loaded the leader's state", extra={"revision": revision})
+    for channel in clients.values():
+        if channel.topics is None:
+            channel.sync()
+    topic_router.resync()
+
+
+def apply_replicated_patch(message: Dict[str, Any]) -> None:
+    """Applies a patch message from the leader and fans it out to this worker's clients."""
+    patch = universe.patch()
+    for op in message["ops"]:
+        patch.record(op)
+        path = op["path"]
+        if path[0] == "galaxies" and len(path) == 2 and op["op"] == "delete":
+            position_feed.settle(path[1])
+        elif path[0] == "galaxies" and path[2:] == ["position"] and op["op"] == "set":
+            position_feed.settle(path[1], parse_position(op["value"]))
+    data = universe.commit(patch)
+    if data:
+        broadcast_message(universe.revision, data)
+        topic_router.publish(universe.revision, patch)
+
+
+@web.middleware
+async def observe_requests(request: web.Request, handler) -> web.StreamResponse:
+    """Times every HTTP request by its route pattern (WebSockets aren't requests for long)."""
+    if request.path == '/ws':
+        return await handler(request)
+    resource = request.match_info.route.resource
+    route = resource.canonical if resource is not None else "unmatched"
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as exc:
+        status = exc.status
+        raise
+    finally:
+        HTTP_REQUEST_SECONDS.labels(request.method, route).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(request.method, route, str(status)).inc()
+
+
+@web.middleware
+async def wait_for_state(request: web.Request, handler) -> web.StreamResponse:
+    """Turns away requests that need the whole universe while it is still loading."""
+    if state_loaded.is_set() or request.path in SERVED_WHILE_LOADING or request.path == '/ws':
+        return await handler(request)
+    return web.Response(status=503, text="Starting up: the universe is still loading",
+                        headers={'Retry-After': '1'})
+
+
+@web.middleware
+async def forward_to_leader(request: web.Request, handler) -> web.StreamResponse:
+    """On a replica, sends writes (and leader-only reads) to the leader."""
+    leader_only = request.path in LEADER_ONLY_PATHS or request.path.startswith(LEADER_ONLY_PREFIXES)
+    if not IS_REPLICA or request.path == '/ws' or (
+            request.method in ('GET', 'HEAD', 'OPTIONS') and not leader_only):
+        return await handler(request)
+    import httpx
+    try:
+        response = await leader_client.request(
+            request.method, request.path_qs, content=await request.read(),
+            headers={'Content-Type': request.headers.get('Content-Type', 'application/json')},
+        )
+    except httpx.RequestError as exc:
+        logger.warning("Forwarding to the leader failed",
+                       extra={"method": request.method, "path": request.path, "error": str(exc)})
+        return web.Response(status=503, text="Leader unavailable")
+    return web.Response(status=response.status_code, body=response.content,
+                        content_type=response.headers.get('Content-Type', 'text/plain').split(';')[0])
+
+
+async def handle_cluster_snapshot(request: web.Request) -> web.Response:
+    """The leader's current state, for replicas to start from."""
+    return web.Response(text=universe.snapshot(), content_type='application/json')
+
+
+async def handle_cluster_deploy(request: web.Request) -> web.Response:
+    """Runs a dashboard's WebSocket deploy command forwarded by a replica."""
+    try:
+        await deploy_dashboard_variant(await request.json())
+        return web.json_response({"status": "success"})
+    except Exception as e:
+        logger.exception("Forwarded deploy error")
+        return web.Response(status=500, text="Internal Server Error")
+
+
+def relay_positions(packed: List[Any]) -> None:
+    """On the leader, passes each tick's galaxy moves on to the replicas."""
+    cluster_broker.publish(encode_message({"type": "positions", "p": packed}))
+
+
+def apply_replicated_event(message: Dict[str, Any]) -> None:
+    """Takes the leader's galaxy moves on a replica, for its own dashboards."""
+    if message.get("type") == "positions":
+        for galaxy_id, position in unpack_positions(message["p"]):
+            position_feed.move(galaxy_id, position)
+
+
+async def handle_cluster_positions(request: web.Request) -> web.Response:
+    """Takes the drag steps a replica's dashboards sent, coalesced per tick."""
+    try:
+        moves = unpack_positions((await request.json()).get("p", []))
+    except ValueError as e:
+        return web.Response(status=400, text=f"Bad Request: {e}")
+    for galaxy_id, position in moves:
+        if galaxy_id in galaxies:
+            position_feed.move(galaxy_id, position)
+    return web.json_response({"status": "success"})
+
+
+async def forward_positions() -> None:
+    """On a replica, sends its dashboards' drag steps to the leader once per tick."""
+    global position_outbox
+    import httpx
+    while True:
+        await asyncio.sleep(position_feed.interval)
+        if not position_outbox:
+            continue
+        moves, position_outbox = position_outbox, {}
+        try:
+            await leader_client.post('/api/cluster/positions', json={"p": pack_positions(moves.items())})
+        except httpx.RequestError as exc:
+            logger.warning("Forwarding galaxy positions to the leader failed", extra={"error": str(exc)})
+
+
+def position_channels():
+    """The dashboards that show the universe: the full stream and universe subscribers."""
+    return [channel for channel in clients.values()
+            if channel.topics is None or UNIVERSE in channel.topics]
+
+
+async def handle_cluster_status(request: web.Request) -> web.Response:
+    """Reports this worker's role, revision and replication counters."""
+    return web.json_response({
+        "role": "replica" if IS_REPLICA else "leader",
+        "pid": os.getpid(),
+        "workers": WORKERS,
+        "revision": universe.revision,
+        "clients": len(clients),
+        "replication": replica.stats() if replica else None,
+        "broker": cluster_broker.stats() if cluster_broker else None,
+    })
+
+
+async def supervise_workers(count: int) -> None:
+    """Runs the replica worker processes, restarting any that exit."""
+    env = dict(os.environ, COCKPIT_ROLE='replica', COCKPIT_WORKERS=str(WORKERS))
+    workers = [None] * count
+    try:
+        while True:
+            for i, worker in enumerate(workers):
+                if worker is None or worker.poll() is not None:
+                    if worker is not None:
+                        logger.warning("Worker exited; restarting it",
+                                       extra={"worker_pid": worker.pid, "returncode": worker.returncode})
+                    workers[i] = subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+            await asyncio.sleep(1.0)
+    finally:
+        for worker in workers:
+            if worker is not None and worker.poll() is None:
+                worker.terminate()
+        for worker in workers:
+            if worker is not None:
+                worker.wait()
+
+
+# --- WebSocket Server ---
+async def websocket_handler(request: web.Request) -> web.WebSocketResponse:
+    """Streams the versioned universe to a dashboard and handles its commands."""
+    encoding = negotiate_format(request.headers.get('Sec-WebSocket-Protocol', ''))
+    # Binary formats are already compact; per-socket permessage-deflate would
+    # only compress them again, once per client
+    ws = web.WebSocketResponse(protocols=(PROTOCOL_PREFIX + encoding,), compress=encoding == 'json')
+    await ws.prepare(request)
+    # A dashboard connecting during startup gets its snapshot once the universe is loaded
+    await state_loaded.wait()
+    
+    channel = ClientChannel(ws, universe, router=topic_router, max_queue=CLIENT_QUEUE_SIZE,
+                            policy=CLIENT_QUEUE_POLICY, max_lag=CLIENT_MAX_LAG_SECONDS,
+                            encoding=encoding, frames=frame_cache)
+    clients[ws] = channel
+    channel.start()
+    try:
+        if request.query.get('mode') == 'topics':
+            # The client subscribes to the scopes it shows instead of the full stream
+            channel.topics = set()
+        else:
+            since = request.query.get('since')
+            channel.sync(int(since) if since and since.isdigit() else None)
+
+        async for msg in ws:
+            if msg.type == web.WSMsgType.TEXT:
+                message = json.loads(msg.data)
+                if message['type'] == 'sync':
+                    # Client detected a revision gap and asks to catch up; anything
+                    # but an integer revision gets a full snapshot
+                    revision = message.get('revision')
+                    valid = isinstance(revision, int) and not isinstance(revision, bool)
+                    channel.sync(revision if valid else None)
+                elif message['type'] in ('subscribe', 'unsubscribe'):
+                    try:
+                        topic = parse_topic(message)
+                    except ValueError as e:
+                        channel.send(None, encode_message({"type": "error", "message": str(e)}))
+                        continue
+                    if message['type'] == 'subscribe':
+                        topic_router.subscribe(channel, topic)
+                    else:
+                        topic_router.unsubscribe(channel, topic)
+                elif message['type'] == 'move':
+                    # A drag step; the PUT at the end of the drag persists it
+                    galaxy_id = message.get('id')
+                    try:
+                        position = parse_position(message.get('position'))
+                    except ValueError as e:
+                        channel.send(None, encode_message({"type": "error", "message": str(e)}))
+                        continue
+                    if galaxy_id not in galaxies:
+                        continue
+                    if IS_REPLICA:
+                        position_outbox[galaxy_id] = position
+                    else:
+                        position_feed.move(galaxy_id, position)
+                elif message['type'] == 'deploy_variant':
+                    payload = message.get('payload', {})
+                    if IS_REPLICA:
+                        import httpx
+                        try:
+                            response = await leader_client.post('/api/cluster/deploy', json=payload)
+                            response.raise_for_status()
+                        except httpx.HTTPError as exc:
+                            # The leader may be restarting; keep the dashboard connected
+                            logger.warning("Forwarding a deploy to the leader failed", extra={"error": str(exc)})
+                            channel.send(None, encode_message({"type": "error", "message": "Deploy failed, try again"}))
+                    else:
+                        await deploy_dashboard_variant(payload)
+            elif msg.type == web.WSMsgType.ERROR:
+                logger.warning("WebSocket connection closed with exception", extra={"error": str(ws.exception())})
+    
+    finally:
+        clients.pop(ws, None)
+        topic_router.unsubscribe_all(channel)
+        await channel.stop()
+    
+    return ws
+
+
+def create_app() -> web.Application:
+    """Builds the aiohttp application with all HTTP and WebSocket routes."""
     # --- Web server setup ---
-    app = web.Application()
+    app = web.Application(middlewares=[observe_requests, wait_for_state, forward_to_leader])
+    app.on_cleanup.append(close_texture_proxy)
+    app.on_cleanup.append(close_judge_pool)
     
     # Configure CORS
     cors = aiohttp_cors.setup(app, defaults={
@@ -588,93 +1631,134 @@ async def main():
 
     # --- HTTP Routes ---
     app.router.add_get('/api/texture', get_texture)
+    app.router.add_get('/api/texture/stats', handle_texture_stats)
     app.router.add_post('/api/onboard', handle_onboard)
+    app.router.add_post('/api/onboard/batch', handle_onboard_batch)
+    app.router.add_get('/api/onboard/export', handle_export)
     app.router.add_post('/api/optimizer/start', handle_optimizer_start)
     app.router.add_post('/api/optimizer/stop', handle_optimizer_stop)
+    app.router.add_get('/api/optimizer/status', handle_optimizer_status)
     app.router.add_post('/api/optimizer/variant/generate', handle_optimizer_generate_variant)
     app.router.add_post('/api/optimizer/variant/deploy', handle_optimizer_deploy_variant)
     app.router.add_post('/api/telemetry', handle_telemetry)
+    app.router.add_post('/api/telemetry/batch', handle_telemetry_batch)
+    app.router.add_get('/api/telemetry/stats', handle_telemetry_stats)
     app.router.add_delete('/api/agent/{agent_id}', handle_delete_agent)
     app.router.add_put('/api/agent/{agent_id}/position', handle_update_position)
     app.router.add_put('/api/agent/{agent_id}/config/metrics', handle_update_metric_mapping)
     app.router.add_put('/api/agent/{agent_id}/planet/{planet_id}/status', handle_toggle_planet_status)
+    app.router.add_get('/api/universe/summary', handle_universe_summary)
+    app.router.add_get('/api/planet/{planet_id}/traces', handle_planet_traces)
+    app.router.add_get('/api/planet/{planet_id}/series', handle_planet_series)
+    app.router.add_get('/api/galaxy/{galaxy_id}/series', handle_galaxy_series)
+    app.router.add_get('/api/galaxy/{galaxy_id}/operations', handle_galaxy_operations)
+    app.router.add_get('/api/planet/{planet_id}/operations', handle_planet_operations)
+    app.router.add_get('/api/operations', handle_fleet_operations)
+    app.router.add_get('/api/clients', handle_clients)
+    app.router.add_get('/api/wire/dictionary', handle_wire_dictionary)
+    app.router.add_get('/metrics', handle_metrics)
+    app.router.add_get('/api/cluster/status', handle_cluster_status)
+    app.router.add_get('/api/cluster/snapshot', handle_cluster_snapshot)
+    app.router.add_post('/api/cluster/deploy', handle_cluster_deploy)
+    app.router.add_post('/api/cluster/positions', handle_cluster_positions)
 
     # Apply CORS to all routes
     for route in list(app.router.routes()):
         cors.add(route)
 
-    # --- WebSocket Server ---
-    async def websocket_handler_wrapper(request):
-        ws = web.WebSocketResponse()
-        await ws.prepare(request)
-        
-        clients.add(ws) 
-        try:
-            await ws.send_json({
-                "type": "update",
-                "payload": {
-                    "galaxies": copy.deepcopy(galaxies),
-                    "optimizing_planets": list(active_optimizations.keys())
-                }
-            })
+    app.router.add_get('/ws', websocket_handler)
+    return app
+
+
+async def run_replica() -> None:
+    """Runs a replica worker: mirrors the leader's state and serves the shared port."""
+    global leader_client, replica
+    import httpx
+    leader_client = httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(uds=CLUSTER_HTTP_SOCKET),
+                                      base_url="http://leader", timeout=30.0)
+    replica = Replica(cluster_broker, fetch_leader_snapshot, reset_replica_state, apply_replicated_patch,
+                      lambda: universe.revision, on_event=apply_replicated_event)
+    asyncio.create_task(replica.run())
+    asyncio.create_task(position_feed.run(position_channels))
+    asyncio.create_task(forward_positions())
+    await replica.ready.wait()
+    state_loaded.set()
+
+    runner = web.AppRunner(create_app())
+    await runner.setup()
+    await web.TCPSite(runner, 'localhost', 8080, reuse_port=True).start()
+    logger.info("Replica worker is serving http://localhost:8080")
+    leader_pid = os.getppid()
+    try:
+        # Don't outlive the leader, however it was stopped
+        while os.getppid() == leader_pid:
+            await asyncio.sleep(1.0)
+        logger.info("The leader has exited; stopping this worker")
+    finally:
+        await leader_client.aclose()
 
-            async for msg in ws:
-                if msg.type == web.WSMsgType.TEXT:
-                    message = json.loads(msg.data)
-                    if message['type'] == 'deploy_variant':
-                        payload = message.get('payload', {})
-                        galaxy_id = payload.get('galaxyId')
-                        planet_id = payload.get('planetId')
-                        variant = payload.get('variant')
-
-                        if all([galaxy_id, planet_id, variant]):
-                            galaxy = galaxies.get(galaxy_id)
-                            if not galaxy:
-                                continue
-                            planet = next((p for p in galaxy.get('planets', []) if p['id'] == planet_id), None)
-
-                            if planet:
-                                old_deployed = planet.get("deployedVersion")
-                                if old_deployed:
-                                    old_deployed_copy = copy.deepcopy(old_deployed)
-                                    old_deployed_copy['isDeployed'] = False
-                                    if not any(t['id'] == old_deployed_copy['id'] for t in planet.get('traceHistory', [])):
-                                        planet.setdefault('traceHistory', []).insert(0, old_deployed_copy)
-                                
-                                new_deployed = copy.deepcopy(variant)
-                                new_deployed['isDeployed'] = True
-                                planet['deployedVersion'] = new_deployed
-                                planet['traceHistory'] = [t for t in planet.get('traceHistory', []) if t['id'] != new_deployed['id']]
-                                
-                                await broadcast_message({
-                                    "type": "update",
-                                    "payload": {"galaxies": copy.deepcopy(galaxies), "optimizing_planets": list(active_optimizations.keys())}
-                                })
-                elif msg.type == web.WSMsgType.ERROR:
-                    print(f'WebSocket connection closed with exception {ws.exception()}')
-        
-        finally:
-            if ws in clients:
-                clients.remove(ws)
-        
-        return ws
 
+async def main():
+    """Sets up the web server and starts the simulation loops."""
+    if IS_REPLICA:
+        await run_replica()
+        return
 
-    app.router.add_get('/ws', websocket_handler_wrapper)
+    judge_pool.start()
+    register_metrics()
 
-    runner = web.AppRunner(app)
+    # Listen first; the universe streams in while the summary is already served
+    runner = web.AppRunner(create_app())
     await runner.setup()
-    site = web.TCPSite(runner, 'localhost', 8080)
-    
-    print("🚀 GalactiCode MCP Server is running on http://localhost:8080")
-    print("📡 WebSocket endpoint is ws://localhost:8080/ws")
+    site = web.TCPSite(runner, 'localhost', 8080, reuse_port=WORKERS > 1)
     await site.start()
+    logger.info("🚀 GalactiCode MCP Server is running on http://localhost:8080")
+    logger.info("📡 WebSocket endpoint is ws://localhost:8080/ws")
+
+    await load_state()
+    state_log.open(universe)
+    trace_store.open()
+    settle_interrupted_optimizations()
+    trim_trace_history()
 
-    await asyncio.Event().wait()
+    # --- Background tasks ---
+    asyncio.create_task(state_log.run())
+    asyncio.create_task(trace_store.run())
+    asyncio.create_task(telemetry_ingestion_loop())
+    asyncio.create_task(telemetry_batcher.run())
+    asyncio.create_task(operations_publish_loop())
+    asyncio.create_task(position_feed.run(position_channels))
+
+    if cluster_broker is not None:
+        # Replicas fetch snapshots and forward writes over the internal socket
+        os.makedirs(CLUSTER_DIR, exist_ok=True)
+        if os.path.exists(CLUSTER_HTTP_SOCKET):
+            os.unlink(CLUSTER_HTTP_SOCKET)
+        await web.UnixSite(runner, CLUSTER_HTTP_SOCKET).start()
+        await cluster_broker.start()
+        position_feed.on_tick = relay_positions
+        supervisor = asyncio.create_task(supervise_workers(WORKERS - 1))
+        logger.info("Running workers", extra={"workers": WORKERS, "broker": CLUSTER_BROKER})
+    state_loaded.set()
+
+    # Stop cleanly on SIGTERM too, so worker and judge processes go with us
+    stopping = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+    try:
+        await stopping.wait()
+        logger.info("Server shutting down")
+    finally:
+        if cluster_broker is not None:
+            supervisor.cancel()
+            await asyncio.gather(supervisor, return_exceptions=True)
+            await cluster_broker.close()
+        await runner.cleanup()
+        await state_log.close()
+        await trace_store.close()
 
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        print("Server shutting down.")
+        logger.info("Server shutting down")
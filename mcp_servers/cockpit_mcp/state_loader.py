@@ -0,0 +1,170 @@
+import codecs
+import json
+import os
+from json.decoder import WHITESPACE
+from typing import Any, BinaryIO, Iterator, List, Tuple
+
+from models import Galaxy
+
+# --- Streaming state files ---
+# The initial state file ({galaxy_id: galaxy, ...}) and the state log's
+# snapshot ({"type": "snapshot", "revision": ..., "payload": {"galaxies":
+# {...}, ...}}) can run to hundreds of MB. Instead of json.load-ing them
+# whole, they are walked with a small pull parser that decodes one galaxy at
+# a time, so galaxies can be handed to the server while the rest of the file
+# is still being read, and the raw text never sits in memory next to the
+# parsed universe.
+
+# Bytes read from the file at a time
+READ_CHUNK_BYTES = 256 * 1024
+# About this much of the file is parsed between hand-offs (see StateFileReader)
+LOAD_BATCH_BYTES = 1 << 20
+
+# One piece of a state file:
+#   ("revision", revision)
+#   ("galaxy", (galaxy_id, galaxy))   - the galaxy already converted to a record
+#   ("document", (key, value))        - any other key of the universe document
+StateEvent = Tuple[str, Any]
+
+
+class JsonStream:
+    """
+    A pull parser over a JSON file. Objects are walked key by key
+    (`members`) and only the values asked for are decoded (`value`), each by
+    the json module's C scanner, so a large document can be consumed a piece
+    at a time.
+    """
+
+    def __init__(self, f: BinaryIO, chunk_size: int = READ_CHUNK_BYTES):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self.bytes_read = 0
+
+    def _fill(self, size: int) -> bool:
+        """Reads up to `size` more bytes into the buffer; False once the file is exhausted."""
+        if self._eof:
+            return False
+        data = self._file.read(size)
+        self.bytes_read += len(data)
+        self._eof = not data
+        # Drop what has been consumed, so the buffer only holds the value being decoded
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(data, final=self._eof)
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skips whitespace; returns the next character, or "" at the end of the file."""
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill(self._chunk_size):
+                return ""
+
+    def _expect(self, char: str) -> str:
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found or 'the end of the file'!r} "
+                             f"near byte {self.bytes_read}")
+        self._pos += 1
+        return found
+
+    def value(self) -> Any:
+        """Decodes the next value whole."""
+        self._peek()
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Most likely cut off by the end of the buffer. Read ahead in
+                # doubling steps, so a huge value is rescanned only a few times.
+                if not self._fill(size):
+                    raise
+                size *= 2
+                continue
+            if end == len(self._buffer) and self._fill(size):
+                continue  # A number at the end of the buffer may go on in the next chunk
+            self._pos = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        """
+        Iterates over the keys of the object that comes next. After each key
+        the caller consumes its value, with `value()` or by walking into it
+        with `members()`, before asking for the next key.
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected an object key near byte {self.bytes_read}")
+            self._expect(":")
+            yield key
+            char = self._peek()
+            self._pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or '}}' near byte {self.bytes_read}")
+
+
+def read_galaxies(stream: JsonStream) -> Iterator[StateEvent]:
+    """Events for a {galaxy_id: galaxy, ...} object, the initial state file's format."""
+    for galaxy_id in stream.members():
+        yield "galaxy", (galaxy_id, Galaxy.coerce(stream.value()))
+
+
+def read_snapshot(stream: JsonStream) -> Iterator[StateEvent]:
+    """Events for a snapshot message written by the state log."""
+    for key in stream.members():
+        if key == "revision":
+            yield "revision", stream.value()
+        elif key == "payload":
+            for document_key in stream.members():
+                if document_key == "galaxies":
+                    yield from read_galaxies(stream)
+                else:
+                    yield "document", (document_key, stream.value())
+        else:
+            stream.value()
+
+
+class StateFileReader:
+    """
+    Reads a state file as batches of events, each about `batch_bytes` of the
+    file. Meant to be called from a loader thread, one batch at a time.
+    """
+
+    def __init__(self, path: str, snapshot: bool, batch_bytes: int = LOAD_BATCH_BYTES):
+        self.path = path
+        self.batch_bytes = batch_bytes
+        self.total_bytes = os.path.getsize(path)
+        self._file = open(path, "rb")
+        self._stream = JsonStream(self._file)
+        self._events = read_snapshot(self._stream) if snapshot else read_galaxies(self._stream)
+
+    @property
+    def bytes_read(self) -> int:
+        return self._stream.bytes_read
+
+    def next_batch(self) -> List[StateEvent]:
+        """The next batch of events; empty once the file has been read."""
+        start = self._stream.bytes_read
+        batch = []
+        for event in self._events:
+            batch.append(event)
+            if self._stream.bytes_read - start >= self.batch_bytes:
+                break
+        return batch
+
+    def close(self) -> None:
+        self._file.close()
@@ -0,0 +1,279 @@
+from typing import Any, Dict, Optional, Set, Tuple
+
+from state_sync import VersionedState, apply_at, apply_op
+
+
+def deployed_score(planet: Dict[str, Any]) -> float:
+    """The planet's deployed score, 0 if it has none."""
+    evaluation = (planet.get("deployedVersion") or {}).get("evaluation") or {}
+    score = evaluation.get("score", 0)
+    return float(score) if isinstance(score, (int, float)) else 0.0
+
+
+# Planets are indexed by (galaxy id, planet id)
+PlanetKey = Tuple[str, str]
+
+
+class GalaxyStats:
+    """
+    Running totals over one galaxy's planets and comets. The lowest score is
+    recomputed only after the planet holding it goes up or away.
+    """
+
+    __slots__ = ("scores", "score_sum", "comets", "_min")
+
+    def __init__(self):
+        self.scores: Dict[str, float] = {}
+        self.score_sum = 0.0
+        self.comets = 0
+        self._min: Optional[float] = None
+
+    @property
+    def planets(self) -> int:
+        return len(self.scores)
+
+    @property
+    def average_score(self) -> Optional[float]:
+        return self.score_sum / len(self.scores) if self.scores else None
+
+    @property
+    def min_score(self) -> Optional[float]:
+        if self._min is None and self.scores:
+            self._min = min(self.scores.values())
+        return self._min
+
+    def set_score(self, planet_id: str, score: float) -> None:
+        old = self.scores.get(planet_id)
+        self.scores[planet_id] = score
+        self.score_sum += score - (old or 0.0)
+        if self._min is not None:
+            if score <= self._min:
+                self._min = score
+            elif old == self._min:
+                self._min = None
+
+    def remove(self, planet_id: str) -> None:
+        old = self.scores.pop(planet_id, None)
+        if old is None:
+            return
+        # Start the sum over when the galaxy empties, dropping rounding drift
+        self.score_sum = self.score_sum - old if self.scores else 0.0
+        if old == self._min:
+            self._min = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"planets": self.planets, "average_score": self.average_score,
+                "min_score": self.min_score, "comets": self.comets}
+
+
+class StateStore(VersionedState):
+    """
+    The versioned universe plus id indexes ((galaxy id, planet id) -> planet,
+    planet id -> owning galaxies, and per-planet variant id -> trace history
+    variant) that are kept in sync with every patch operation. Handlers look
+    things up here instead of scanning the galaxy's planet and trace lists.
+
+    It also keeps per-galaxy aggregates (GalaxyStats) and universe-wide
+    counts up to date op by op, so a galaxy's status costs O(1) to derive.
+    The universe counts are mirrored in the document under "summary" (see
+    `summary()`), which the publisher patches when they change.
+
+    Planet ids are unique within a galaxy but nothing stops two galaxies from
+    reporting the same one, so planets are indexed per galaxy. Lookups by id
+    alone resolve to the galaxy that has held the id the longest.
+    """
+
+    def __init__(self, document: Dict[str, Any], **kwargs):
+        super().__init__(document, **kwargs)
+        self._planets: Dict[PlanetKey, Dict[str, Any]] = {}
+        # Galaxy ids in the order they took the planet id (dicts as ordered sets)
+        self._planet_galaxies: Dict[str, Dict[str, None]] = {}
+        self._galaxy_planets: Dict[str, Set[str]] = {}
+        self._traces: Dict[PlanetKey, Dict[str, Dict[str, Any]]] = {}
+        self._stats: Dict[str, GalaxyStats] = {}
+        self._galaxy_status: Dict[str, str] = {}
+        self._status_counts: Dict[str, int] = {}
+        self._comets = 0
+        self._reindex()
+
+    def reset(self, document: Dict[str, Any], revision: int) -> None:
+        """Replaces the whole state, e.g. with a snapshot from another process."""
+        self.document = document
+        self.revision = revision
+        self._backlog.clear()
+        self._reindex()
+
+    def load(self, galaxies: Dict[str, Any]) -> None:
+        """
+        Adds galaxies read from storage while the universe is loading. They
+        are indexed like any other, but no revision is committed: they were
+        already part of the state at the current revision.
+        """
+        for galaxy_id, galaxy in galaxies.items():
+            self.galaxies[galaxy_id] = galaxy
+            self._index_galaxy(galaxy_id)
+        self.document["summary"] = self.summary()
+
+    def _reindex(self) -> None:
+        self._planets.clear()
+        self._planet_galaxies.clear()
+        self._galaxy_planets.clear()
+        self._traces.clear()
+        self._stats.clear()
+        self._galaxy_status.clear()
+        self._status_counts.clear()
+        self._comets = 0
+        for galaxy_id in self.galaxies:
+            self._index_galaxy(galaxy_id)
+        self.document["summary"] = self.summary()
+
+    # --- Lookups ---
+
+    @property
+    def galaxies(self) -> Dict[str, Any]:
+        return self.document["galaxies"]
+
+    def galaxy(self, galaxy_id: str) -> Optional[Dict[str, Any]]:
+        return self.galaxies.get(galaxy_id)
+
+    def _owner(self, planet_id: str) -> Optional[str]:
+        return next(iter(self._planet_galaxies.get(planet_id, ())), None)
+
+    def planet(self, planet_id: str, galaxy_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Returns the planet, or None if it doesn't exist (in the given galaxy)."""
+        if galaxy_id is None:
+            galaxy_id = self._owner(planet_id)
+        return self._planets.get((galaxy_id, planet_id))
+
+    def galaxy_of(self, planet_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the galaxy a planet belongs to."""
+        galaxy_id = self._owner(planet_id)
+        return self.galaxies.get(galaxy_id) if galaxy_id is not None else None
+
+    def trace(self, planet_id: str, variant_id: str, galaxy_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Returns a variant from a planet's trace history."""
+        if galaxy_id is None:
+            galaxy_id = self._owner(planet_id)
+        return self._traces.get((galaxy_id, planet_id), {}).get(variant_id)
+
+    def galaxy_stats(self, galaxy_id: str) -> GalaxyStats:
+        """Returns the galaxy's aggregates (empty ones for an unknown galaxy)."""
+        return self._stats.get(galaxy_id) or GalaxyStats()
+
+    def summary(self) -> Dict[str, Any]:
+        """Universe-wide counts: galaxies, planets, comets and galaxies per status."""
+        return {
+            "galaxies": len(self._stats),
+            "planets": len(self._planets),
+            "comets": self._comets,
+            "status": {status: count for status, count in sorted(self._status_counts.items()) if count},
+        }
+
+    # --- Mutation ---
+
+    def apply(self, op: Dict[str, Any]) -> None:
+        path = op["path"]
+        if len(path) < 4 or path[0] != "galaxies" or path[2] != "planets":
+            apply_op(self.document, op)
+            if path[0] != "galaxies":
+                return
+            if len(path) == 1:
+                self._reindex()
+            # Replacing a whole galaxy or its planet list invalidates its entries
+            elif len(path) == 2 or path[2:] == ["planets"]:
+                self._index_galaxy(path[1])
+            elif path[2] == "comets":
+                self._count_comets(path[1])
+            elif path[2:] == ["status"]:
+                self._count_status(path[1])
+            return
+
+        galaxy_id, planet_id = path[1], path[3]
+        planet = self._planets.get((galaxy_id, planet_id))
+        if len(path) > 4:
+            if planet is None:
+                # Same as resolving the path through the planet list
+                raise KeyError(planet_id)
+            # Resolve the planet through the index rather than the planet list
+            apply_at(planet, path[4:], op)
+            if path[4] == "traceHistory" and len(path) <= 6:
+                self._index_traces(galaxy_id, planet)
+            elif path[4] == "deployedVersion":
+                self._stats[galaxy_id].set_score(planet_id, deployed_score(planet))
+            return
+
+        if op["op"] == "delete":
+            apply_op(self.document, op)
+            self._unindex_planet(galaxy_id, planet_id)
+        elif planet is None:
+            planets = self.galaxies[path[1]].setdefault("planets", [])
+            planets.append(op["value"])
+            # Index the stored planet; the list may have converted the value
+            self._index_planet(path[1], planets[-1])
+        else:
+            apply_op(self.document, op)
+            self._index_galaxy(path[1])
+
+    # --- Index maintenance ---
+
+    def _index_galaxy(self, galaxy_id: str) -> None:
+        for planet_id in list(self._galaxy_planets.get(galaxy_id, ())):
+            self._unindex_planet(galaxy_id, planet_id)
+        galaxy = self.galaxies.get(galaxy_id)
+        if galaxy is None:
+            self._galaxy_planets.pop(galaxy_id, None)
+            stats = self._stats.pop(galaxy_id, None)
+            if stats is not None:
+                self._comets -= stats.comets
+            self._count_status(galaxy_id)
+            return
+        stats = self._stats.get(galaxy_id)
+        if stats is not None:
+            self._comets -= stats.comets
+        self._stats[galaxy_id] = GalaxyStats()
+        for planet in galaxy.get("planets", []):
+            self._index_planet(galaxy_id, planet)
+        self._count_comets(galaxy_id)
+        self._count_status(galaxy_id)
+
+    def _index_planet(self, galaxy_id: str, planet: Dict[str, Any]) -> None:
+        planet_id = planet["id"]
+        self._planets[(galaxy_id, planet_id)] = planet
+        self._planet_galaxies.setdefault(planet_id, {})[galaxy_id] = None
+        self._galaxy_planets.setdefault(galaxy_id, set()).add(planet_id)
+        self._stats[galaxy_id].set_score(planet_id, deployed_score(planet))
+        self._index_traces(galaxy_id, planet)
+
+    def _unindex_planet(self, galaxy_id: str, planet_id: str) -> None:
+        if self._planets.pop((galaxy_id, planet_id), None) is None:
+            return
+        self._traces.pop((galaxy_id, planet_id), None)
+        owners = self._planet_galaxies[planet_id]
+        del owners[galaxy_id]
+        if not owners:
+            del self._planet_galaxies[planet_id]
+        self._galaxy_planets.get(galaxy_id, set()).discard(planet_id)
+        if galaxy_id in self._stats:
+            self._stats[galaxy_id].remove(planet_id)
+
+    def _count_comets(self, galaxy_id: str) -> None:
+        galaxy = self.galaxies.get(galaxy_id)
+        stats = self._stats.get(galaxy_id)
+        if galaxy is not None and stats is not None:
+            comets = len(galaxy.get("comets") or [])
+            self._comets += comets - stats.comets
+            stats.comets = comets
+
+    def _count_status(self, galaxy_id: str) -> None:
+        old = self._galaxy_status.pop(galaxy_id, None)
+        if old is not None:
+            self._status_counts[old] -= 1
+        galaxy = self.galaxies.get(galaxy_id)
+        if galaxy is not None:
+            status = galaxy.get("status") or "unknown"
+            self._galaxy_status[galaxy_id] = status
+            self._status_counts[status] = self._status_counts.get(status, 0) + 1
+
+    def _index_traces(self, galaxy_id: str, planet: Dict[str, Any]) -> None:
+        # Trace histories are capped, so rebuilding a planet's map is cheap
+        self._traces[(galaxy_id, planet["id"])] = {v["id"]: v for v in planet.get("traceHistory", [])}
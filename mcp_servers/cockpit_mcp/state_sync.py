@@ -0,0 +1,166 @@
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from metrics import REGISTRY
+from wire import encode_message
+
+# Full-state JSON encodes are the biggest single blocks of work on the loop
+SNAPSHOT_ENCODE = REGISTRY.histogram("cockpit_snapshot_encode_seconds",
+                                     "Time spent encoding snapshot messages, by scope (full or a topic kind).", ("scope",))
+
+# How many recent patches are kept so that lagging clients can catch up
+# without needing a full snapshot.
+PATCH_BACKLOG_SIZE = 256
+
+
+# --- Patch Operations ---
+# A patch is a list of small path/value operations against the universe
+# document ({"galaxies": ..., "optimizing_planets": ...}). Path segments are
+# dict keys, except inside lists of objects (planets, traceHistory, comets)
+# where a segment selects the item whose "id" matches it.
+
+def _child(container: Any, segment: str) -> Any:
+    if isinstance(container, list):
+        for item in container:
+            if item.get("id") == segment:
+                return item
+        raise KeyError(segment)
+    return container[segment]
+
+
+def _parent(document: Dict[str, Any], path: List[str]) -> Any:
+    node = document
+    for segment in path[:-1]:
+        node = _child(node, segment)
+    return node
+
+
+def apply_op(document: Dict[str, Any], op: Dict[str, Any]) -> None:
+    """Applies a single patch operation to the document in place."""
+    apply_at(document, op["path"], op)
+
+
+def apply_at(root: Any, path: List[str], op: Dict[str, Any]) -> None:
+    """Applies an operation with `path` taken relative to `root`."""
+    kind = op["op"]
+
+    if kind == "insert":
+        target = _parent(root, path + [None])
+        target.insert(op.get("index", 0), op["value"])
+        limit = op.get("limit")
+        if limit is not None:
+            del target[limit:]
+        return
+
+    parent = _parent(root, path)
+    key = path[-1]
+    if isinstance(parent, list):
+        index = next((i for i, item in enumerate(parent) if item.get("id") == key), None)
+        if kind == "set":
+            if index is None:
+                parent.append(op["value"])
+            else:
+                parent[index] = op["value"]
+        elif kind == "delete" and index is not None:
+            del parent[index]
+    elif kind == "set":
+        parent[key] = op["value"]
+    elif kind == "delete":
+        parent.pop(key, None)
+
+
+def apply_ops(document: Dict[str, Any], ops: List[Dict[str, Any]]) -> None:
+    """Applies a list of patch operations to the document in place."""
+    for op in ops:
+        apply_op(document, op)
+
+
+class Patch:
+    """
+    Collects the operations that make up one state transition. Each operation
+    is applied to the document as soon as it is added, so derived values (like
+    a galaxy's status) can be computed from the updated state before commit.
+    """
+
+    def __init__(self, apply: Callable[[Dict[str, Any]], None]):
+        self._apply = apply
+        self.ops: List[Dict[str, Any]] = []
+        self.encoded_ops: List[str] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.ops)
+
+    def _add(self, op: Dict[str, Any]) -> "Patch":
+        self._apply(op)
+        # Each op is serialized as it is recorded: the encoded text is an
+        # immutable snapshot of the value, so no defensive copy is needed
+        # even if the state is mutated again before the patch is committed.
+        self.ops.append(op)
+        self.encoded_ops.append(encode_message(op))
+        return self
+
+    def record(self, op: Dict[str, Any]) -> "Patch":
+        """Applies and records an operation built elsewhere (e.g. by another worker)."""
+        return self._add(op)
+
+    def set(self, *path: str, value: Any) -> "Patch":
+        return self._add({"op": "set", "path": list(path), "value": value})
+
+    def delete(self, *path: str) -> "Patch":
+        return self._add({"op": "delete", "path": list(path)})
+
+    def insert(self, *path: str, value: Any, index: int = 0, limit: Optional[int] = None) -> "Patch":
+        op = {"op": "insert", "path": list(path), "value": value, "index": index}
+        if limit is not None:
+            op["limit"] = limit
+        return self._add(op)
+
+
+# --- Versioned State ---
+
+class VersionedState:
+    """
+    Owns the universe document and a monotonically increasing revision.
+    Every committed patch bumps the revision and is kept, already encoded, in
+    a bounded backlog so clients can be brought up to date with patches
+    instead of snapshots.
+    """
+
+    def __init__(self, document: Dict[str, Any], backlog_size: int = PATCH_BACKLOG_SIZE, revision: int = 0):
+        self.document = document
+        self.revision = revision
+        self._backlog: Deque[str] = deque(maxlen=backlog_size)
+
+    def apply(self, op: Dict[str, Any]) -> None:
+        """Applies one operation to the document."""
+        apply_op(self.document, op)
+
+    def patch(self) -> Patch:
+        """Starts a new patch against the current document."""
+        return Patch(self.apply)
+
+    def commit(self, patch: Patch) -> Optional[str]:
+        """Assigns the next revision to the patch and returns its encoded message."""
+        if not patch:
+            return None
+        self.revision += 1
+        message = '{"type":"patch","revision":%d,"ops":[%s]}' % (self.revision, ",".join(patch.encoded_ops))
+        self._backlog.append(message)
+        return message
+
+    def snapshot(self) -> str:
+        """Returns an encoded full snapshot message of the current state."""
+        with SNAPSHOT_ENCODE.time("full"):
+            return encode_message({"type": "snapshot", "revision": self.revision, "payload": self.document})
+
+    def patches_since(self, revision: int) -> Optional[List[str]]:
+        """
+        Returns the encoded patch messages after the given revision, or None if the
+        backlog no longer reaches back that far and a snapshot is required.
+        """
+        if revision > self.revision or revision < 0:
+            return None
+        missing = self.revision - revision
+        if missing > len(self._backlog):
+            return None
+        return list(self._backlog)[len(self._backlog) - missing:]
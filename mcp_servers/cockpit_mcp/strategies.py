@@ -0,0 +1,270 @@
+import itertools
+import math
+import random
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Type
+
+from prompts import MAX_MODIFIERS, build_prompt
+
+# A candidate is the base prompt plus a set of modifiers, kept sorted so the
+# same set is always the same candidate.
+Combo = Tuple[str, ...]
+
+
+class Strategy:
+    """
+    Searches the prompts made of a base text plus up to `max_modifiers` of
+    the given modifiers. The optimizer asks for candidates with `propose()`
+    and reports each one's score with `observe()`.
+
+    A strategy never proposes a candidate it has already proposed, so a run
+    doesn't pay twice for the same prompt. The run starts from the deployed
+    prompt's modifiers and score, if known.
+    """
+
+    name = ""
+
+    def __init__(self, base: str, modifiers: Sequence[str], start: Sequence[str] = (),
+                 start_score: Optional[float] = None, max_modifiers: int = MAX_MODIFIERS,
+                 rng: Optional[random.Random] = None):
+        self.base = base
+        self.modifiers = sorted(set(modifiers))
+        self.max_modifiers = max_modifiers
+        self.rng = rng or random.Random()
+        self.scores: Dict[Combo, float] = {}
+        self._proposed: Set[Combo] = set()
+        self._all: Optional[List[Combo]] = None
+        self.best: Combo = self.combo(start)[:max_modifiers]
+        self.best_score = -math.inf
+        self._proposed.add(self.best)
+        if start_score is not None:
+            self.scores[self.best] = start_score
+            self.best_score = start_score
+
+    @staticmethod
+    def combo(modifiers: Sequence[str]) -> Combo:
+        return tuple(sorted(set(modifiers)))
+
+    def prompt(self, combo: Combo) -> str:
+        return build_prompt(self.base, combo)
+
+    def is_new(self, combo: Combo) -> bool:
+        return combo not in self._proposed
+
+    def neighbors(self, combo: Combo) -> List[Combo]:
+        """Candidates one modifier away: one added, or one swapped if full."""
+        unused = [modifier for modifier in self.modifiers if modifier not in combo]
+        if len(combo) < self.max_modifiers:
+            return [self.combo(combo + (modifier,)) for modifier in unused]
+        return [self.combo(combo[:i] + combo[i + 1:] + (modifier,))
+                for i in range(len(combo)) for modifier in unused]
+
+    def propose(self, k: int) -> List[Combo]:
+        """Returns up to k new candidates; an empty list means nothing is left."""
+        combos = [combo for combo in self._propose(k) if self.is_new(combo)][:k]
+        self._proposed.update(combos)
+        return combos
+
+    def observe(self, combo: Combo, score: float) -> None:
+        self.scores[combo] = score
+        if score > self.best_score:
+            self.best, self.best_score = combo, score
+        self._observe(combo, score)
+
+    def _propose(self, k: int) -> List[Combo]:
+        raise NotImplementedError
+
+    def _observe(self, combo: Combo, score: float) -> None:
+        pass
+
+    def all_combos(self) -> List[Combo]:
+        if self._all is None:
+            self._all = [combo for size in range(self.max_modifiers + 1)
+                         for combo in itertools.combinations(self.modifiers, size)]
+        return self._all
+
+
+class RandomSearch(Strategy):
+    """Uniformly random untried candidates; the baseline."""
+
+    name = "Random search"
+
+    def _propose(self, k: int) -> List[Combo]:
+        untried = [combo for combo in self.all_combos() if self.is_new(combo)]
+        return self.rng.sample(untried, min(k, len(untried)))
+
+
+class UCBBandit(Strategy):
+    """
+    Treats each modifier as an arm. A pull adds the modifier to the best
+    prompt so far (swapping out one of its modifiers if it is full) and is
+    rewarded with the score gained over that prompt. Arms are pulled in
+    order of their upper confidence bound.
+    """
+
+    name = "UCB bandit"
+    exploration = 0.1
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pulls: Dict[str, int] = {modifier: 0 for modifier in self.modifiers}
+        self.rewards: Dict[str, float] = {modifier: 0.0 for modifier in self.modifiers}
+        self._arm_of: Dict[Combo, Tuple[str, float]] = {}
+
+    def _ucb(self, arm: str, total: int) -> float:
+        if not self.pulls[arm]:
+            return math.inf
+        mean = self.rewards[arm] / self.pulls[arm]
+        return mean + self.exploration * math.sqrt(2 * math.log(max(total, 1)) / self.pulls[arm])
+
+    def _propose(self, k: int) -> List[Combo]:
+        total = sum(self.pulls.values())
+        parent_score = self.best_score if self.best_score > -math.inf else 0.0
+        arms = sorted(self.modifiers, key=lambda arm: (-self._ucb(arm, total), self.rng.random()))
+        combos = []
+        for arm in arms:
+            if arm in self.best:
+                continue
+            options = [combo for combo in self.neighbors(self.best) if arm in combo and self.is_new(combo)]
+            if not options:
+                continue
+            combo = self.rng.choice(options)
+            self._arm_of[combo] = (arm, parent_score)
+            combos.append(combo)
+            if len(combos) == k:
+                break
+        if len(combos) < k:
+            # Every arm is exhausted around the best prompt; try anything new
+            combos += [combo for combo in self.all_combos() if self.is_new(combo) and combo not in combos][:k - len(combos)]
+        return combos
+
+    def _observe(self, combo: Combo, score: float) -> None:
+        arm, parent_score = self._arm_of.pop(combo, (None, 0.0))
+        if arm is not None:
+            self.pulls[arm] += 1
+            self.rewards[arm] += score - parent_score
+
+
+class BeamSearch(Strategy):
+    """
+    Keeps the `width` best prompts found so far and expands them one
+    modifier at a time, best prompt first.
+    """
+
+    name = "Beam search"
+    width = 4
+
+    def _propose(self, k: int) -> List[Combo]:
+        beam = sorted(self.scores, key=self.scores.get, reverse=True)[:self.width] or [self.best]
+        combos: List[Combo] = []
+        for parent in beam:
+            expansions = [combo for combo in self.neighbors(parent) if self.is_new(combo) and combo not in combos]
+            self.rng.shuffle(expansions)
+            combos += expansions[:k - len(combos)]
+            if len(combos) == k:
+                return combos
+        # The beam is fully expanded; widen it to everything scored
+        for parent in sorted(self.scores, key=self.scores.get, reverse=True)[self.width:]:
+            combos += [combo for combo in self.neighbors(parent)
+                       if self.is_new(combo) and combo not in combos][:k - len(combos)]
+            if len(combos) == k:
+                break
+        return combos
+
+
+class BayesianSurrogate(Strategy):
+    """
+    Fits a Bayesian linear model of the score: an intercept plus one
+    additive effect per modifier, with Gaussian priors and noise. Candidates
+    are the untried prompts with the highest upper confidence bound
+    (posterior mean + `beta` standard deviations).
+    """
+
+    name = "Bayesian surrogate"
+    beta = 1.0
+    prior_sd = 0.1  # Of a modifier's effect on the score
+    noise_sd = 0.05
+    max_candidates = 2000  # Scored per proposal; sampled beyond this
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Feature 0 is the intercept, then one per modifier
+        self._index = {modifier: i + 1 for i, modifier in enumerate(self.modifiers)}
+
+    def _features(self, combo: Combo) -> List[int]:
+        return [0] + [self._index[modifier] for modifier in combo if modifier in self._index]
+
+    def _propose(self, k: int) -> List[Combo]:
+        size = len(self.modifiers) + 1
+        # Posterior precision A = X'X / noise^2 + prior precision; b = X'y / noise^2
+        a = [[0.0] * size for _ in range(size)]
+        a[0][0] = 1.0  # Broad prior on the intercept
+        for i in range(1, size):
+            a[i][i] = 1.0 / self.prior_sd ** 2
+        b = [0.0] * size
+        noise = self.noise_sd ** 2
+        for combo, score in self.scores.items():
+            features = self._features(combo)
+            for i in features:
+                b[i] += score / noise
+                for j in features:
+                    a[i][j] += 1.0 / noise
+        lower = _cholesky(a)
+        mean = _cholesky_solve(lower, b)
+        # Posterior covariance; a candidate's variance only needs the few
+        # entries for the modifiers it has
+        covariance = [_cholesky_solve(lower, [float(i == j) for i in range(size)]) for j in range(size)]
+
+        untried = [combo for combo in self.all_combos() if self.is_new(combo)]
+        if len(untried) > self.max_candidates:
+            untried = self.rng.sample(untried, self.max_candidates)
+
+        def upper_bound(combo: Combo) -> float:
+            features = self._features(combo)
+            variance = sum(covariance[i][j] for i in features for j in features)
+            return sum(mean[i] for i in features) + self.beta * math.sqrt(max(variance, 0.0))
+
+        return sorted(untried, key=lambda combo: (-upper_bound(combo), self.rng.random()))[:k]
+
+
+def _cholesky(a: List[List[float]]) -> List[List[float]]:
+    n = len(a)
+    lower = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1):
+            total = a[i][j] - sum(lower[i][m] * lower[j][m] for m in range(j))
+            lower[i][j] = math.sqrt(total) if i == j else total / lower[j][j]
+    return lower
+
+
+def _forward_solve(lower: List[List[float]], b: List[float]) -> List[float]:
+    y = []
+    for i, row in enumerate(lower):
+        y.append((b[i] - sum(row[m] * y[m] for m in range(i))) / row[i])
+    return y
+
+
+def _cholesky_solve(lower: List[List[float]], b: List[float]) -> List[float]:
+    y = _forward_solve(lower, b)
+    n = len(lower)
+    x = [0.0] * n
+    for i in reversed(range(n)):
+        x[i] = (y[i] - sum(lower[m][i] * x[m] for m in range(i + 1, n))) / lower[i][i]
+    return x
+
+
+STRATEGIES: Dict[str, Type[Strategy]] = {
+    cls.name: cls for cls in (BayesianSurrogate, UCBBandit, BeamSearch, RandomSearch)
+}
+DEFAULT_STRATEGY = "Bayesian surrogate"
+# Optimizer names the dashboard offers, mapped onto the strategies above;
+# MIPRO and MetaPrompt have no strategy of their own and get the default
+ALIASES = {"Few-shot Bayesian": "Bayesian surrogate", "MIPRO": DEFAULT_STRATEGY,
+           "LLM-powered MetaPrompt": DEFAULT_STRATEGY}
+
+
+def make_strategy(name: str, base: str, modifiers: Sequence[str], **kwargs) -> Strategy:
+    """Creates the named strategy (or dashboard alias); raises ValueError for an unknown name."""
+    cls = STRATEGIES.get(ALIASES.get(name, name))
+    if cls is None:
+        raise ValueError(f"Unknown optimizer {name!r}; expected one of {sorted([*STRATEGIES, *ALIASES])}")
+    return cls(base, modifiers, **kwargs)
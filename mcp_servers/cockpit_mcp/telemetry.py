@@ -0,0 +1,114 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from operations import parse_operations
+
+logger = logging.getLogger(__name__)
+
+# {agent_id: {planet_id: merged planet telemetry}}
+TelemetryBatch = Dict[str, Dict[str, Dict[str, Any]]]
+
+
+def validate_agent_telemetry(record: Any) -> Tuple[Optional[str], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Checks one agent's telemetry record ({"agent_id": ..., "planets": [...],
+    "payload": ...}) and returns (agent_id, planets, operational samples).
+    The payload's requests count for the planet it names, or for the
+    record's planet if it reports just one (see operations.parse_operations).
+    Raises ValueError with a message suitable for the per-record error list.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    agent_id = record.get("agent_id")
+    if not agent_id:
+        raise ValueError("missing agent_id")
+    planets = record.get("planets", [])
+    if not isinstance(planets, list):
+        raise ValueError("planets must be a list")
+    for planet in planets:
+        if not isinstance(planet, dict) or not planet.get("id"):
+            raise ValueError("every planet needs an id")
+    samples = parse_operations(record.get("payload"), planets[0]["id"] if len(planets) == 1 else None)
+    return agent_id, planets, samples
+
+
+async def iter_ndjson(stream: Any) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yields (line number, decoded value or ValueError) for each non-empty
+    line of an NDJSON request body, reading it incrementally.
+    """
+    line_number = 0
+    async for line in stream:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f"invalid JSON: {e}")
+
+
+class TelemetryBatcher:
+    """
+    Buffers telemetry from any number of requests and applies it once per
+    flush window, so a burst of agents posting telemetry produces one state
+    transition and one broadcast instead of one per request. Updates to the
+    same planet within a window are merged, the latest values winning.
+    `apply` returns how many of the batch's planet updates it rejected.
+    """
+
+    def __init__(self, apply: Callable[[TelemetryBatch], Awaitable[int]], flush_interval: float = 0.1):
+        self.apply = apply
+        self.flush_interval = flush_interval
+        self._pending: TelemetryBatch = {}
+        self._has_pending = asyncio.Event()
+
+        # Throughput counters
+        self.received = 0
+        self.flushes = 0
+        self.applied = 0
+        self.rejected = 0
+        self.last_flush_duration = 0.0
+
+    def submit(self, agent_id: str, planets: List[Dict[str, Any]]) -> None:
+        agent_planets = self._pending.setdefault(agent_id, {})
+        for planet in planets:
+            agent_planets.setdefault(planet["id"], {}).update(planet)
+        self.received += len(planets)
+        self._has_pending.set()
+
+    async def flush(self) -> None:
+        """Applies everything submitted so far as one batch."""
+        batch, self._pending = self._pending, {}
+        self._has_pending.clear()
+        if not batch:
+            return
+        start = time.perf_counter()
+        rejected = await self.apply(batch)
+        self.last_flush_duration = time.perf_counter() - start
+        self.flushes += 1
+        self.rejected += rejected
+        self.applied += sum(len(planets) for planets in batch.values()) - rejected
+
+    async def run(self) -> None:
+        """Flushes pending telemetry at most once per flush window."""
+        while True:
+            await self._has_pending.wait()
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception("Error applying a telemetry batch")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "applied": self.applied,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "pending_agents": len(self._pending),
+            "last_flush_ms": round(self.last_flush_duration * 1000, 2),
+        }
@@ -6,6 +6,7 @@ import random
 # --- Configuration ---
 # This must match the agent ID used in the onboarding curl command
 AGENT_ID = "demo-agent"
+PLANET_ID = "demo-agent-planet"
 TELEMETRY_ENDPOINT = "http://localhost:8080/api/telemetry"
 POST_INTERVAL_SECONDS = 3
 
@@ -19,11 +20,28 @@ def generate_telemetry_payload():
         "completion_tokens": random.randint(50, 500),
     }
 
+def build_planet(metrics):
+    """Reports the agent's prompt as a planet, which is what /api/telemetry reads."""
+    return {
+        "id": PLANET_ID,
+        "name": "Demo Planet",
+        "deployedVersion": {
+            "id": f"demo_{int(time.time())}",
+            "text": "Initial prompt for classifying customer inquiries.",
+            "evaluation": {"score": metrics["score"], "speed": metrics["latency_ms"]},
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "isDeployed": True,
+        },
+    }
+
 def post_telemetry():
     """Constructs and posts the telemetry data to the endpoint."""
+    metrics = generate_telemetry_payload()
     payload = {
         "agent_id": AGENT_ID,
-        "payload": generate_telemetry_payload()
+        "planets": [build_planet(metrics)],
+        # Raw operational metrics, kept alongside the planet update
+        "payload": metrics,
     }
 
     try:
@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, NamedTuple, Optional
+from urllib.parse import quote, urlsplit, urlunsplit
+
+if TYPE_CHECKING:
+    import httpx
+
+from wire import decode_message, encode_message
+
+logger = logging.getLogger(__name__)
+
+
+def stable_index(item_id: str, size: int) -> int:
+    """
+    Maps an id to 0..size-1 the same way in every process, unlike hash(),
+    which is randomized per interpreter run.
+    """
+    digest = hashlib.sha1(item_id.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % size
+
+
+def cat_texture_url(item_id: str) -> str:
+    return ("https://cataas.com/cat/cute/says/galaxy-agent?width=512&height=512"
+            f"&color=white&type=square&s=20&id={quote(item_id, safe='')}")
+
+
+def pokemon_texture_url(item_id: str) -> str:
+    return ("https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/other/official-artwork/"
+            f"{stable_index(item_id, 898) + 1}.png")
+
+
+THEME_URLS: Dict[str, Callable[[str], str]] = {
+    "cats": cat_texture_url,
+    "pokemon": pokemon_texture_url,
+}
+
+
+class Texture(NamedTuple):
+    body: bytes
+    content_type: str
+    etag: str
+
+
+class TextureProxy:
+    """
+    Fetches theme textures through one pooled HTTP client and caches them in
+    a size-bounded in-memory LRU backed by an on-disk cache. Concurrent
+    requests for the same texture share a single upstream fetch.
+
+    A texture URL only depends on the theme and id, so a cached texture
+    never goes stale; browsers get an ETag and a long max-age.
+
+    `upstream` replaces the scheme and host of every upstream URL, so a
+    local stub server can stand in for the real image hosts.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_memory_bytes: int = 32 * 2**20,
+                 max_disk_bytes: int = 256 * 2**20, timeout: float = 15.0,
+                 upstream: Optional[str] = None, theme_urls: Optional[Dict[str, Callable[[str], str]]] = None):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.timeout = timeout
+        self.upstream = upstream
+        self.theme_urls = theme_urls if theme_urls is not None else THEME_URLS
+
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._memory: "OrderedDict[str, Texture]" = OrderedDict()
+        self._memory_bytes = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._disk = ThreadPoolExecutor(max_workers=1, thread_name_prefix="texture-cache")
+        self._disk_bytes: Optional[int] = None  # Measured on first write
+
+        # Cache counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.fetches = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def url_for(self, theme: str, item_id: str) -> Optional[str]:
+        """Returns the upstream URL of a texture, or None for an unknown theme."""
+        make_url = self.theme_urls.get(theme)
+        if make_url is None:
+            return None
+        url = make_url(item_id)
+        if self.upstream:
+            base = urlsplit(self.upstream)
+            url = urlunsplit(urlsplit(url)._replace(scheme=base.scheme, netloc=base.netloc))
+        return url
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            # httpx (and the certificates it loads) is imported on the first
+            # fetch, which keeps it out of the server's startup
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._disk.shutdown(wait=False)
+
+    async def get(self, url: str) -> Texture:
+        """
+        Returns the texture at `url` from memory, disk or upstream, in that
+        order. Raises httpx.HTTPError if the upstream fetch fails.
+        """
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        texture = self._memory.get(key)
+        if texture is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return texture
+
+        task = self._inflight.get(key)
+        if task is None:
+            # The fetch runs as its own task, so a browser that goes away
+            # doesn't cancel it for the other requests waiting on it.
+            task = asyncio.ensure_future(self._load(key, url))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved even if every requester went away
+
+    async def _load(self, key: str, url: str) -> Texture:
+        try:
+            texture = await self._read_or_fetch(key, url)
+        except Exception:
+            self.errors += 1
+            raise
+        self._remember(key, texture)
+        return texture
+
+    async def _read_or_fetch(self, key: str, url: str) -> Texture:
+        loop = asyncio.get_running_loop()
+        if self.cache_dir:
+            texture = await loop.run_in_executor(self._disk, self._read_disk, key)
+            if texture is not None:
+                self.disk_hits += 1
+                return texture
+
+        self.fetches += 1
+        resp = await self.client.get(url)
+        resp.raise_for_status()
+        body = resp.content
+        texture = Texture(
+            body=body,
+            content_type=resp.headers.get("Content-Type", "image/png"),
+            etag='"%s"' % hashlib.sha1(body).hexdigest(),
+        )
+        if self.cache_dir:
+            loop.run_in_executor(self._disk, self._write_disk, key, texture)
+        return texture
+
+    def _remember(self, key: str, texture: Texture) -> None:
+        size = len(texture.body)
+        if size > self.max_memory_bytes:
+            return
+        self._memory[key] = texture
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.body)
+
+    # --- Disk cache (runs on the cache's own thread) ---
+
+    def _read_disk(self, key: str) -> Optional[Texture]:
+        path = os.path.join(self.cache_dir, key)
+        try:
+            with open(path + ".json", "rb") as f:
+                meta = decode_message(f.read())
+            with open(path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # Recently used entries survive disk eviction
+        return Texture(body=body, content_type=meta["content_type"], etag=meta["etag"])
+
+    def _write_disk(self, key: str, texture: Texture) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, key)
+            # The body is written first and renamed into place, so a reader
+            # never sees metadata for a partial body.
+            with open(path + ".tmp", "wb") as f:
+                f.write(texture.body)
+            os.replace(path + ".tmp", path)
+            with open(path + ".json", "w") as f:
+                f.write(encode_message({"content_type": texture.content_type, "etag": texture.etag}))
+            self._trim_disk(len(texture.body))
+        except OSError as e:
+            logger.warning("Could not write a texture to the disk cache", extra={"error": str(e)})
+
+    def _trim_disk(self, added: int) -> None:
+        if self._disk_bytes is None:
+            self._disk_bytes = 0
+            added = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith((".json", ".tmp")):
+                    self._disk_bytes += entry.stat().st_size
+        self._disk_bytes += added
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        entries = sorted(
+            (entry for entry in os.scandir(self.cache_dir) if not entry.name.endswith((".json", ".tmp"))),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries:
+            if self._disk_bytes <= self.max_disk_bytes * 0.9:
+                break
+            size = entry.stat().st_size
+            for path in (entry.path + ".json", entry.path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._disk_bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "fetches": self.fetches,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "inflight": len(self._inflight),
+        }
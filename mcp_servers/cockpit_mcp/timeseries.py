@@ -0,0 +1,194 @@
+import math
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# (bucket width in seconds, buckets kept): 5 minutes at 1 s, a day at 1 min
+# and 30 days at 1 h.
+DEFAULT_TIERS: Tuple[Tuple[int, int], ...] = ((1, 300), (60, 1440), (3600, 720))
+# A range query picks the finest tier that still covers it in this many buckets
+MAX_POINTS = 1500
+
+
+class Ring:
+    """
+    One rollup tier of one series: a fixed number of buckets, reused in a
+    ring, each holding the min/max/sum/count of every metric for the samples
+    that fell in it. Columns are flat typed arrays (index slot * metrics +
+    metric) of float32 values: about 7 significant digits, and averages over
+    thousands of samples are good to about 6.
+    """
+
+    __slots__ = ("width", "size", "metrics", "bucket", "count", "low", "high", "total")
+
+    def __init__(self, width: int, size: int, metrics: int):
+        self.width = width
+        self.size = size
+        self.metrics = metrics
+        # Which bucket (time // width) each slot currently holds; 0 is empty
+        self.bucket = array("I", bytes(4 * size))
+        cells = size * metrics
+        self.count = array("I", bytes(4 * cells))
+        self.low = array("f", bytes(4 * cells))
+        self.high = array("f", bytes(4 * cells))
+        self.total = array("f", bytes(4 * cells))
+
+    def add(self, timestamp: float, values: Sequence[Optional[float]]) -> None:
+        number = int(timestamp // self.width)
+        slot = number % self.size
+        i = slot * self.metrics
+        count, low, high, total = self.count, self.low, self.high, self.total
+        if self.bucket[slot] != number:
+            # The slot held an older bucket; start it over
+            self.bucket[slot] = number
+            count[i:i + self.metrics] = array("I", bytes(4 * self.metrics))
+        for value in values:
+            if value is not None:
+                n = count[i]
+                if n:
+                    if value < low[i]:
+                        low[i] = value
+                    elif value > high[i]:
+                        high[i] = value
+                    total[i] += value
+                    count[i] = n + 1
+                else:
+                    low[i] = high[i] = total[i] = value
+                    count[i] = 1
+            i += 1
+
+    def slots(self, first: int, last: int) -> Iterable[Tuple[int, int]]:
+        """
+        Splits the buckets in [first, last] this ring can still hold into
+        runs of consecutive slots: (first bucket number, first slot, length).
+        """
+        first = max(first, last - self.size + 1)
+        while first <= last:
+            slot = first % self.size
+            length = min(last - first + 1, self.size - slot)
+            yield first, slot, length
+            first += length
+
+
+class TimeSeriesStore:
+    """
+    Per-planet history of the deployed version's evaluation metrics, rolled
+    up on arrival into every tier of fixed-size ring buffers (see Ring), so
+    memory per planet is fixed no matter how long it reports and no raw
+    samples are kept. Galaxy trends are the planets' buckets merged at query
+    time. Metrics graded in words are recorded on the scale `levels` gives
+    them ({metric: {word: value}}).
+    """
+
+    def __init__(self, metrics: Sequence[str], tiers: Sequence[Tuple[int, int]] = DEFAULT_TIERS,
+                 levels: Optional[Dict[str, Dict[str, float]]] = None):
+        self.metrics = tuple(metrics)
+        self.tiers = tuple(sorted(tiers))
+        self.levels = [(levels or {}).get(name, {}) for name in self.metrics]
+        self._series: Dict[str, List[Ring]] = {}
+        self.samples = 0
+
+    def record(self, key: str, values: Dict[str, Any], timestamp: Optional[float] = None) -> None:
+        """Adds one sample; missing metrics, and values neither numeric nor on the metric's scale, are skipped."""
+        row = [value if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+               else scale.get(value) if isinstance(value, str) else None
+               for value, scale in zip((values.get(name) for name in self.metrics), self.levels)]
+        if all(value is None for value in row):
+            return
+        rings = self._series.get(key)
+        if rings is None:
+            rings = self._series[key] = [Ring(width, size, len(self.metrics)) for width, size in self.tiers]
+        timestamp = time.time() if timestamp is None else timestamp
+        for ring in rings:
+            ring.add(timestamp, row)
+        self.samples += 1
+
+    def drop(self, key: str) -> None:
+        self._series.pop(key, None)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._series
+
+    def pick_width(self, start: float, end: float, now: Optional[float] = None) -> int:
+        """The finest tier that reaches back to `start` within MAX_POINTS buckets."""
+        now = time.time() if now is None else now
+        for width, size in self.tiers:
+            if now - start <= width * size and (end - start) / width <= MAX_POINTS:
+                return width
+        return self.tiers[-1][0]
+
+    def query(self, keys: Sequence[str], start: float, end: float, width: Optional[int] = None,
+              metrics: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Returns the buckets of [start, end] at the given width (a tier's, or
+        picked automatically), merged across `keys`, as columns:
+        {"resolution", "t", "metrics": {name: {"min", "max", "avg", "count"}}}.
+        Buckets without samples are left out. Values come back as the
+        doubles nearest their float32, e.g. 0.51 reads as 0.5099999904632568.
+        """
+        width = width or self.pick_width(start, end)
+        tier = [w for w, _ in self.tiers].index(width)  # ValueError for an unknown width
+        names = list(metrics) if metrics else list(self.metrics)
+        columns = [self.metrics.index(name) for name in names]  # ValueError for an unknown metric
+        first, last = int(start // width), int(end // width)
+        first = max(first, last - self.tiers[tier][1] + 1)
+        n = last - first + 1
+        lows = [[math.inf] * n for _ in columns]
+        highs = [[-math.inf] * n for _ in columns]
+        totals = [[0.0] * n for _ in columns]
+        counts = [[0] * n for _ in columns]
+
+        for key in keys:
+            rings = self._series.get(key)
+            if rings is None:
+                continue
+            ring = rings[tier]
+            stride = ring.metrics
+            for number, slot, length in ring.slots(first, last):
+                offset = number - first
+                held = ring.bucket[slot:slot + length]
+                present = [j for j, bucket in enumerate(held, number) if bucket == j]
+                if not present:
+                    continue
+                begin, stop = slot * stride, (slot + length) * stride
+                for c, m in enumerate(columns):
+                    # The metric's column over this run of slots
+                    count = ring.count[begin + m:stop:stride]
+                    low = ring.low[begin + m:stop:stride]
+                    high = ring.high[begin + m:stop:stride]
+                    total = ring.total[begin + m:stop:stride]
+                    lows_c, highs_c, totals_c, counts_c = lows[c], highs[c], totals[c], counts[c]
+                    for j in present:
+                        k = j - number
+                        if count[k]:
+                            o = offset + k
+                            if low[k] < lows_c[o]:
+                                lows_c[o] = low[k]
+                            if high[k] > highs_c[o]:
+                                highs_c[o] = high[k]
+                            totals_c[o] += total[k]
+                            counts_c[o] += count[k]
+
+        # Buckets without samples are left out
+        kept = [o for o in range(n) if any(column[o] for column in counts)]
+        result: Dict[str, Any] = {"resolution": width, "t": [(first + o) * width for o in kept], "metrics": {}}
+        for c, name in enumerate(names):
+            count = counts[c]
+            result["metrics"][name] = {
+                "min": [lows[c][o] if count[o] else None for o in kept],
+                "max": [highs[c][o] if count[o] else None for o in kept],
+                "avg": [totals[c][o] / count[o] if count[o] else None for o in kept],
+                "count": [count[o] for o in kept],
+            }
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        slots = sum(size for _, size in self.tiers)
+        per_series = slots * (4 + len(self.metrics) * 16)
+        return {
+            "series": len(self._series),
+            "samples": self.samples,
+            "tiers": [{"resolution": width, "buckets": size} for width, size in self.tiers],
+            "bytes_per_series": per_series,
+            "bytes": per_series * len(self._series),
+        }
@@ -0,0 +1,186 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from state_store import StateStore
+from state_sync import SNAPSHOT_ENCODE, Patch
+from wire import encode_message
+
+# --- Topics ---
+# A dashboard can subscribe to the scope it is looking at instead of
+# receiving every patch:
+#   ("universe",)                          - galaxy summaries (SUMMARY_FIELDS)
+#   ("galaxy", galaxy_id)                  - one galaxy with its planets
+#   ("planet", galaxy_id, planet_id)       - one planet with its trace history
+# Every topic's payload has the shape of the universe document, holding only
+# what is in scope, so patch ops keep their usual paths and apply to it
+# unchanged. "optimizing_planets" and "summary" (universe-wide counts) are
+# part of every topic.
+Topic = Tuple[str, ...]
+
+UNIVERSE: Topic = ("universe",)
+SUMMARY_FIELDS = ("id", "name", "position", "theme", "status", "status_message")
+
+
+def parse_topic(message: Dict[str, Any]) -> Topic:
+    """Reads the topic of a subscribe/unsubscribe message, raising ValueError."""
+    scope = message.get("scope")
+    if scope == "universe":
+        return UNIVERSE
+    if scope == "galaxy" and message.get("id"):
+        return ("galaxy", str(message["id"]))
+    if scope == "planet" and message.get("galaxyId") and message.get("id"):
+        return ("planet", str(message["galaxyId"]), str(message["id"]))
+    raise ValueError(f"invalid scope: {scope!r}")
+
+
+def summarize(galaxy: Dict[str, Any]) -> Dict[str, Any]:
+    """The universe view's projection of a galaxy."""
+    return {field: galaxy[field] for field in SUMMARY_FIELDS if field in galaxy}
+
+
+class TopicRouter:
+    """
+    Tracks which client channels subscribe to which topics and turns each
+    committed patch into one encoded message per touched topic, which is
+    then queued for that topic's subscribers only.
+
+    Topic messages carry `prev`, the revision of the previous message on the
+    same topic. A client that holds a topic at revision r has missed
+    something if it receives a message with prev > r, and resubscribes.
+    """
+
+    def __init__(self, state: StateStore):
+        self.state = state
+        self._subscribers: Dict[Topic, Set[Any]] = {}
+        self._last: Dict[Topic, int] = {}
+
+    # --- Subscriptions ---
+
+    def subscribe(self, channel: Any, topic: Topic) -> None:
+        """Subscribes a channel and queues the topic's snapshot for it."""
+        if channel.topics is None:
+            channel.topics = set()
+        channel.topics.add(topic)
+        if topic not in self._subscribers:
+            self._subscribers[topic] = set()
+            self._last[topic] = self.state.revision
+        self._subscribers[topic].add(channel)
+        # Not tied to a revision, so the channel never skips it as stale
+        channel.send(None, self.snapshot(topic))
+
+    def unsubscribe(self, channel: Any, topic: Topic) -> None:
+        if channel.topics is not None:
+            channel.topics.discard(topic)
+        subscribers = self._subscribers.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(channel)
+        if not subscribers:
+            del self._subscribers[topic]
+            del self._last[topic]
+
+    def unsubscribe_all(self, channel: Any) -> None:
+        for topic in list(channel.topics or ()):
+            self.unsubscribe(channel, topic)
+
+    def resync(self) -> None:
+        """Resends every topic's snapshot, e.g. after the whole state was replaced."""
+        for topic, subscribers in self._subscribers.items():
+            self._last[topic] = self.state.revision
+            data = self.snapshot(topic)
+            for channel in subscribers:
+                channel.send(None, data)
+
+    # --- Messages ---
+
+    def snapshot(self, topic: Topic) -> str:
+        """Returns an encoded snapshot of a topic at the current revision."""
+        state = self.state
+        if topic == UNIVERSE:
+            galaxies = {galaxy_id: summarize(galaxy) for galaxy_id, galaxy in state.galaxies.items()}
+        elif topic[0] == "galaxy":
+            galaxy = state.galaxy(topic[1])
+            galaxies = {topic[1]: galaxy} if galaxy else {}
+        else:
+            planet = state.planet(topic[2], topic[1])
+            galaxies = {topic[1]: {"id": topic[1], "planets": [planet]}} if planet else {}
+        with SNAPSHOT_ENCODE.time(topic[0]):
+            return encode_message({
+                "type": "snapshot",
+                "topic": list(topic),
+                "revision": state.revision,
+                "payload": {"galaxies": galaxies, "optimizing_planets": state.document["optimizing_planets"],
+                            "summary": state.document["summary"]},
+            })
+
+    def publish(self, revision: int, patch: Patch) -> None:
+        """Queues the committed patch's ops for the subscribers of each topic they touch."""
+        if not self._subscribers:
+            return
+        ops, resync = self.route(patch)
+        for topic, subscribers in self._subscribers.items():
+            if topic in resync:
+                data = self.snapshot(topic)
+            elif topic in ops:
+                data = '{"type":"patch","topic":%s,"revision":%d,"prev":%d,"ops":[%s]}' % (
+                    encode_message(list(topic)), revision, self._last[topic], ",".join(ops[topic]))
+            else:
+                continue
+            self._last[topic] = revision
+            for channel in subscribers:
+                channel.send(revision, data)
+
+    def route(self, patch: Patch) -> Tuple[Dict[Topic, List[str]], Set[Topic]]:
+        """
+        Maps the patch's encoded ops onto the subscribed topics they touch.
+        Topics whose whole subtree was replaced are returned separately;
+        they get a fresh snapshot instead of ops.
+        """
+        ops: Dict[Topic, List[str]] = {}
+        resync: Set[Topic] = set()
+        for op, encoded in zip(patch.ops, patch.encoded_ops):
+            for topic, data in self._targets(op, encoded):
+                if data is None:
+                    resync.add(topic)
+                elif topic in self._subscribers:
+                    ops.setdefault(topic, []).append(data)
+        return ops, resync
+
+    def _targets(self, op: Dict[str, Any], encoded: str) -> Iterable[Tuple[Topic, Optional[str]]]:
+        path = op["path"]
+        if path[0] != "galaxies":
+            for topic in self._subscribers:
+                yield topic, encoded
+            return
+        if len(path) < 2:
+            yield UNIVERSE, None
+            for topic in self._subscribers:
+                yield topic, None
+            return
+
+        galaxy_id = path[1]
+        yield ("galaxy", galaxy_id), encoded
+        if len(path) == 2:
+            # A whole galaxy was added, replaced or removed
+            if op["op"] != "set":
+                yield UNIVERSE, encoded
+            elif UNIVERSE in self._subscribers:
+                yield UNIVERSE, encode_message({"op": "set", "path": path, "value": summarize(op["value"])})
+            yield from self._planet_topics(galaxy_id)
+        elif path[2] in SUMMARY_FIELDS:
+            yield UNIVERSE, encoded
+        elif path[2] == "planets":
+            if len(path) == 3:
+                yield from self._planet_topics(galaxy_id)
+            elif len(path) == 4:
+                # The planet was added, replaced or removed
+                yield ("planet", galaxy_id, path[3]), None
+            else:
+                yield ("planet", galaxy_id, path[3]), encoded
+
+    def _planet_topics(self, galaxy_id: str) -> Iterable[Tuple[Topic, None]]:
+        for topic in self._subscribers:
+            if topic[0] == "planet" and topic[1] == galaxy_id:
+                yield topic, None
+
+    def stats(self) -> Dict[str, int]:
+        return {"/".join(topic): len(subscribers) for topic, subscribers in self._subscribers.items()}
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from wire import decode_message, encode_message
+
+logger = logging.getLogger(__name__)
+
+TRACE_DB_FILE = "traces.sqlite3"
+MAX_PAGE_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS traces (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    planet_id TEXT NOT NULL,
+    galaxy_id TEXT,
+    variant_id TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    variant TEXT NOT NULL,
+    UNIQUE (planet_id, variant_id)
+);
+CREATE INDEX IF NOT EXISTS traces_by_planet ON traces (planet_id, seq);
+"""
+
+
+class TraceStore:
+    """
+    The full trace history of every planet, in an append-only SQLite table.
+    The universe only keeps each planet's few most recent variants for the
+    dashboards; everything ever evaluated is kept here and read a page at a
+    time.
+
+    Each variant is recorded once per planet, when it is first seen. Appends
+    are buffered on the event loop and written by a single background
+    thread in one transaction per flush window; queries run on the same
+    thread, after the pending appends, so they always see them.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 0.2):
+        self.path = os.path.join(directory, TRACE_DB_FILE)
+        self.flush_interval = flush_interval
+        self._pending: List[Tuple[str, Optional[str], str, float, str]] = []
+        self._has_pending = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-store")
+        self._db: Optional[sqlite3.Connection] = None  # Only touched on the writer thread
+        self.records = 0
+        self.queries = 0
+
+    def open(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._executor.submit(self._open).result()
+
+    def append(self, planet_id: str, galaxy_id: Optional[str], variant: Dict[str, Any]) -> None:
+        """Queues a variant for a planet's history."""
+        self._pending.append((planet_id, galaxy_id, variant["id"], time.time(), encode_message(variant)))
+        self._has_pending.set()
+
+    async def flush(self) -> None:
+        rows, self._pending = self._pending, []
+        self._has_pending.clear()
+        if rows:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._write, rows)
+
+    async def run(self) -> None:
+        """Writes appended variants at most once per flush window."""
+        while True:
+            await self._has_pending.wait()
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception("Error writing the trace store")
+
+    async def page(self, planet_id: str, cursor: Optional[int] = None,
+                   limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Returns up to `limit` of a planet's variants, newest first, starting
+        after `cursor`, and the cursor for the next page (None at the end).
+        """
+        await self.flush()
+        self.queries += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._page, planet_id, cursor,
+                                          max(1, min(limit, MAX_PAGE_SIZE)))
+
+    async def get(self, planet_id: str, variant_id: str) -> Optional[Dict[str, Any]]:
+        """Returns one variant from a planet's history."""
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._get, planet_id, variant_id)
+
+    async def close(self) -> None:
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._close)
+        self._executor.shutdown()
+
+    # --- Writer thread ---
+
+    def _open(self) -> None:
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def _write(self, rows: List[Tuple[str, Optional[str], str, float, str]]) -> None:
+        with self._db:
+            cursor = self._db.executemany(
+                "INSERT OR IGNORE INTO traces (planet_id, galaxy_id, variant_id, recorded_at, variant) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+        self.records += cursor.rowcount
+
+    def _page(self, planet_id: str, cursor: Optional[int], limit: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        rows = self._db.execute(
+            "SELECT seq, variant FROM traces WHERE planet_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (planet_id, cursor if cursor is not None else 2**63 - 1, limit + 1)).fetchall()
+        variants = [decode_message(variant) for _, variant in rows[:limit]]
+        return variants, rows[limit - 1][0] if len(rows) > limit else None
+
+    def _get(self, planet_id: str, variant_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db.execute("SELECT variant FROM traces WHERE planet_id = ? AND variant_id = ?",
+                               (planet_id, variant_id)).fetchone()
+        return decode_message(row[0]) if row else None
+
+    def _close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "records": self.records, "pending": len(self._pending), "queries": self.queries}
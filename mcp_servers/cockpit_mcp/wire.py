@@ -0,0 +1,167 @@
+import json
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+from models import to_json
+
+# orjson is an optional speedup; fall back to the standard library encoder.
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# MessagePack is optional too; the msgpack format is only offered with it.
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+# --- Wire formats ---
+# A dashboard picks the encoding of its update stream when it connects, by
+# offering WebSocket subprotocols ("cockpit.<format>") in order of preference:
+#   json    - JSON text frames; the default when no subprotocol is offered
+#   deflate - JSON compressed with zlib and a preset dictionary (see
+#             build_dictionary), in binary frames
+#   msgpack - MessagePack, in binary frames
+# Messages are always produced as JSON text; the other formats are derived
+# from that text once per message, whatever the number of clients (see
+# FrameCache). Dashboards keep sending their commands as JSON text.
+PROTOCOL_PREFIX = "cockpit."
+WIRE_FORMATS = ("json", "deflate", "msgpack")
+DEFLATE_LEVEL = 6
+# Compression runs on the event loop, so messages past this size (snapshots)
+# use the fastest level instead
+DEFLATE_FAST_ABOVE = 256 * 1024
+
+# The start of the preset dictionary: the skeletons of the messages and the
+# keys and values every update repeats. Changing it changes the dictionary id.
+_DICTIONARY_SKELETON = (
+    '{"type":"snapshot","revision":0,"payload":{"galaxies":{"id":"","name":"","position":[0,0,0],'
+    '"theme":{"hue":0.},"status":"stable","status_message":"","config":{"apiUrl":"","authToken":"",'
+    '"opikMetrics":[],"metricMapping":{"planetSize":"score"}},"planets":[{"id":"","name":"Planet-",'
+    '"status":"active","orbitRadius":0.,"traceHistory":[]}],"comets":[]}},"optimizing_planets":[],'
+    '"summary":{"galaxies":0,"planets":0,"comets":0,"status":{"critical":0,"initializing":0,"stable":0,'
+    '"optimizing":0}}}}{"type":"snapshot","topic":["planet","",""],"revision":0,"payload":'
+    '{"type":"patch","topic":["galaxy",""],"revision":0,"prev":0,"ops":[{"op":"delete","path":["galaxies",""]},'
+    '{"op":"set","path":["summary"],"value":{"galaxies":0,"planets":0,"comets":0,"status":{"stable":0}}},'
+    '{"op":"set","path":["galaxies","","comets"],"value":[{"id":"","planet_id":"","progress":0.}]},'
+    '{"op":"set","path":["galaxies","","status"],"value":"optimizing"},'
+    '{"op":"insert","path":["galaxies","","planets","","traceHistory"],"value":'
+    '{"id":"var_17","text":"","evaluation":{},"timestamp":"2025-01-01T12:00:00.000000Z","isDeployed":false},'
+    '"index":0,"limit":5},{"op":"set","path":["galaxies","","planets","","deployedVersion"],"value":'
+    '{"id":"var_17","text":"","evaluation":{"score":0.,"factuality":"Meets Expectations",'
+    '"Exceeds Expectations","Needs Improvement","hallucination":"Not Detected","Detected","speed":0},'
+    '"timestamp":"2025-01-01T12:00:00.000000Z","isDeployed":true}}]}'
+)
+
+
+def encode_message(message: Any) -> str:
+    """
+    Serializes a message for the WebSocket once, so the same text frame can
+    be sent to every client without re-encoding it per socket.
+    """
+    if orjson is not None:
+        return orjson.dumps(message, default=to_json).decode("utf-8")
+    return json.dumps(message, separators=(",", ":"), default=to_json)
+
+
+def decode_message(data: Any) -> Any:
+    """Parses a JSON message (str or bytes) encoded by `encode_message`."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def build_dictionary(phrases: Iterable[str] = ()) -> bytes:
+    """
+    The preset dictionary of the deflate format: the message skeletons, then
+    `phrases` that recur in the data (prompt modifiers). Deflate can refer
+    back into it from the first byte of each message, which is what makes
+    compressing small patches one at a time worthwhile. Clients fetch it
+    from the server; zlib checks its id when inflating.
+    """
+    return (_DICTIONARY_SKELETON + " ".join(f"[{phrase}]" for phrase in phrases)).encode("utf-8")
+
+
+def available_formats() -> Tuple[str, ...]:
+    return tuple(name for name in WIRE_FORMATS if name != "msgpack" or msgpack is not None)
+
+
+def negotiate_format(offered: str) -> str:
+    """
+    Picks the wire format from a Sec-WebSocket-Protocol header: the first
+    protocol the client offered that the server supports, else json.
+    """
+    formats = available_formats()
+    for protocol in offered.split(","):
+        protocol = protocol.strip()
+        if protocol.startswith(PROTOCOL_PREFIX) and protocol[len(PROTOCOL_PREFIX):] in formats:
+            return protocol[len(PROTOCOL_PREFIX):]
+    return "json"
+
+
+class FrameCache:
+    """
+    Encodes each message into each binary wire format once, however many
+    clients receive it. Entries are keyed by the message's JSON text, so
+    the one string a broadcast queues for every client is looked up by
+    identity; the cache holds at most about `max_bytes` of that text.
+    """
+
+    def __init__(self, dictionary: bytes, max_bytes: int = 32 * 2**20, level: int = DEFLATE_LEVEL):
+        self.dictionary = dictionary
+        self.dictionary_id = zlib.adler32(dictionary)
+        self.max_bytes = max_bytes
+        self.level = level
+        self._frames: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.encoded: Dict[str, List[float]] = {name: [0, 0, 0, 0.0] for name in WIRE_FORMATS if name != "json"}
+
+    def encode(self, data: str, fmt: str) -> Union[str, bytes]:
+        """Returns `data` in the given format: the text itself for json."""
+        if fmt == "json":
+            return data
+        key = (fmt, data)
+        frame = self._frames.get(key)
+        if frame is not None:
+            self.hits += 1
+            return frame
+        started = time.perf_counter()
+        if fmt == "deflate":
+            level = self.level if len(data) <= DEFLATE_FAST_ABOVE else zlib.Z_BEST_SPEED
+            compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, zdict=self.dictionary)
+            frame = compressor.compress(data.encode("utf-8")) + compressor.flush()
+        elif fmt == "msgpack":
+            frame = msgpack.packb(decode_message(data))
+        else:
+            raise ValueError(f"Unknown wire format: {fmt}")
+        # Messages encoded, JSON bytes in, bytes out, seconds spent
+        totals = self.encoded[fmt]
+        totals[0] += 1
+        totals[1] += len(data)
+        totals[2] += len(frame)
+        totals[3] += time.perf_counter() - started
+
+        self._frames[key] = frame
+        self._size += len(data)
+        while self._size > self.max_bytes and len(self._frames) > 1:
+            (_, evicted), _ = self._frames.popitem(last=False)
+            self._size -= len(evicted)
+        return frame
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "formats": list(available_formats()),
+            "dictionary_id": self.dictionary_id,
+            "cached": len(self._frames),
+            "hits": self.hits,
+            "encoded": {
+                name: {"messages": messages, "json_bytes": json_bytes, "bytes": out_bytes,
+                       "ratio": round(out_bytes / json_bytes, 3) if json_bytes else None,
+                       "encode_ms": round(seconds * 1000, 1)}
+                for name, (messages, json_bytes, out_bytes, seconds) in self.encoded.items()
+            },
+        }